@@ -0,0 +1,202 @@
+# Headless batch comparison of a directory of contracts against one reference file
+# Usage: python batch_compare.py reference.docx contracts/ --output results.jsonl --csv results.csv
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+SUPPORTED_EXTENSIONS = (".docx", ".pdf")
+
+# Columns of the CSV output; every row is written against this list, whatever the record's status and analyses
+CSV_FIELDS = (
+    "file", "digest", "status", "error", "clauses", "modified", "moved", "deleted", "inserted", "unchanged",
+    "missing_clauses", "new_clauses", "local_seconds", "comparison", "summary", "llm_seconds",
+)
+
+# Reference text and, for a registered template, its stored index, set in every worker process once by the pool initializer
+_reference_text = None
+_template = None
+
+
+def _init_worker(reference_text, template_name=None):
+    global _reference_text, _template
+    _reference_text = reference_text
+    if template_name:
+        from reference_index import load_template
+        _template = load_template(template_name)
+
+
+# Function to hash a file's bytes, used to detect contracts already compared in an earlier run
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to list the contracts in a directory, in a stable order
+def find_contracts(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith("~$"):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+# Function run in a worker process: extract one contract and align it with the reference
+def compare_contract(path, digest):
+    from clause_diff import diff_clauses
+    from extractors import extractor_for
+
+    start = time.perf_counter()
+    record = {"file": path, "digest": digest, "status": "ok", "error": None}
+    try:
+        with open(path, "rb") as f:
+            text = extractor_for(path)(f)
+        diff = diff_clauses(_reference_text, text, template=_template)
+        ref_clauses, comp_clauses = diff["ref_clauses"], diff["comp_clauses"]
+        record.update({
+            "text": text,
+            "clauses": len(comp_clauses),
+            "modified": len(diff["modified"]),
+            "moved": len(diff["moved"]),
+            "deleted": len(diff["deleted"]),
+            "inserted": len(diff["inserted"]),
+            "unchanged": diff["unchanged"],
+            "missing_clauses": [ref_clauses[i] for i in diff["deleted"]],
+            "new_clauses": [comp_clauses[j] for j in diff["inserted"]],
+        })
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["local_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+# Function to run the requested LLM analyses for one compared contract
+def analyze_contract(record, reference_text, analyses, use_cache, template=None):
+    from doc_analysis import compare_docs_diff_first, request_summary_doc2
+
+    text = record.pop("text", None)
+    if record["status"] != "ok" or not analyses:
+        return record
+    start = time.perf_counter()
+    if "comparison" in analyses:
+        record["comparison"], stats = compare_docs_diff_first(reference_text, text, use_cache=use_cache, template=template)
+        if stats is None:
+            record.update(status="error", error=record["comparison"])
+    if "summary" in analyses:
+        try:
+            record["summary"] = request_summary_doc2(text, reference_text, use_cache=use_cache)
+        except Exception as e:  # recorded as an error, so the next run retries this contract
+            record.update(status="error", error=f"Summary failed: {type(e).__name__}: {e}")
+    record["llm_seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+# Function to read the files already completed by an earlier run of the same output
+def completed_files(output_path):
+    done = {}
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # a line cut short by an interruption
+                continue
+            if record.get("status") == "ok":
+                done[record["file"]] = record["digest"]
+    return done
+
+
+# Function to append one result to the JSONL output and, optionally, the CSV output
+def write_result(record, jsonl_file, csv_path):
+    jsonl_file.write(json.dumps(record) + "\n")
+    jsonl_file.flush()
+    if csv_path:
+        new_file = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+        with open(csv_path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, restval="", extrasaction="ignore")
+            if new_file:
+                writer.writeheader()
+            writer.writerow({key: ("\n".join(value) if isinstance(value, list) else value) for key, value in record.items()})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare a directory of contracts against a reference file.")
+    parser.add_argument("reference", help="reference .docx/.pdf file, or a template name with --template")
+    parser.add_argument("directory", help="directory of .docx/.pdf contracts (searched recursively)")
+    parser.add_argument("--template", action="store_true", help="treat reference as a registered template name")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL results file (appended, used to resume)")
+    parser.add_argument("--csv", help="also append results to this CSV file")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="extraction/comparison processes")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="LLM requests in flight at once")
+    parser.add_argument("--analyses", default="comparison", help="comma separated: comparison,summary or none")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the LLM response cache")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    analyses = set() if args.analyses == "none" else set(filter(None, args.analyses.split(",")))
+    if analyses:
+        import openai
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+        openai.api_base = os.getenv("OPENAI_API_BASE", openai.api_base)
+        if not openai.api_key:
+            parser.error("OPENAI_API_KEY is not set; configure it in a .env file or use --analyses none")
+
+    # A registered template's stored clauses and vectors are reused instead of processing the reference again
+    template = None
+    if args.template:
+        from reference_index import load_template
+        template = load_template(args.reference)
+        reference_text = template["text"]
+    else:
+        from extractors import extractor_for
+        with open(args.reference, "rb") as f:
+            reference_text = extractor_for(args.reference)(f)
+
+    done = completed_files(args.output)
+    pending = []
+    for path in find_contracts(args.directory):
+        digest = file_digest(path)
+        if done.get(path) != digest:
+            pending.append((path, digest))
+    print(f"{len(pending)} contracts to compare, {len(done)} already done", file=sys.stderr)
+
+    completed = failed = 0
+    with open(args.output, "a", encoding="utf-8") as jsonl_file, \
+            ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=_init_worker,
+                                initargs=(reference_text, args.reference if args.template else None)) as processes, \
+            ThreadPoolExecutor(max_workers=max(1, args.llm_concurrency)) as llm_pool:
+        # Local comparisons feed the LLM pool as they finish; results are written as soon as each contract is done
+        local_jobs = {processes.submit(compare_contract, path, digest) for path, digest in pending}
+        llm_jobs = set()
+        while local_jobs or llm_jobs:
+            finished, _ = wait(local_jobs | llm_jobs, return_when=FIRST_COMPLETED)
+            for job in finished:
+                if job in local_jobs:
+                    local_jobs.discard(job)
+                    llm_jobs.add(llm_pool.submit(analyze_contract, job.result(), reference_text, analyses,
+                                                  not args.no_cache, template))
+                    continue
+                llm_jobs.discard(job)
+                record = job.result()
+                write_result(record, jsonl_file, args.csv)
+                completed += 1
+                failed += record["status"] != "ok"
+                print(f"[{completed}/{len(pending)}] {record['status']}: {record['file']}", file=sys.stderr)
+
+    print(f"Done: {completed - failed} compared, {failed} failed. Results in {args.output}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+# Benchmark: greedy best-score matching vs anchor-based ordered alignment on mostly similar revisions
+# Run from the repository root: python -m benchmarks.bench_alignment
+import argparse
+import random
+import time
+
+from benchmarks.bench_similarity import WORDS
+from clause_alignment import align_clauses
+from clause_similarity import match_clauses
+
+
+# Function to generate a numbered reference document and a revision with edits, insertions, deletions and moves
+def synthetic_revision(n, edit_rate=0.05, seed=0):
+    rng = random.Random(seed)
+    ref = [f"{i + 1}. " + " ".join(rng.choices(WORDS, k=rng.randint(12, 30))) for i in range(n)]
+    comp = []
+    for clause in ref:
+        roll = rng.random()
+        if roll < edit_rate / 3:
+            continue  # deleted
+        if roll < 2 * edit_rate / 3:
+            words = clause.split()
+            words[rng.randrange(1, len(words))] = rng.choice(WORDS)
+            comp.append(" ".join(words))  # reworded
+        else:
+            comp.append(clause)
+        if rng.random() < edit_rate / 3:
+            comp.append("New. " + " ".join(rng.choices(WORDS, k=rng.randint(12, 30))))  # inserted
+    for _ in range(max(1, int(n * edit_rate / 10))):  # moved
+        comp.insert(rng.randrange(len(comp)), comp.pop(rng.randrange(len(comp))))
+    return ref, comp
+
+
+def _time(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="500,2000,8000,20000", help="comma separated clause counts")
+    parser.add_argument("--edit-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'clauses':>8} {'greedy (s)':>11} {'aligned (s)':>12}  edit script")
+    for n in (int(size) for size in args.sizes.split(",")):
+        ref, comp = synthetic_revision(n, args.edit_rate)
+        greedy_s, _ = _time(match_clauses, ref, comp)
+        aligned_s, script = _time(align_clauses, ref, comp)
+        counts = {}
+        for op in script:
+            counts[op["op"]] = counts.get(op["op"], 0) + 1
+        print(f"{n:>8} {greedy_s:>11.3f} {aligned_s:>12.3f}  {counts}")
+
+
+if __name__ == "__main__":
+    main()
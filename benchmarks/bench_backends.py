@@ -0,0 +1,76 @@
+# Benchmark: TF-IDF vs cached sentence-embedding clause comparison, throughput and vector memory
+# Run from the repository root: python -m benchmarks.bench_backends
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import contract_pair, to_text
+from clause_alignment import match_clauses_aligned
+from clause_embeddings import BACKENDS, available_backends
+from clause_segmenter import preprocess_clauses
+
+
+# Function to measure the bytes held by a vector matrix, sparse or dense
+def vector_bytes(vectors):
+    if hasattr(vectors, "indptr"):
+        return vectors.data.nbytes + vectors.indices.nbytes + vectors.indptr.nbytes
+    return vectors.nbytes
+
+
+# Function to vectorize and match one document pair with a backend; returns (seconds, vector bytes, missing, new)
+def run_backend(backend, ref, comp):
+    _, vectorize, threshold = BACKENDS[backend]
+    start = time.perf_counter()
+    vectors = vectorize(ref, comp)
+    missing, new, _ = match_clauses_aligned(ref, comp, threshold=threshold, vectors=vectors)
+    return time.perf_counter() - start, sum(vector_bytes(v) for v in vectors), len(missing), len(new)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and size the TF-IDF and embedding clause comparison backends.")
+    parser.add_argument("--sizes", default="200,1000,4000", help="comma separated clause counts")
+    parser.add_argument("--edit-rate", type=float, default=0.1)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    import clause_embeddings
+    backends = available_backends()
+    if "embeddings" not in backends and not args.json:
+        print("sentence_transformers not installed; timing TF-IDF only")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(size) for size in args.sizes.split(",")):
+            reference, revision, _ = contract_pair(size, args.edit_rate)
+            ref, comp = preprocess_clauses(to_text(reference)), preprocess_clauses(to_text(revision))
+            runs = [("tfidf", "tfidf", None)]
+            if "embeddings" in backends:
+                # A fresh cache per size and storage type: the first run encodes every clause, the second reads the cache
+                for dtype in ("int8", "float16"):
+                    path = os.path.join(tmp, f"{size}-{dtype}.sqlite3")
+                    runs += [("embeddings", f"embeddings {dtype} cold", (dtype, path)),
+                             ("embeddings", f"embeddings {dtype} cached", (dtype, path))]
+            for backend, name, cache in runs:
+                if cache:
+                    clause_embeddings.EMBEDDING_DTYPE, clause_embeddings.EMBEDDING_CACHE_PATH = cache
+                seconds, vectors, missing, new = run_backend(backend, ref, comp)
+                result = {"clauses": len(ref) + len(comp), "backend": name, "seconds": round(seconds, 4),
+                          "clauses_per_second": round((len(ref) + len(comp)) / seconds), "vector_mb": round(vectors / 2**20, 2),
+                          "missing": missing, "new": new}
+                if cache:
+                    result["cache_mb"] = round(clause_embeddings.cache_stats(cache[1])["bytes"] / 2**20, 2)
+                results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'clauses':>7} {'backend':<26} {'seconds':>8} {'clauses/s':>10} {'vectors MB':>10} {'cache MB':>8} {'missing':>7} {'new':>5}")
+    for r in results:
+        print(f"{r['clauses']:>7} {r['backend']:<26} {r['seconds']:>8.3f} {r['clauses_per_second']:>10,} "
+              f"{r['vector_mb']:>10.2f} {r.get('cache_mb', '-'):>8} {r['missing']:>7} {r['new']:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# Benchmark: python-docx paragraphs vs the streaming document.xml parser on large contracts
+# Run from the repository root: python -m benchmarks.bench_docx
+import argparse
+import io
+import random
+import time
+import tracemalloc
+
+import docx
+
+from benchmarks.bench_similarity import WORDS
+from docx_parser import blocks_to_text, iter_docx_blocks
+
+
+# Function to build a .docx contract with headings, numbered clauses and a pricing table per section
+def synthetic_docx(sections, clauses_per_section=8, table_rows=6, seed=0):
+    rng = random.Random(seed)
+    document = docx.Document()
+    document.add_heading("Master Services Agreement", 0)
+    for section in range(sections):
+        document.add_heading(f"{rng.choice(WORDS).title()} {rng.choice(WORDS)}", 1)
+        for _ in range(clauses_per_section):
+            document.add_paragraph(" ".join(rng.choices(WORDS, k=rng.randint(12, 40))), style="List Number")
+        table = document.add_table(rows=table_rows, cols=3)
+        for row in table.rows:
+            row.cells[0].text = rng.choice(WORDS)
+            row.cells[1].text = f"{rng.randint(1, 99)}.{rng.randint(0, 9)}%"
+            row.cells[2].text = f"USD {rng.randint(100, 99999):,}"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+# Function reproducing the original extract_text_from_docx
+def legacy_extract(data):
+    doc = docx.Document(io.BytesIO(data))
+    return "\n".join(para.text.strip() for para in doc.paragraphs if para.text.strip())
+
+
+def streaming_extract(data):
+    return blocks_to_text(iter_docx_blocks(io.BytesIO(data)))
+
+
+# Function to time an extractor, then measure its peak traced memory in a second run
+def _measure(fn, data):
+    start = time.perf_counter()
+    result = fn(data)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024 / 1024, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", default="200,800,3200", help="comma separated section counts")
+    args = parser.parse_args()
+
+    print(f"{'sections':>8} {'size (MB)':>9} {'python-docx (s)':>16} {'peak MB':>8} "
+          f"{'streaming (s)':>14} {'peak MB':>8} {'speedup':>8} {'lines':>13}")
+    for sections in (int(size) for size in args.sections.split(",")):
+        data = synthetic_docx(sections)
+        legacy_s, legacy_mb, legacy = _measure(legacy_extract, data)
+        stream_s, stream_mb, streamed = _measure(streaming_extract, data)
+        lines = f"{legacy.count(chr(10)) + 1}/{streamed.count(chr(10)) + 1}"
+        print(f"{sections:>8} {len(data) / 1024 / 1024:>9.2f} {legacy_s:>16.3f} {legacy_mb:>8.1f} "
+              f"{stream_s:>14.3f} {stream_mb:>8.1f} {legacy_s / stream_s:>7.1f}x {lines:>13}")
+
+
+if __name__ == "__main__":
+    main()
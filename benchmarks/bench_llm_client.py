@@ -0,0 +1,103 @@
+# Benchmark: direct openai calls vs the pooled, rate-limited client against the local stub server with injected faults
+# Run from the repository root: python -m benchmarks.bench_llm_client
+import argparse
+import json
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+import llm_client
+from llm_stub_server import start_stub_server
+
+MESSAGES = [
+    {"role": "system", "content": "You are an expert in legal document comparison."},
+    {"role": "user", "content": "Compare the payment terms: 30 days versus 15 days of invoice receipt."},
+]
+
+
+# Function reproducing the original helpers: one request, no timeout, no retry, a session per thread
+def direct_call(stream):
+    if not stream:
+        return openai.ChatCompletion.create(model="gpt-3.5-turbo", messages=MESSAGES, temperature=0.5).choices[0].message["content"]
+    parts = []
+    for chunk in openai.ChatCompletion.create(model="gpt-3.5-turbo", messages=MESSAGES, temperature=0.5, stream=True):
+        parts.append(chunk["choices"][0]["delta"].get("content") or "")
+    return "".join(parts)
+
+
+def client_call(stream):
+    return llm_client.chat_completion("gpt-3.5-turbo", MESSAGES, 0.5, on_token=(lambda text: None) if stream else None,
+                                      label="bench", use_cache=False)
+
+
+# Function to run requests calls of fn on concurrency threads and summarise failures and latency
+def run(fn, requests, concurrency, stream):
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            fn(stream)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, type(e).__name__
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(requests)))
+    wall = time.perf_counter() - start
+    latencies = sorted(seconds for seconds, error in results if error is None)
+    return {
+        "ok": len(latencies),
+        "failed": len(results) - len(latencies),
+        "errors": sorted({error for _, error in results if error}),
+        "p50_seconds": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_seconds": round(latencies[int(len(latencies) * 0.95) - 1], 3) if latencies else None,
+        "requests_per_second": round(len(latencies) / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub reply latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="fraction of HTTP 500 replies")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05, help="fraction of HTTP 429 replies")
+    parser.add_argument("--stream", action="store_true", help="stream the replies")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    logging.getLogger("llm_client").setLevel(logging.ERROR)  # one warning per retry otherwise
+    server, api_base = start_stub_server(latency=args.latency, token_delay=0.0, error_rate=args.error_rate,
+                                         rate_limit_rate=args.rate_limit_rate, retry_after=0.1)
+    openai.api_base, openai.api_key = api_base, "stub"
+    pooled_session = openai.requestssession
+    results = []
+    try:
+        for name, fn in (("direct", direct_call), ("client", client_call)):
+            # The direct run uses openai's default per-thread sessions, as before the shared client
+            openai.requestssession = None if name == "direct" else pooled_session
+            llm_client.recent_calls.clear()
+            result = run(fn, args.requests, args.concurrency, args.stream)
+            result["retries"] = sum(call["retries"] for call in llm_client.recent_calls)
+            results.append({"mode": name, **result})
+    finally:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps({"results": results, "server": dict(server.stats)}, indent=2))
+        return
+    print(f"{'mode':<8} {'ok':>5} {'failed':>6} {'retries':>7} {'p50 (s)':>8} {'p95 (s)':>8} {'req/s':>7}  errors")
+    for result in results:
+        print(f"{result['mode']:<8} {result['ok']:>5} {result['failed']:>6} {result['retries']:>7} "
+              f"{result['p50_seconds'] or 0:>8.3f} {result['p95_seconds'] or 0:>8.3f} {result['requests_per_second']:>7.1f}  "
+              f"{', '.join(result['errors']) or '-'}")
+    print(f"stub server: {dict(server.stats)}")
+    print(f"client limits: {llm_client.REQUESTS_PER_MINUTE:g} requests/min (bursts of {llm_client.BURST_SECONDS}s), "
+          f"{llm_client.MAX_IN_FLIGHT} in flight; set LLM_REQUESTS_PER_MINUTE=0 to measure without pacing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Benchmark: negotiation rounds, each draft a small revision of the previous one; full reprocessing vs
+# paragraph-level reuse (preprocessing time, and prompt tokens of the full, changed-clause and changed-paragraph comparisons)
+# Run from the repository root: python -m benchmarks.bench_revisions
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import revisions
+from benchmarks.bench_similarity import WORDS
+from benchmarks.synthetic import revise, synthetic_sections, to_text
+from clause_diff import diff_clauses
+from clause_segmenter import preprocess_clauses
+from doc_analysis import build_comparison_prompt, build_diff_comparison_prompt, build_revision_prompt, count_prompt_tokens
+from extraction_cache import clear_cache, content_key
+
+# Words of the comparison stored for each draft; stands in for the model's reply
+COMPARISON_WORDS = 350
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+# Function to compare every draft after the first with full reprocessing and with paragraph-level reuse
+def run_rounds(clauses, rounds, edit_rate, first_edit_rate=0.1):
+    reference = synthetic_sections(clauses)
+    ref_text = to_text(reference)
+    ref_key = content_key(ref_text)
+    comparison = " ".join(random.Random(0).choices(WORDS, k=COMPARISON_WORDS))
+    draft, _ = revise(reference, first_edit_rate, seed=1)
+    clear_cache()
+    revisions.preprocess_paragraphs(to_text(draft))
+    revisions.save_analysis(ref_key, to_text(draft), "draft 1", "comparison", comparison)
+
+    results = []
+    for n in range(2, rounds + 1):
+        draft, _ = revise(draft, edit_rate, seed=n)
+        text = to_text(draft)
+        full_seconds, full_clauses = _timed(preprocess_clauses, text)
+        reuse_seconds, reused_clauses = _timed(revisions.preprocess_paragraphs, text)
+        if reused_clauses != full_clauses:
+            raise AssertionError(f"round {n}: paragraph-level preprocessing changed the clauses")
+
+        lookup_seconds, (previous, previous_comparison) = _timed(revisions.find_previous_analysis, ref_key, text)
+        if previous is None:
+            raise AssertionError(f"round {n}: previous draft not found")
+        delta_seconds, delta = _timed(revisions.paragraph_delta, revisions.revision_paragraphs(previous["id"]),
+                                      revisions.split_paragraphs(text))
+        results.append({
+            "round": n,
+            "paragraphs": delta["unchanged"] + len(delta["changed"]) + len(delta["added"]),
+            "changed_paragraphs": len(delta["changed"]) + len(delta["added"]) + len(delta["removed"]),
+            "preprocess_full_ms": round(full_seconds * 1000, 2),
+            "preprocess_reuse_ms": round(reuse_seconds * 1000, 2),
+            "history_ms": round((lookup_seconds + delta_seconds) * 1000, 2),
+            "full_tokens": count_prompt_tokens(build_comparison_prompt(ref_text, text)),
+            "diff_tokens": count_prompt_tokens(build_diff_comparison_prompt(diff_clauses(ref_text, text))),
+            "revision_tokens": count_prompt_tokens(build_revision_prompt(ref_text, previous_comparison, delta)),
+        })
+        revisions.save_analysis(ref_key, text, f"draft {n}", "comparison", comparison)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare drafts of a negotiation with and without paragraph-level reuse.")
+    parser.add_argument("--clauses", type=int, default=400)
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--edit-rate", type=float, default=0.02, help="edits per clause between consecutive drafts")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        revisions.REVISION_STORE_PATH = os.path.join(tmp, "revisions.sqlite3")
+        results = run_rounds(args.clauses, args.rounds, args.edit_rate)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.clauses} clauses, {args.edit_rate:.0%} edits per round; tokens assume a {COMPARISON_WORDS}-word previous comparison")
+    print(f"{'round':>5} {'changed':>9} {'preprocess ms':>14} {'reused ms':>10} {'history ms':>11} "
+          f"{'full tokens':>12} {'diff tokens':>12} {'draft tokens':>13}")
+    for r in results:
+        print(f"{r['round']:>5} {r['changed_paragraphs']:>4}/{r['paragraphs']:<4} {r['preprocess_full_ms']:>14.2f} "
+              f"{r['preprocess_reuse_ms']:>10.2f} {r['history_ms']:>11.2f} {r['full_tokens']:>12,} "
+              f"{r['diff_tokens']:>12,} {r['revision_tokens']:>13,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Benchmark: NLTK sentence splitting + stopword set per call vs the compiled legal clause segmenter
+# Run from the repository root: python -m benchmarks.bench_segmenter
+import argparse
+import random
+import re
+import time
+
+from benchmarks.bench_similarity import WORDS
+from clause_segmenter import preprocess_clauses
+
+_fragment = re.compile(r"^(?:\d+(?:\.\d+)*\.?|\([a-z]+\)|[a-z]\))$")
+
+
+# Function to generate contract text with numbered clauses, sub-clauses and wrapped lines
+def synthetic_contract(sections, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for s in range(1, sections + 1):
+        lines.append(f"{s}. {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}")
+        for c in range(1, rng.randint(3, 6)):
+            lines.append(f"{s}.{c} The " + " ".join(rng.choices(WORDS, k=rng.randint(10, 30))) + ".")
+            if rng.random() < 0.3:
+                lines.append(f"{s}.{c}.1 The supplier shall: (a) " + " ".join(rng.choices(WORDS, k=8))
+                             + "; (b) " + " ".join(rng.choices(WORDS, k=8)) + "; (ii) " + " ".join(rng.choices(WORDS, k=6)) + ".")
+    return "\n".join(lines)
+
+
+# Function reproducing the original preprocess_text (needs the NLTK data from nltk_helper1.py)
+def nltk_preprocess(text):
+    from nltk.corpus import stopwords
+    from nltk.tokenize import sent_tokenize
+    stop_words = set(stopwords.words('english'))
+    preprocessed = []
+    for sentence in sent_tokenize(text):
+        words = [word.lower() for word in sentence.split() if word.lower() not in stop_words]
+        preprocessed.append(" ".join(words))
+    return preprocessed
+
+
+def _time(fn, text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _fragments(units):
+    return sum(bool(_fragment.match(unit.strip())) for unit in units)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", default="50,200,1000", help="comma separated section counts")
+    args = parser.parse_args()
+
+    from nltk_helper1 import missing_resources
+    nltk_ready = not missing_resources()
+    if not nltk_ready:
+        print("NLTK data not installed (python nltk_helper1.py); timing the segmenter only")
+
+    print(f"{'sections':>8} {'nltk (s)':>9} {'units':>7} {'fragments':>9} {'segmenter (s)':>14} {'units':>7} {'fragments':>9}")
+    for sections in (int(size) for size in args.sections.split(",")):
+        text = synthetic_contract(sections)
+        seg_s, seg_units = _time(preprocess_clauses, text)
+        if nltk_ready:
+            nltk_s, nltk_units = _time(nltk_preprocess, text)
+            nltk_cols = f"{nltk_s:>9.3f} {len(nltk_units):>7} {_fragments(nltk_units):>9}"
+        else:
+            nltk_cols = f"{'-':>9} {'-':>7} {'-':>9}"
+        print(f"{sections:>8} {nltk_cols} {seg_s:>14.3f} {len(seg_units):>7} {_fragments(seg_units):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Benchmark: per-clause cosine_similarity loops vs the batched similarity engine
+# Run from the repository root: python -m benchmarks.bench_similarity
+import argparse
+import random
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from clause_similarity import match_clauses
+
+WORDS = (
+    "supplier client agreement term payment invoice days notice termination party parties "
+    "liability indemnify confidential information warranty services deliverables fees law "
+    "jurisdiction venue dispute arbitration insurance audit records breach cure period renewal "
+    "assignment subcontract intellectual property license data protection force majeure"
+).split()
+
+
+# Function to generate a reference clause list and a lightly edited comparison list
+def synthetic_clauses(n, edit_rate=0.1, seed=0):
+    rng = random.Random(seed)
+    ref = [" ".join(rng.choices(WORDS, k=rng.randint(12, 30))) for _ in range(n)]
+    comp = []
+    for clause in ref:
+        if rng.random() < edit_rate:
+            comp.append(" ".join(rng.choices(WORDS, k=rng.randint(12, 30))))
+        else:
+            comp.append(clause)
+    return ref, comp
+
+
+# Function reproducing the original compare_clauses loops
+def legacy_match_clauses(ref_clauses, comp_clauses, threshold=0.7):
+    vectorizer = TfidfVectorizer()
+    vectors = vectorizer.fit_transform(ref_clauses + comp_clauses)
+    ref_vectors = vectors[:len(ref_clauses)]
+    comp_vectors = vectors[len(ref_clauses):]
+
+    missing_clauses, new_clauses, matches = [], [], []
+    for i, ref_vec in enumerate(ref_vectors):
+        max_score = cosine_similarity(ref_vec, comp_vectors).max()
+        if max_score < threshold:
+            missing_clauses.append(ref_clauses[i])
+        else:
+            matches.append((ref_clauses[i], max_score))
+    for i, comp_vec in enumerate(comp_vectors):
+        max_score = cosine_similarity(comp_vec, ref_vectors).max()
+        if max_score < threshold:
+            new_clauses.append(comp_clauses[i])
+    return missing_clauses, new_clauses, matches
+
+
+def _time(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="100,500,1000,2000,4000", help="comma separated clause counts")
+    parser.add_argument("--edit-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(f"{'clauses':>8} {'legacy (s)':>11} {'batched (s)':>12} {'speedup':>8}  same result")
+    for n in (int(size) for size in args.sizes.split(",")):
+        ref, comp = synthetic_clauses(n, args.edit_rate)
+        legacy_s, legacy = _time(legacy_match_clauses, ref, comp)
+        batched_s, batched = _time(match_clauses, ref, comp)
+        same = legacy[0] == batched[0] and legacy[1] == batched[1]
+        print(f"{n:>8} {legacy_s:>11.3f} {batched_s:>12.3f} {legacy_s / batched_s:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Benchmark: cold start of each Streamlit app, from a fresh interpreter to the end of its first run with no uploads
+# Run from the repository root: python -m benchmarks.bench_startup
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+APPS = ("legalreviewer.py", "test.py", "test1.py", "test2.py")
+
+# Libraries that should only load once the feature that needs them runs
+HEAVY_MODULES = ("nltk", "sklearn", "transformers", "torch", "sentence_transformers", "pandas")
+
+_PROBE = """
+import json, logging, runpy, sys, time
+logging.disable(logging.WARNING)  # Streamlit warns about running without a server
+start = time.perf_counter()
+runpy.run_path(sys.argv[1], run_name="__main__")
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "heavy": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+# Function to time one cold start of an app in a new interpreter
+def cold_start(app):
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE, app, *HEAVY_MODULES], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--apps", default=",".join(APPS), help="comma separated app scripts")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = []
+    for app in args.apps.split(","):
+        runs = [cold_start(app) for _ in range(args.runs)]
+        results.append({
+            "app": app,
+            "median_seconds": round(statistics.median(run["seconds"] for run in runs), 3),
+            "heavy_modules_loaded": runs[-1]["heavy"],
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'app':<18} {'cold start (s)':>15}  heavy modules loaded at start")
+    for result in results:
+        print(f"{result['app']:<18} {result['median_seconds']:>15.3f}  {', '.join(result['heavy_modules_loaded']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark: concurrent summary requests against the shared summary server, one request per model call vs dynamic batching
+# Run from the repository root: python -m benchmarks.bench_summary_server
+import argparse
+import importlib.util
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import summarizer
+from benchmarks.bench_similarity import WORDS
+from summary_server import MAX_BATCH_SIZE, MAX_WAIT_MS, pipeline_batch, start_summary_server, stop_summary_server
+
+# Cost of the simulated model: seconds per pipeline call plus seconds per text in the batch
+SIMULATED_CALL_SECONDS = 0.15
+SIMULATED_TEXT_SECONDS = 0.1
+
+
+# Function to stand in for BART on machines without transformers: one call at a time, like a CPU-bound model
+def simulated_batch(call_seconds=SIMULATED_CALL_SECONDS, text_seconds=SIMULATED_TEXT_SECONDS):
+    lock = threading.Lock()
+
+    def summarize_batch(texts, params):
+        with lock:
+            time.sleep(call_seconds + text_seconds * len(texts))
+        return [" ".join(text.split()[:20]) for text in texts]
+    return summarize_batch
+
+
+# Function to send requests from concurrent clients and time each one
+def run_clients(url, clients, requests_per_client, words):
+    rng = random.Random(0)
+    texts = [" ".join(rng.choices(WORDS, k=words)) for _ in range(clients * requests_per_client)]
+    summarizer.SUMMARY_SERVER_URL = url
+
+    def client(n):
+        latencies = []
+        for text in texts[n::clients]:
+            start = time.perf_counter()
+            summarizer.remote_summary(text, max_length=60, min_length=10, do_sample=False)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = [latency for result in pool.map(client, range(clients)) for latency in result]
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time concurrent summary requests with and without dynamic batching.")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent sessions sending requests")
+    parser.add_argument("--requests", type=int, default=4, help="requests per client")
+    parser.add_argument("--words", type=int, default=200, help="words per text to summarize")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--simulate", action="store_true", help="use the simulated model even when transformers is installed")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    simulate = args.simulate or importlib.util.find_spec("transformers") is None
+    if simulate and not args.json:
+        print(f"transformers not installed or --simulate: simulated model costing {SIMULATED_CALL_SECONDS}s per call "
+              f"+ {SIMULATED_TEXT_SECONDS}s per text")
+
+    results = []
+    for name, batch_size in (("one request per call", 1), ("dynamic batching", args.max_batch_size)):
+        server, url = start_summary_server(max_batch_size=batch_size, max_wait_ms=args.max_wait_ms,
+                                           summarize_batch=simulated_batch() if simulate else pipeline_batch())
+        try:
+            seconds, latencies = run_clients(url, args.clients, args.requests, args.words)
+        finally:
+            stop_summary_server(server)
+        latencies.sort()
+        sizes = server.batch_sizes
+        results.append({
+            "mode": name,
+            "max_batch_size": batch_size,
+            "requests": len(latencies),
+            "seconds": round(seconds, 3),
+            "requests_per_second": round(len(latencies) / seconds, 2),
+            "p50_latency": round(statistics.median(latencies), 3),
+            "p95_latency": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+            "batches": sum(sizes.values()),
+            "mean_batch_size": round(sum(size * count for size, count in sizes.items()) / sum(sizes.values()), 2),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.clients} clients x {args.requests} requests, max wait {args.max_wait_ms:.0f} ms")
+    print(f"{'mode':<22} {'seconds':>8} {'req/s':>7} {'p50 s':>7} {'p95 s':>7} {'batches':>8} {'mean batch':>11}")
+    for r in results:
+        print(f"{r['mode']:<22} {r['seconds']:>8.2f} {r['requests_per_second']:>7.2f} {r['p50_latency']:>7.2f} "
+              f"{r['p95_latency']:>7.2f} {r['batches']:>8} {r['mean_batch_size']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
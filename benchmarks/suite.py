@@ -0,0 +1,192 @@
+# Benchmark suite: extraction, preprocess_text, compare_clauses and the end-to-end flow on synthetic contracts,
+# with results recorded as JSON so runs from different versions can be compared.
+# Run from the repository root: python -m benchmarks.suite --output benchmarks/results.jsonl
+# Compare with an earlier run:  python -m benchmarks.suite --baseline benchmarks/results.jsonl
+import argparse
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import RENDERERS, contract_pair
+
+STAGES = ("extract", "preprocess_text", "compare_clauses", "end_to_end")
+MIME_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+# A stage slower than its baseline by more than this fraction is reported as a regression
+TOLERANCE = 0.2
+
+
+# Function to wrap file bytes like a Streamlit upload
+def _upload(data, fmt, name):
+    file = io.BytesIO(data)
+    file.type, file.name = MIME_TYPES[fmt], f"{name}.{fmt}"
+    return file
+
+
+# Function to time fn over repeat runs, calling reset before each; returns the list of seconds
+def _time(fn, repeat, reset=None):
+    runs = []
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+# Function to time every stage for one contract size and format
+def run_case(clauses, fmt, edit_rate, repeat):
+    """Each run starts cold: the in-process stage cache and the clause library are emptied first."""
+    import clause_library
+    import test1
+    from doc_analysis import compare_docs_diff_first
+    from extraction_cache import clear_cache
+
+    reference, revision, edits = contract_pair(clauses, edit_rate)
+    ref_bytes, comp_bytes = RENDERERS[fmt](reference), RENDERERS[fmt](revision)
+    extractor = test1.extract_text_from_pdf if fmt == "pdf" else test1.extract_text_from_docx
+    ref_text, comp_text = extractor(io.BytesIO(ref_bytes)), extractor(io.BytesIO(comp_bytes))
+
+    def reset():
+        clear_cache()
+        clause_library.clear()
+
+    def end_to_end():
+        ref = test1.extract_text(_upload(ref_bytes, fmt, "reference"))
+        comp = test1.extract_text(_upload(comp_bytes, fmt, "revision"))
+        test1.compare_clauses(ref, comp)
+        result, stats = compare_docs_diff_first(ref, comp, use_cache=False)
+        if stats is None:
+            raise RuntimeError(result)
+
+    timings = {
+        "extract": _time(lambda: extractor(io.BytesIO(ref_bytes)), repeat),
+        "preprocess_text": _time(lambda: test1.preprocess_text(ref_text), repeat, reset),
+        "compare_clauses": _time(lambda: test1.compare_clauses(ref_text, comp_text), repeat, reset),
+        "end_to_end": _time(end_to_end, repeat, reset),
+    }
+    return [
+        {
+            "format": fmt,
+            "clauses": clauses,
+            "edit_rate": edit_rate,
+            "edits": sum(edits.values()),
+            "file_bytes": len(ref_bytes),
+            "stage": stage,
+            "seconds": round(min(runs), 4),
+            "median_seconds": round(statistics.median(runs), 4),
+        }
+        for stage, runs in timings.items()
+    ]
+
+
+# Function to describe the code version and machine a run was made on
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# Function to run the whole suite against a local stub LLM and a throwaway clause library
+def run_suite(sizes, formats, edit_rate, repeat):
+    import openai
+    import clause_library
+    from llm_stub_server import start_stub_server
+
+    server, api_base = start_stub_server(latency=0.0, token_delay=0.0)
+    saved = openai.api_base, openai.api_key, clause_library.LIBRARY_PATH
+    openai.api_base, openai.api_key = api_base, "stub"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            clause_library.LIBRARY_PATH = os.path.join(tmp, "clause_library.sqlite3")
+            results = [row for clauses in sizes for fmt in formats for row in run_case(clauses, fmt, edit_rate, repeat)]
+    finally:
+        openai.api_base, openai.api_key, clause_library.LIBRARY_PATH = saved
+        server.shutdown()
+    return {**environment(), "repeat": repeat, "results": results}
+
+
+# Function to load the latest run recorded in a JSON lines results file
+def load_latest(path):
+    with open(path) as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    return runs[-1] if runs else None
+
+
+# Function to compare a run with a baseline run; returns rows for every case measured in both
+def compare_runs(baseline, current, tolerance=TOLERANCE):
+    def key(row):
+        return row["format"], row["clauses"], row["edit_rate"], row["stage"]
+
+    before = {key(row): row["seconds"] for row in baseline["results"]}
+    rows = []
+    for row in current["results"]:
+        if key(row) in before and before[key(row)] > 0:
+            ratio = row["seconds"] / before[key(row)]
+            rows.append({**row, "baseline_seconds": before[key(row)], "ratio": round(ratio, 3),
+                         "regression": ratio > 1 + tolerance})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the document comparison pipeline on synthetic contracts.")
+    parser.add_argument("--sizes", default="100,400,1600", help="comma separated clause counts")
+    parser.add_argument("--formats", default="docx,pdf", help="comma separated: docx,pdf")
+    parser.add_argument("--edit-rate", type=float, default=0.1, help="edits per clause in the revision")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="append this run as one JSON line to the given file")
+    parser.add_argument("--baseline", help="compare with the latest run in this JSON lines file; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown before a regression")
+    parser.add_argument("--json", action="store_true", help="print the run as JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # Streamlit warns about running without a server
+    baseline = load_latest(args.baseline) if args.baseline else None
+    run = run_suite([int(size) for size in args.sizes.split(",")], args.formats.split(","), args.edit_rate, args.repeat)
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(run) + "\n")
+
+    if args.json:
+        print(json.dumps(run, indent=2))
+    else:
+        print(f"commit {run['commit']}, Python {run['python']}, {run['cpus']} CPUs, best of {run['repeat']}")
+        print(f"{'format':<6} {'clauses':>7} {'stage':<16} {'seconds':>9} {'median':>9}")
+        for row in run["results"]:
+            print(f"{row['format']:<6} {row['clauses']:>7} {row['stage']:<16} {row['seconds']:>9.4f} {row['median_seconds']:>9.4f}")
+
+    if baseline is None:
+        return 0
+    rows = compare_runs(baseline, run, args.tolerance)
+    print(f"\nagainst commit {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    print(f"{'format':<6} {'clauses':>7} {'stage':<16} {'baseline':>9} {'now':>9} {'ratio':>6}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['format']:<6} {row['clauses']:>7} {row['stage']:<16} {row['baseline_seconds']:>9.4f} "
+              f"{row['seconds']:>9.4f} {row['ratio']:>6.2f}{flag}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# Synthetic contracts for the benchmarks: a reference contract of any size and a revision with a given edit rate,
+# rendered as plain text, .docx or .pdf. Write a sample pair with: python -m benchmarks.synthetic --out-dir samples
+import argparse
+import io
+import os
+import random
+import textwrap
+from collections import Counter
+
+from benchmarks.bench_similarity import WORDS
+
+SECTION_TITLES = (
+    "Definitions", "Services", "Payment Terms", "Term and Termination", "Confidentiality", "Warranties",
+    "Limitation of Liability", "Indemnification", "Intellectual Property", "Data Protection", "Insurance",
+    "Audit Rights", "Force Majeure", "Assignment", "Notices", "Governing Law", "Dispute Resolution",
+)
+CLAUSES_PER_SECTION = 8
+
+# Kinds of edits applied to the revision, with their relative frequency
+EDIT_KINDS = {"reword": 4, "number": 2, "delete": 1, "insert": 2, "move": 1}
+
+# PDF page layout: characters per line, lines per page, font size and margins in points
+PDF_LINE_CHARS = 95
+PDF_PAGE_LINES = 60
+PDF_FONT_SIZE = 9
+PDF_MARGIN = 50
+
+
+# Function to write one clause sentence with a number in it, as contracts have days, amounts and percentages
+def _clause_text(rng):
+    subject = rng.choice(("The Supplier", "The Client", "Each party", "Neither party"))
+    figure = rng.choice((f"{rng.choice((10, 15, 30, 45, 60, 90))} days", f"USD {rng.randint(1, 500) * 1000:,}",
+                         f"{rng.randint(1, 20)} percent"))
+    return (f"{subject} shall {' '.join(rng.choices(WORDS, k=rng.randint(6, 18)))} within {figure} "
+            f"of the {' '.join(rng.choices(WORDS, k=rng.randint(3, 10)))}.")
+
+
+# Function to generate a reference contract as a list of (heading, [clause, ...]) sections
+def synthetic_sections(clauses, seed=0):
+    rng = random.Random(seed)
+    sections = []
+    for s in range((clauses + CLAUSES_PER_SECTION - 1) // CLAUSES_PER_SECTION):
+        count = min(CLAUSES_PER_SECTION, clauses - s * CLAUSES_PER_SECTION)
+        title = SECTION_TITLES[s % len(SECTION_TITLES)]
+        sections.append((f"{s + 1}. {title}", [f"{s + 1}.{c + 1} {_clause_text(rng)}" for c in range(count)]))
+    return sections
+
+
+# Function to apply about edit_rate edits per clause to a copy of the sections
+def revise(sections, edit_rate=0.1, seed=1):
+    """Returns (revised_sections, edit_counts); clause numbers are kept, inserted clauses get the next free number."""
+    rng = random.Random(seed)
+    revised = [(heading, list(clauses)) for heading, clauses in sections]
+    kinds, weights = list(EDIT_KINDS), list(EDIT_KINDS.values())
+    edits = Counter()
+    total = sum(len(clauses) for _, clauses in revised)
+    for _ in range(round(total * edit_rate)):
+        kind = rng.choices(kinds, weights)[0]
+        heading, clauses = rng.choice(revised)
+        if not clauses:
+            continue
+        n = rng.randrange(len(clauses))
+        label, _, text = clauses[n].partition(" ")
+        words = text.split()
+        if kind == "reword":
+            for i in rng.sample(range(len(words) - 1), min(3, len(words) - 1)):
+                words[i] = rng.choice(WORDS)
+            clauses[n] = f"{label} {' '.join(words)}"
+        elif kind == "number":
+            digits = [i for i, word in enumerate(words) if word[0].isdigit()]
+            if not digits:
+                continue
+            i = rng.choice(digits)
+            words[i] = str(rng.choice((5, 7, 20, 120))) if words[i].isdigit() else f"{rng.randint(1, 900) * 1000:,}"
+            clauses[n] = f"{label} {' '.join(words)}"
+        elif kind == "delete":
+            del clauses[n]
+        elif kind == "insert":
+            section = heading.split(".")[0]
+            clauses.insert(n, f"{section}.{len(clauses) + 1} {_clause_text(rng)}")
+        else:
+            _, target = rng.choice(revised)
+            target.insert(rng.randint(0, len(target)), clauses.pop(n))
+        edits[kind] += 1
+    return revised, edits
+
+
+# Function to generate a (reference, revision, edit_counts) contract pair
+def contract_pair(clauses, edit_rate=0.1, seed=0):
+    reference = synthetic_sections(clauses, seed)
+    revision, edits = revise(reference, edit_rate, seed + 1)
+    return reference, revision, edits
+
+
+# Function to render sections as plain text, one heading or clause per line
+def to_text(sections):
+    return "\n".join(line for heading, clauses in sections for line in (heading, *clauses))
+
+
+# Function to render sections as a .docx file with headings, clause paragraphs and a fee table under payment terms
+def to_docx(sections):
+    import docx
+    document = docx.Document()
+    document.add_heading("Master Services Agreement", 0)
+    for n, (heading, clauses) in enumerate(sections):
+        document.add_heading(heading, 1)
+        for clause in clauses:
+            document.add_paragraph(clause)
+        if "Payment" in heading:
+            table = document.add_table(rows=3, cols=2)
+            for row, (item, fee) in zip(table.rows, (("Item", "Fee"), ("Services", f"USD {(n + 1) * 1000:,}"),
+                                                   ("Support", f"USD {(n + 1) * 250:,}"))):
+                row.cells[0].text, row.cells[1].text = item, fee
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+# Function to render sections as a .pdf file with clauses wrapped across lines, as PDF text extraction sees them
+def to_pdf(sections):
+    import fitz  # PyMuPDF
+    lines = []
+    for heading, clauses in sections:
+        lines += ["", heading]
+        for clause in clauses:
+            lines += textwrap.wrap(clause, PDF_LINE_CHARS)
+    document = fitz.open()
+    for start in range(0, len(lines), PDF_PAGE_LINES):
+        page = document.new_page()
+        page.insert_text((PDF_MARGIN, PDF_MARGIN), "\n".join(lines[start:start + PDF_PAGE_LINES]), fontsize=PDF_FONT_SIZE)
+    data = document.tobytes()
+    document.close()
+    return data
+
+
+RENDERERS = {"txt": lambda sections: to_text(sections).encode(), "docx": to_docx, "pdf": to_pdf}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic reference contract and a revision of it.")
+    parser.add_argument("--clauses", type=int, default=400)
+    parser.add_argument("--edit-rate", type=float, default=0.1, help="edits per clause in the revision")
+    parser.add_argument("--formats", default="docx,pdf", help="comma separated: txt,docx,pdf")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default=".")
+    args = parser.parse_args()
+
+    reference, revision, edits = contract_pair(args.clauses, args.edit_rate, args.seed)
+    os.makedirs(args.out_dir, exist_ok=True)
+    for fmt in args.formats.split(","):
+        for name, sections in (("reference", reference), ("revision", revision)):
+            path = os.path.join(args.out_dir, f"{name}.{fmt}")
+            with open(path, "wb") as f:
+                f.write(RENDERERS[fmt](sections))
+            print(path)
+    print("edits: " + ", ".join(f"{count} {kind}" for kind, count in sorted(edits.items())))
+
+
+if __name__ == "__main__":
+    main()
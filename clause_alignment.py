@@ -0,0 +1,280 @@
+# Anchor-based ordered alignment of two clause lists, producing an edit script
+import re
+
+import numpy as np
+
+from clause_similarity import SIMILARITY_THRESHOLD, dense, top_k_similarities, transposed, vectorize_clauses
+
+# Half-width of the diagonal band searched between two anchors, in clauses
+BAND = 64
+
+# Gaps with at most this many clause pairs are scored in full instead of within the band
+MAX_DENSE_CELLS = 250_000
+
+# Rows scored per sparse product when a gap is searched within the band
+ROW_CHUNK = 256
+
+# Chain weight of a verbatim pair; above any TF-IDF score, so an exact copy wins over a rewording scoring 1.0
+VERBATIM_WEIGHT = 1.1
+
+_whitespace = re.compile(r"\s+")
+_punctuation = re.compile(r"[^\w\s]")
+
+
+# Function to normalise a clause for identity checks (case and whitespace only)
+def normalize_clause(clause):
+    return _whitespace.sub(" ", clause).strip().lower()
+
+
+# Function to build the near-exact anchor key of a clause (also ignores punctuation, keeps numbers)
+def anchor_key(clause):
+    return _whitespace.sub(" ", _punctuation.sub(" ", clause.lower())).strip()
+
+
+# Function to find anchors: clauses whose key occurs exactly once in each document
+def _unique_pairs(ref_clauses, comp_clauses):
+    ref_keys = [anchor_key(clause) for clause in ref_clauses]
+    comp_keys = [anchor_key(clause) for clause in comp_clauses]
+    ref_count, comp_at = {}, {}
+    for key in ref_keys:
+        ref_count[key] = ref_count.get(key, 0) + 1
+    for j, key in enumerate(comp_keys):
+        comp_at[key] = -1 if key in comp_at else j
+    return [
+        (i, comp_at[key]) for i, key in enumerate(ref_keys)
+        if key and ref_count[key] == 1 and comp_at.get(key, -1) >= 0
+    ]
+
+
+# Function to keep the largest set of anchor pairs that is in the same order in both documents
+def _ordered_anchors(pairs, n_ref, n_comp):
+    """
+    Returns (in_order, out_of_order). Between equally long orderings, the one whose
+    anchors keep their relative position best wins, so the clause that actually moved
+    is reported as moved rather than its neighbours.
+    """
+    if not pairs:
+        return [], []
+    tie_break = 1.0 / (len(pairs) + 1)
+    candidates = [
+        (i, j, 1.0 + tie_break * (1.0 - abs(i / n_ref - j / n_comp)))
+        for i, j in pairs
+    ]
+    in_order = [(i, j) for i, j, _ in _best_chain(candidates, n_comp)]
+    kept = set(in_order)
+    return in_order, [pair for pair in pairs if pair not in kept]
+
+
+# Function to list pairs (row, col, weight) of verbatim equal clauses between two clause subsets
+def _verbatim_candidates(ref_keys, comp_keys, rows, cols, band):
+    """Found on normalised text, so they pair even when TF-IDF has no vector for them ("(a) 5%;")."""
+    comp_at = {}
+    for c, j in enumerate(cols):
+        if comp_keys[j]:
+            comp_at.setdefault(comp_keys[j], []).append(c)
+    in_full = len(rows) * len(cols) <= MAX_DENSE_CELLS
+    slope = len(cols) / len(rows) if rows else 0.0
+    return [
+        (r, c, VERBATIM_WEIGHT) for r, i in enumerate(rows) for c in comp_at.get(ref_keys[i], ())
+        if in_full or abs(c - r * slope) <= band
+    ]
+
+
+# Function to list candidate pairs (row, col, score) between two clause subsets: verbatim pairs, then TF-IDF pairs above the threshold
+def _gap_candidates(ref_vectors, comp_vectors, ref_keys, comp_keys, rows, cols, threshold, band):
+    if not rows or not cols:
+        return []
+    verbatim = _verbatim_candidates(ref_keys, comp_keys, rows, cols, band)
+    scored = _scored_candidates(ref_vectors, comp_vectors, rows, cols, threshold, band) if ref_vectors is not None else []
+    seen = {(r, c) for r, c, _ in verbatim}
+    return verbatim + [candidate for candidate in scored if candidate[:2] not in seen]
+
+
+# Function to list TF-IDF pairs (row, col, score) above the threshold between two clause subsets
+def _scored_candidates(ref_vectors, comp_vectors, rows, cols, threshold, band):
+    n_rows, n_cols = len(rows), len(cols)
+    ref_block = ref_vectors[rows]
+    comp_t = transposed(comp_vectors[cols])
+    candidates = []
+    if n_rows * n_cols <= MAX_DENSE_CELLS:
+        scores = dense(ref_block @ comp_t)
+        for r, c in zip(*np.nonzero(scores >= threshold)):
+            candidates.append((int(r), int(c), float(scores[r, c])))
+        return candidates
+
+    # Large gap: score only a diagonal band, a chunk of rows at a time
+    slope = n_cols / n_rows
+    for start in range(0, n_rows, ROW_CHUNK):
+        stop = min(start + ROW_CHUNK, n_rows)
+        lo = max(0, int(start * slope) - band)
+        hi = min(n_cols, int(np.ceil(stop * slope)) + band + 1)
+        scores = dense(ref_block[start:stop] @ comp_t[:, lo:hi])
+        row_ids = np.arange(start, stop)[:, None]
+        col_ids = np.arange(lo, hi)[None, :]
+        in_band = np.abs(col_ids - row_ids * slope) <= band
+        for r, c in zip(*np.nonzero((scores >= threshold) & in_band)):
+            candidates.append((int(r) + start, int(c) + lo, float(scores[r, c])))
+    return candidates
+
+
+# Function to pick the highest-scoring chain of candidate pairs increasing in both documents
+def _best_chain(candidates, n_cols):
+    """Weighted longest common subsequence over sparse candidates, using a Fenwick tree of prefix maxima."""
+    if not candidates:
+        return []
+    candidates.sort()
+    tree = [(0.0, -1)] * (n_cols + 1)
+
+    def query(j):  # best chain ending in a column < j
+        best = (0.0, -1)
+        while j > 0:
+            best = max(best, tree[j])
+            j -= j & -j
+        return best
+
+    def update(j, value):
+        j += 1
+        while j <= n_cols:
+            if value > tree[j]:
+                tree[j] = value
+            j += j & -j
+
+    totals, prev = [0.0] * len(candidates), [-1] * len(candidates)
+    start = 0
+    while start < len(candidates):
+        stop = start
+        while stop < len(candidates) and candidates[stop][0] == candidates[start][0]:
+            stop += 1
+        # Query the whole row before updating so a chain never uses two pairs of the same row
+        for n in range(start, stop):
+            best, prev[n] = query(candidates[n][1])
+            totals[n] = best + candidates[n][2]
+        for n in range(start, stop):
+            update(candidates[n][1], (totals[n], n))
+        start = stop
+
+    n = max(range(len(candidates)), key=totals.__getitem__)
+    chain = []
+    while n >= 0:
+        chain.append(candidates[n])
+        n = prev[n]
+    return chain[::-1]
+
+
+# Function to align two clause lists into an ordered edit script
+def align_clauses(ref_clauses, comp_clauses, threshold=SIMILARITY_THRESHOLD, band=BAND, vectors=None):
+    """
+    Clauses equal after normalize_clause() always pair, whether or not TF-IDF
+    has a vector for them. Small documents are aligned as one highest-scoring ordered chain. Large ones are
+    anchored on clauses whose near-exact key is unique in both documents, keeping the
+    anchors that appear in the same order, and the clauses between consecutive anchors
+    are aligned within a diagonal band. Leftover deletions and insertions that match
+    each other, and out-of-order anchors, become moves.
+
+    Returns a list of ops in document order, each a dict with "op" (kept, modified,
+    inserted, deleted or moved), "ref_index", "comp_index" and "score".
+    """
+    if vectors is None and ref_clauses and comp_clauses:
+        try:
+            vectors = vectorize_clauses(ref_clauses, comp_clauses)
+        except ValueError:  # no usable vocabulary
+            vectors = None
+    ref_vectors, comp_vectors = vectors if vectors is not None else (None, None)
+    ref_keys = [normalize_clause(clause) for clause in ref_clauses]
+    comp_keys = [normalize_clause(clause) for clause in comp_clauses]
+
+    # Documents small enough to score in full are aligned in one chain; anchors only bound the work on large ones
+    anchors, out_of_order = [], []
+    if len(ref_clauses) * len(comp_clauses) > MAX_DENSE_CELLS:
+        anchors, out_of_order = _ordered_anchors(
+            _unique_pairs(ref_clauses, comp_clauses), len(ref_clauses), len(comp_clauses)
+        )
+    pinned_ref = {i for i, _ in out_of_order}
+    pinned_comp = {j for _, j in out_of_order}
+
+    def pair_op(i, j, score):
+        same = ref_keys[i] == comp_keys[j]
+        return {"op": "kept" if same else "modified", "ref_index": i, "comp_index": j, "score": 1.0 if same else score}
+
+    script = []
+    bounds = anchors + [(len(ref_clauses), len(comp_clauses))]
+    ref_pos = comp_pos = 0
+    for anchor_ref, anchor_comp in bounds:
+        gap_ref = list(range(ref_pos, anchor_ref))
+        gap_comp = list(range(comp_pos, anchor_comp))
+        rows = [i for i in gap_ref if i not in pinned_ref]
+        cols = [j for j in gap_comp if j not in pinned_comp]
+        chain = _best_chain(_gap_candidates(ref_vectors, comp_vectors, ref_keys, comp_keys, rows, cols, threshold, band), len(cols))
+
+        next_ref, next_comp = ref_pos, comp_pos
+        for r, c, score in chain + [(None, None, None)]:
+            i = rows[r] if r is not None else anchor_ref
+            j = cols[c] if c is not None else anchor_comp
+            script.extend({"op": "deleted", "ref_index": x, "comp_index": None, "score": None} for x in range(next_ref, i))
+            script.extend({"op": "inserted", "ref_index": None, "comp_index": y, "score": None} for y in range(next_comp, j))
+            if r is not None:
+                script.append(pair_op(i, j, score))
+                next_ref, next_comp = i + 1, j + 1
+
+        if anchor_ref < len(ref_clauses):
+            script.append(pair_op(anchor_ref, anchor_comp, 1.0))
+        ref_pos, comp_pos = anchor_ref + 1, anchor_comp + 1
+
+    return _detect_moves(script, out_of_order, ref_keys, comp_keys, ref_vectors, comp_vectors, threshold)
+
+
+# Function to turn deleted/inserted pairs that hold the same clause into moves
+def _detect_moves(script, out_of_order, ref_keys, comp_keys, ref_vectors, comp_vectors, threshold):
+    moved = {i: (j, 1.0) for i, j in out_of_order}
+    taken = {j for j, _ in moved.values()}
+
+    # Verbatim copies first, then the closest TF-IDF matches
+    inserted_at = {}
+    for op in script:
+        if op["op"] == "inserted" and op["comp_index"] not in taken and comp_keys[op["comp_index"]]:
+            inserted_at.setdefault(comp_keys[op["comp_index"]], []).append(op["comp_index"])
+    for op in script:
+        if op["op"] == "deleted" and op["ref_index"] not in moved and inserted_at.get(ref_keys[op["ref_index"]]):
+            j = inserted_at[ref_keys[op["ref_index"]]].pop(0)
+            moved[op["ref_index"]] = (j, 1.0)
+            taken.add(j)
+
+    deleted = [op["ref_index"] for op in script if op["op"] == "deleted" and op["ref_index"] not in moved]
+    inserted = [op["comp_index"] for op in script if op["op"] == "inserted" and op["comp_index"] not in taken]
+    if ref_vectors is not None and deleted and inserted:
+        best, scores, _, _ = top_k_similarities(ref_vectors[deleted], comp_vectors[inserted], k=3)
+        candidates = sorted(
+            ((float(scores[r, n]), r, int(best[r, n]))
+             for r in range(len(deleted)) for n in range(best.shape[1]) if scores[r, n] >= threshold),
+            reverse=True
+        )
+        for score, r, c in candidates:
+            if deleted[r] in moved or inserted[c] in taken:
+                continue
+            moved[deleted[r]] = (inserted[c], score)
+            taken.add(inserted[c])
+
+    if not moved:
+        return script
+    comp_to_ref = {j: (i, score) for i, (j, score) in moved.items()}
+    result = []
+    for op in script:
+        if op["op"] == "deleted" and op["ref_index"] in moved:
+            continue
+        if op["op"] == "inserted" and op["comp_index"] in comp_to_ref:
+            i, score = comp_to_ref[op["comp_index"]]
+            op = {"op": "moved", "ref_index": i, "comp_index": op["comp_index"], "score": score}
+        result.append(op)
+    return result
+
+
+# Function to classify clauses as missing, new or matched from the ordered alignment
+def match_clauses_aligned(ref_clauses, comp_clauses, threshold=SIMILARITY_THRESHOLD, vectors=None):
+    """Drop-in for clause_similarity.match_clauses: returns (missing_clauses, new_clauses, matches)."""
+    script = align_clauses(ref_clauses, comp_clauses, threshold=threshold, vectors=vectors)
+    missing_clauses = [ref_clauses[op["ref_index"]] for op in script if op["op"] == "deleted"]
+    new_clauses = [comp_clauses[op["comp_index"]] for op in script if op["op"] == "inserted"]
+    matches = sorted(
+        (op["ref_index"], op["score"]) for op in script if op["op"] in ("kept", "modified", "moved")
+    )
+    return missing_clauses, new_clauses, [(ref_clauses[i], score) for i, score in matches]
@@ -0,0 +1,54 @@
+# Local clause alignment that finds the changed, missing and new clauses between two documents
+from clause_alignment import align_clauses
+from clause_similarity import SIMILARITY_THRESHOLD
+from map_reduce import split_clauses
+from tracing import traced
+
+# Words of the preceding reference clause kept as context for each change
+CONTEXT_WORDS = 25
+
+
+# Function to align the clauses of two documents and classify the differences
+@traced()
+def diff_clauses(ref_text, comp_text, threshold=SIMILARITY_THRESHOLD, template=None):
+    """
+    Returns a dict with the clause lists, the ordered edit script and the differences:
+      "modified": (ref_index, comp_index, score) for clauses reworded in place
+      "moved":    (ref_index, comp_index, score) for clauses found at another position
+      "deleted":  ref indexes with no counterpart in the comparison file
+      "inserted": comp indexes with no counterpart in the reference file
+      "unchanged": number of reference clauses kept verbatim in place
+    template, a reference_index.load_template() result for ref_text, supplies the reference
+    clauses and their stored TF-IDF vectors, so only the comparison document is processed.
+    """
+    comp_clauses = split_clauses(comp_text)
+    if template is not None:
+        from reference_index import template_vectors
+        ref_clauses = template["clauses"]
+        vectors = template_vectors(template, comp_clauses) if comp_clauses else None
+    else:
+        ref_clauses = split_clauses(ref_text)
+        vectors = None
+    script = align_clauses(ref_clauses, comp_clauses, threshold=threshold, vectors=vectors)
+
+    def pairs(op_name):
+        return [(op["ref_index"], op["comp_index"], op["score"]) for op in script if op["op"] == op_name]
+
+    return {
+        "ref_clauses": ref_clauses,
+        "comp_clauses": comp_clauses,
+        "script": script,
+        "modified": pairs("modified"),
+        "moved": pairs("moved"),
+        "deleted": [op["ref_index"] for op in script if op["op"] == "deleted"],
+        "inserted": [op["comp_index"] for op in script if op["op"] == "inserted"],
+        "unchanged": sum(op["op"] == "kept" for op in script),
+    }
+
+
+# Function to return the lead-in of the clause before index i, used as context for a change
+def clause_context(clauses, i, max_words=CONTEXT_WORDS):
+    if i <= 0:
+        return ""
+    words = clauses[i - 1].split()
+    return " ".join(words[:max_words]) + (" ..." if len(words) > max_words else "")
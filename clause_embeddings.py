@@ -0,0 +1,151 @@
+# Embedding comparison backend: batch-encoded sentence embeddings cached per clause as compact int8/float16 vectors.
+# Unlike TF-IDF it scores paraphrased clauses as matches and never refits a vocabulary.
+import hashlib
+import importlib.util
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+
+from clause_index import EMBEDDING_MODEL, encode
+from clause_similarity import SIMILARITY_THRESHOLD, vectorize_clauses
+from tracing import traced
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".embedding_cache.sqlite3")
+
+# Storage of cached vectors: "int8" (1 byte per dimension and a scale per clause) or "float16" (2 bytes per dimension)
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "int8")
+
+# Clauses encoded per model forward pass
+BATCH_SIZE = 64
+
+# Cosine similarity from which two clauses count as the same clause; embeddings of unrelated clauses
+# from one contract score higher than their TF-IDF vectors do, so the bar is above SIMILARITY_THRESHOLD
+EMBEDDING_THRESHOLD = 0.8
+
+# Cached rows fetched per query, below SQLite's bound parameter limit
+LOOKUP_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    hash TEXT PRIMARY KEY,
+    dtype TEXT NOT NULL,
+    scale REAL NOT NULL,
+    vector BLOB NOT NULL
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+# Function to open the embedding cache for one transaction, creating it on first use
+@contextmanager
+def _connect(path=None):
+    connection = sqlite3.connect(path or EMBEDDING_CACHE_PATH, timeout=10)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+# Function to hash a clause for the cache; whitespace differences share one entry, other models get their own
+def embedding_key(clause, model=EMBEDDING_MODEL):
+    return hashlib.sha256(f"{model}\0{' '.join(clause.split())}".encode("utf-8")).hexdigest()
+
+
+# Function to compress float32 rows: int8 codes with one scale per row, or float16 rows with unit scales
+def quantize(vectors, dtype=EMBEDDING_DTYPE):
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+# Function to restore L2-normalised float32 rows from quantized codes and their scales
+def dequantize(codes, scales):
+    vectors = codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+# Function to read cached vectors by key; returns {key: float32 row}
+def _cached(keys, path=None):
+    found = {}
+    with _connect(path) as connection:
+        for start in range(0, len(keys), LOOKUP_CHUNK):
+            chunk = keys[start:start + LOOKUP_CHUNK]
+            rows = connection.execute(
+                f"SELECT hash, dtype, scale, vector FROM embeddings WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, dtype, scale, blob in rows:
+                found[key] = dequantize(np.frombuffer(blob, dtype=dtype)[None, :], [scale])[0]
+    return found
+
+
+# Function to embed clauses, encoding only those missing from the cache, in batches
+def embed(clauses, model=EMBEDDING_MODEL, dtype=None, path=None):
+    """
+    Returns L2-normalised float32 rows, one per clause. New clauses are encoded together
+    and stored quantized; they are scored from the quantized vectors too, so a first run
+    and a cached run give the same results. The cache is skipped if SQLite fails.
+    """
+    keys = [embedding_key(clause, model) for clause in clauses]
+    unique = list(dict.fromkeys(keys))
+    try:
+        found = _cached(unique, path)
+    except sqlite3.Error as e:
+        logger.warning("Embedding cache unavailable: %s", e)
+        found, path = {}, False
+
+    missing = {key: clause for key, clause in zip(keys, clauses) if key not in found}
+    if missing:
+        codes, scales = quantize(encode(list(missing.values()), model, batch_size=BATCH_SIZE), dtype or EMBEDDING_DTYPE)
+        found.update(zip(missing, dequantize(codes, scales)))
+        if path is not False:
+            try:
+                with _connect(path) as connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                        [(key, codes.dtype.name, float(scale), code.tobytes())
+                         for key, code, scale in zip(missing, codes, scales)]
+                    )
+            except sqlite3.Error as e:
+                logger.warning("Could not update the embedding cache: %s", e)
+    if not keys:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([found[key] for key in keys])
+
+
+# Function to embed both clause lists in one batch, like clause_similarity.vectorize_clauses
+@traced()
+def embed_clauses(ref_clauses, comp_clauses):
+    vectors = embed(list(ref_clauses) + list(comp_clauses))
+    return vectors[:len(ref_clauses)], vectors[len(ref_clauses):]
+
+
+# Clause comparison backends: name -> (label, vectorize(ref_clauses, comp_clauses), similarity threshold)
+BACKENDS = {
+    "tfidf": ("TF-IDF (same wording)", vectorize_clauses, SIMILARITY_THRESHOLD),
+    "embeddings": ("Sentence embeddings (also matches paraphrases)", embed_clauses, EMBEDDING_THRESHOLD),
+}
+
+
+# Function to list the backends usable here; embeddings need sentence_transformers installed
+def available_backends():
+    if importlib.util.find_spec("sentence_transformers") is None:
+        return ["tfidf"]
+    return list(BACKENDS)
+
+
+# Function to report the number of cached embeddings and their storage size in bytes
+def cache_stats(path=None):
+    with _connect(path) as connection:
+        count, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+    return {"entries": count, "bytes": size}
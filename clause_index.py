@@ -0,0 +1,64 @@
+# Clause-level embedding index for retrieving the clauses relevant to a question
+import threading
+import time
+
+import numpy as np
+
+from map_reduce import split_clauses
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Clauses retrieved from each document per question
+TOP_K = 5
+
+# Loaded sentence-transformers models, shared by every Streamlit session in the process
+_models = {}
+_models_lock = threading.Lock()
+
+
+# Function to return a loaded embedding model, loading it on first use only
+def get_embedding_model(model=EMBEDDING_MODEL):
+    encoder = _models.get(model)
+    if encoder is None:
+        with _models_lock:
+            encoder = _models.get(model)
+            if encoder is None:
+                from sentence_transformers import SentenceTransformer
+                encoder = SentenceTransformer(model)
+                _models[model] = encoder
+    return encoder
+
+
+# Function to embed texts as L2-normalised float32 rows
+def encode(texts, model=EMBEDDING_MODEL, batch_size=64):
+    encoder = get_embedding_model(model)
+    vectors = encoder.encode(list(texts), batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+# Function to build the clause index of one document
+def build_clause_index(text, model=EMBEDDING_MODEL):
+    """Returns {"clauses": [...], "embeddings": array of shape (n_clauses, dim)}."""
+    clauses = split_clauses(text)
+    embeddings = encode(clauses, model) if clauses else np.zeros((0, 0), dtype=np.float32)
+    return {"clauses": clauses, "embeddings": embeddings}
+
+
+# Function to return the top-k clauses of an index for a query embedding, in document order
+def retrieve(index, query_vector, top_k=TOP_K):
+    if not index["clauses"]:
+        return []
+    scores = index["embeddings"] @ query_vector
+    k = min(top_k, len(scores))
+    best = np.argpartition(-scores, k - 1)[:k]
+    return [(index["clauses"][i], float(scores[i])) for i in sorted(best)]
+
+
+# Function to retrieve the clauses of both documents that are relevant to a question
+def retrieve_for_question(question, ref_index, comp_index, top_k=TOP_K, model=EMBEDDING_MODEL):
+    """Returns (ref_hits, comp_hits, retrieval_seconds); hits are (clause, score) in document order."""
+    start = time.perf_counter()
+    query_vector = encode([question], model)[0]
+    ref_hits = retrieve(ref_index, query_vector, top_k)
+    comp_hits = retrieve(comp_index, query_vector, top_k)
+    return ref_hits, comp_hits, time.perf_counter() - start
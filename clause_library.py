@@ -0,0 +1,192 @@
+# Persistent MinHash/LSH library of reviewed clauses, used to flag boilerplate seen in earlier contracts
+import hashlib
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+LIBRARY_PATH = os.getenv("CLAUSE_LIBRARY_PATH", ".clause_library.sqlite3")
+
+# Words per shingle; clauses are compared as sets of overlapping word triples
+SHINGLE_WORDS = 3
+
+# MinHash signature length, split into LSH bands of equal rows
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Estimated shingle similarity from which a clause counts as near-identical to a reviewed one
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Clauses shorter than this are too generic to flag
+MIN_WORDS = 4
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_perm_a = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_perm_b = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clauses (
+    id INTEGER PRIMARY KEY,
+    text_hash TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    source TEXT NOT NULL,
+    document TEXT NOT NULL,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    clause_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket);
+"""
+
+
+# Function to open the library database for one transaction, creating it on first use
+@contextmanager
+def _connect(path=None):
+    connection = sqlite3.connect(path or LIBRARY_PATH, timeout=10)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+# Function to hash a clause's normalised text for exact duplicate checks
+def clause_hash(clause):
+    return hashlib.sha256(" ".join(clause.lower().split()).encode("utf-8")).hexdigest()
+
+
+# Function to compute the MinHash signature of a clause, or None when it is too short to flag
+def signature(clause):
+    words = clause.lower().split()
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_perm_a[:, None] * hashes[None, :] + _perm_b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+# Function to turn a signature into its LSH bucket per band
+def band_buckets(sig):
+    return [
+        (band, int.from_bytes(hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+                              "big", signed=True))
+        for band in range(BANDS)
+    ]
+
+
+# Function to add a document's clauses to the library; clauses already in it are skipped
+def add_clauses(clauses, source="", document="", path=None):
+    """Returns the number of clauses newly added. document identifies the contract, e.g. by content digest."""
+    now = time.time()
+    added = 0
+    with _connect(path) as connection:
+        for clause in clauses:
+            sig = signature(clause)
+            if sig is None:
+                continue
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO clauses (text_hash, text, signature, source, document, added) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (clause_hash(clause), clause, sig.tobytes(), source, document, now)
+            )
+            if not cursor.rowcount:
+                continue
+            connection.executemany(
+                "INSERT INTO buckets VALUES (?, ?, ?)",
+                [(band, bucket, cursor.lastrowid) for band, bucket in band_buckets(sig)]
+            )
+            added += 1
+    return added
+
+
+# Function to find, for each clause, the most similar reviewed clause in the library
+def lookup(clauses, threshold=NEAR_DUPLICATE_THRESHOLD, exclude_document=None, path=None):
+    """
+    Returns one entry per clause: None when nothing similar was reviewed before, otherwise
+    a dict with "clause_id", "text", "source", "similarity" and "identical". Similarity is
+    1.0 for identical text and the MinHash estimate of shingle overlap otherwise.
+    Clauses first added from exclude_document are ignored, so a contract never matches itself.
+    """
+    results = [None] * len(clauses)
+    signatures = {}
+    with _connect(path) as connection:
+        for n, clause in enumerate(clauses):
+            sig = signature(clause)
+            if sig is None:
+                continue
+            row = connection.execute(
+                "SELECT id, text, source FROM clauses WHERE text_hash=? AND document IS NOT ?",
+                (clause_hash(clause), exclude_document)
+            ).fetchone()
+            if row:
+                results[n] = {"clause_id": row[0], "text": row[1], "source": row[2], "similarity": 1.0, "identical": True}
+            else:
+                signatures[n] = sig
+        if not signatures:
+            return results
+
+        # Collect every candidate sharing at least one band bucket in a single join
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS probes (n INTEGER, band INTEGER, bucket INTEGER)")
+        connection.execute("DELETE FROM probes")
+        connection.executemany(
+            "INSERT INTO probes VALUES (?, ?, ?)",
+            [(n, band, bucket) for n, sig in signatures.items() for band, bucket in band_buckets(sig)]
+        )
+        rows = connection.execute(
+            "SELECT DISTINCT probes.n, clauses.id, clauses.text, clauses.source, clauses.signature "
+            "FROM probes JOIN buckets ON buckets.band = probes.band AND buckets.bucket = probes.bucket "
+            "JOIN clauses ON clauses.id = buckets.clause_id WHERE clauses.document IS NOT ?",
+            (exclude_document,)
+        ).fetchall()
+
+    for n, clause_id, text, source, blob in rows:
+        similarity = float(np.mean(signatures[n] == np.frombuffer(blob, dtype=np.uint32)))
+        best = results[n]
+        if similarity >= threshold and (best is None or similarity > best["similarity"]):
+            results[n] = {"clause_id": clause_id, "text": text, "source": source,
+                          "similarity": similarity, "identical": False}
+    return results
+
+
+# Function to report the library size
+def library_stats(path=None):
+    with _connect(path) as connection:
+        clauses = connection.execute("SELECT COUNT(*) FROM clauses").fetchone()[0]
+    return {"clauses": clauses}
+
+
+# Function to delete every clause from the library
+def clear(path=None):
+    with _connect(path) as connection:
+        connection.execute("DELETE FROM buckets")
+        connection.execute("DELETE FROM clauses")
+
+
+# Function to settle clause pairs without scoring: one reference and one comparison clause identical to the same reviewed clause
+def settle_reviewed(ref_known, comp_known):
+    """
+    Takes two lookup() results and returns the settled (reference, comparison) clause positions.
+    Pairs are taken one to one and only for identical text, so a near-duplicate, or a second
+    copy with no counterpart, is still compared.
+    """
+    comp_at = {}
+    for n, match in enumerate(comp_known):
+        if match and match["identical"]:
+            comp_at.setdefault(match["clause_id"], []).append(n)
+    ref_settled, comp_settled = set(), set()
+    for n, match in enumerate(ref_known):
+        if match and match["identical"] and comp_at.get(match["clause_id"]):
+            ref_settled.add(n)
+            comp_settled.add(comp_at[match["clause_id"]].pop(0))
+    return ref_settled, comp_settled
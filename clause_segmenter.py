@@ -0,0 +1,128 @@
+# Legal clause segmentation: numbered clauses, sub-clauses and headings, with precompiled patterns and stopwords
+import re
+
+# Units longer than this many words are split further at sentence boundaries
+MAX_CLAUSE_WORDS = 120
+
+# NLTK's English stopword list, minus the negations that change what a clause means ("shall not", "no later than")
+STOPWORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves he him his
+himself she she's her hers herself it it's its itself they them their theirs themselves what which who whom this
+that that'll these those am is are was were be been being have has had having do does did doing a an the and but
+if or because as until while of at by for with about against between into through during before after above below
+to from up down in out on off over under again further then once here there when where why how all any both each
+few more most other some such only own same so than too very s t can will just don should should've now d ll m o re ve
+y ain ma
+""".split())
+
+# Clause numbering at the start of a line: 1. / 1.1 / 1.1.2 / (a) / (ii) / a) / IV. / A. / Section 4 / Article 12
+# A bare number is a marker only after a heading word, so a wrapped line starting "30 days" is not a clause number
+_marker = re.compile(
+    r"^(?:(?:section|clause|article|schedule|part|annex|exhibit|appendix)\s+)?"
+    r"(\d{1,3}(?:\.\d{1,3})+\.?|\d{1,3}\.|(?<=[a-z]\s)\d{1,3}|\((?:[a-z]{1,2}|[ivxlc]{1,6}|\d{1,3})\)|[a-z]\)|[ivxlc]{1,6}\.|[IVXLC]{1,6}\.|[A-Z]\.)"
+    r"(?=\s|$)",
+    re.IGNORECASE
+)
+# Sub-clause lists inside a line, after a colon or semicolon: "shall: (a) deliver; (b) invoice"
+_inline_marker = re.compile(r"(?<=[:;])\s+(?=\((?:[a-z]{1,2}|[ivx]{1,5}|\d{1,2})\)\s)")
+_heading_word = re.compile(r"^(?:section|clause|article|schedule|part|annex|exhibit|appendix)\b", re.IGNORECASE)
+_sentence_end = re.compile(r"[.!?][\"')\]]*\s+(?=[A-Z(\"'])")
+_last_word = re.compile(r"(\S+)$")
+_abbreviations = frozenset(
+    "no nos co corp inc ltd llc plc art arts sec secs para paras cl vs etc e.g i.e viz mr mrs ms dr st approx u.s u.k".split()
+)
+_terminal = ".;:!?"
+
+
+# Function to decide whether a line reads as a heading rather than clause text
+def is_heading(line):
+    if len(line) > 80 or line[-1] in _terminal or "|" in line:
+        return False
+    words = line.split()
+    if len(words) > 10:
+        return False
+    if _heading_word.match(line) or line.isupper():
+        return True
+    marker = _marker.match(line)
+    rest = words[1:] if marker else words
+    return bool(rest) and all(word[0].isupper() or not word[0].isalpha() or len(word) <= 3 for word in rest)
+
+
+# Function to split a unit that is too long at sentence ends, ignoring abbreviations like "No." or "Inc."
+def _split_sentences(unit):
+    sentences, start = [], 0
+    for match in _sentence_end.finditer(unit):
+        word = _last_word.search(unit, start, match.start() + 1)
+        if word and word.group(1).rstrip(".").lower() in _abbreviations:
+            continue
+        sentences.append(unit[start:match.start() + 1].strip())
+        start = match.end()
+    sentences.append(unit[start:].strip())
+    return [sentence for sentence in sentences if sentence]
+
+
+# Function to decide whether line continues previous, a line wrapped mid-sentence
+def _continues(previous, line):
+    if not previous or _marker.match(line) or "|" in previous or "|" in line or is_heading(previous):
+        return False
+    return (previous[-1] not in _terminal and not is_heading(line)) or line[0].islower()
+
+
+# Function to split document text into paragraphs, joining lines wrapped mid-sentence (as in PDF text)
+def paragraphs(text):
+    """
+    A line is joined to the previous one when it starts lowercase, or when the previous line has no
+    terminal punctuation and neither line is a heading; clause numbers and table rows always start anew.
+    No clause unit spans two paragraphs, so segmenting them one by one gives the same clauses as the whole text.
+    """
+    lines = []
+    for raw in text.split("\n"):
+        line = raw.strip()
+        if not line:
+            lines.append(None)  # a blank line always ends the current unit
+        elif lines and _continues(lines[-1], line):
+            lines[-1] = f"{lines[-1]} {line}"  # continuation of a wrapped line
+        else:
+            lines.append(line)
+    return [line for line in lines if line is not None]
+
+
+# Function to segment document text into clause units in document order
+def segment(text):
+    """
+    Returns a list of dicts with "label" (the clause number, e.g. "4.2" or "(a)", or ""),
+    "kind" ("heading" or "clause"), "section" (the nearest heading above) and "text".
+    Lines wrapped mid-sentence (as in PDF text) are joined as in paragraphs(), so a numbered
+    clause stays one unit until it ends a sentence before another line or the next number
+    starts; sub-clause lists after ":" or ";" are split.
+    """
+    units, section = [], ""
+    for line in paragraphs(text):
+        if is_heading(line):
+            marker = _marker.match(line)
+            section = line
+            units.append({"label": marker.group(1).rstrip(".") if marker else "", "kind": "heading",
+                          "section": section, "text": line})
+            continue
+        for part in _inline_marker.split(line):
+            pieces = _split_sentences(part) if len(part.split()) > MAX_CLAUSE_WORDS else [part]
+            for n, piece in enumerate(pieces):
+                marker = _marker.match(piece) if n == 0 else None
+                units.append({"label": marker.group(1).rstrip(".") if marker else "", "kind": "clause",
+                              "section": section, "text": piece})
+    return units
+
+
+# Function to return the clause texts of a document
+def segment_clauses(text):
+    return [unit["text"] for unit in segment(text)]
+
+
+# Function to segment and normalise clauses for TF-IDF comparison: lowercase, stopwords removed
+def preprocess_clauses(text):
+    """Lowercases all clauses in one pass, then drops stopwords with a single set lookup per word."""
+    clauses = segment_clauses(text)
+    if not clauses:
+        return []
+    lowered = "\n".join(clauses).lower().split("\n")
+    return [" ".join(word for word in clause.split() if word not in STOPWORDS) for clause in lowered]
@@ -0,0 +1,96 @@
+# Batched clause similarity engine shared by the clause comparison tools
+import numpy as np
+
+from tracing import traced
+
+# Clauses scoring below this against every clause of the other document are reported as missing/new
+SIMILARITY_THRESHOLD = 0.7
+
+# Number of reference clauses scored per block; bounds the dense block at CHUNK_SIZE x len(comp_clauses)
+CHUNK_SIZE = 512
+
+
+# Function to vectorize both clause lists over one shared vocabulary
+@traced()
+def vectorize_clauses(ref_clauses, comp_clauses):
+    """Returns L2-normalised TF-IDF rows for both documents, so a dot product is a cosine similarity."""
+    from sklearn.feature_extraction.text import TfidfVectorizer  # imported on first comparison, keeps app start fast
+    vectorizer = TfidfVectorizer(norm="l2", dtype=np.float32)
+    vectors = vectorizer.fit_transform(list(ref_clauses) + list(comp_clauses)).tocsr()
+    return vectors[:len(ref_clauses)], vectors[len(ref_clauses):]
+
+
+# Function to transpose vectors for column slicing: CSC for sparse TF-IDF rows, a plain array for dense embeddings
+def transposed(vectors):
+    return vectors.T.tocsc() if hasattr(vectors, "tocsc") else np.ascontiguousarray(vectors.T)
+
+
+# Function to return a block of similarity scores as a dense array
+def dense(block):
+    return block.toarray() if hasattr(block, "toarray") else block
+
+
+# Function to pick the k highest scores of every row, best first
+def _top_k_rows(scores, k):
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    top = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-top, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+# Function to score all clause pairs in both directions from a single chunked matrix product
+def top_k_similarities(ref_vectors, comp_vectors, k=1, chunk_size=CHUNK_SIZE):
+    """
+    Computes ref x comp cosine similarities block by block and keeps the top-k
+    matches of every reference clause (row-wise) and every comparison clause
+    (column-wise) from the same blocks. Returns (ref_idx, ref_scores, comp_idx,
+    comp_scores), each of shape (n_clauses, <=k). Vectors may be sparse TF-IDF
+    rows or dense embedding rows.
+    """
+    n_ref, n_comp = ref_vectors.shape[0], comp_vectors.shape[0]
+    comp_t = transposed(comp_vectors)
+
+    ref_idx = np.zeros((n_ref, min(k, n_comp)), dtype=np.int64)
+    ref_scores = np.zeros((n_ref, min(k, n_comp)), dtype=np.float32)
+    comp_idx = np.zeros((n_comp, 0), dtype=np.int64)
+    comp_scores = np.zeros((n_comp, 0), dtype=np.float32)
+
+    for start in range(0, n_ref, chunk_size):
+        stop = min(start + chunk_size, n_ref)
+        block = dense(ref_vectors[start:stop] @ comp_t)
+
+        ref_idx[start:stop], ref_scores[start:stop] = _top_k_rows(block, k)
+
+        # Merge this block's best reference rows for every comparison clause with the running top-k
+        block_idx, block_scores = _top_k_rows(block.T, k)
+        cand_idx = np.hstack([comp_idx, block_idx + start])
+        cand_scores = np.hstack([comp_scores, block_scores])
+        keep, comp_scores = _top_k_rows(cand_scores, k)
+        comp_idx = np.take_along_axis(cand_idx, keep, axis=1)
+
+    return ref_idx, ref_scores, comp_idx, comp_scores
+
+
+# Function to classify clauses as missing, new or matched in one pass
+def match_clauses(ref_clauses, comp_clauses, threshold=SIMILARITY_THRESHOLD, chunk_size=CHUNK_SIZE, vectors=None):
+    """
+    Returns (missing_clauses, new_clauses, matches) where matches holds
+    (ref_clause, score) for every reference clause at or above the threshold.
+    vectors may pass a cached vectorize_clauses() result for the same clause lists.
+    """
+    if not ref_clauses or not comp_clauses:
+        return list(ref_clauses), list(comp_clauses), []
+
+    ref_vectors, comp_vectors = vectors or vectorize_clauses(ref_clauses, comp_clauses)
+    _, ref_scores, _, comp_scores = top_k_similarities(ref_vectors, comp_vectors, k=1, chunk_size=chunk_size)
+    ref_best = ref_scores[:, 0]
+    comp_best = comp_scores[:, 0]
+
+    missing_clauses = [ref_clauses[i] for i in np.flatnonzero(ref_best < threshold)]
+    new_clauses = [comp_clauses[i] for i in np.flatnonzero(comp_best < threshold)]
+    matches = [(ref_clauses[i], float(ref_best[i])) for i in np.flatnonzero(ref_best >= threshold)]
+    return missing_clauses, new_clauses, matches
@@ -0,0 +1,434 @@
+# LLM-backed document analysis helpers used by the Doc-Insight app
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from clause_diff import clause_context, diff_clauses
+from clause_index import TOP_K, retrieve_for_question
+from clause_similarity import top_k_similarities, vectorize_clauses
+from llm_client import chat_completion
+from map_reduce import MAX_CONCURRENCY, align_chunk_pairs, map_reduce, split_clauses
+from token_budget import choose_model, collapse_identical, compress_whitespace, count_tokens
+from tracing import in_current_trace
+
+# Preferred model; prompts too long for its context move to the next model in token_budget.MODEL_CONTEXTS
+MODEL = "gpt-3.5-turbo"
+
+# Note added to prompts whose Comparison file has clauses replaced by placeholders
+COLLAPSED_NOTE = "Comparison file clauses that are word for word the same as in the Reference file are shown as [identical to the Reference file] placeholders."
+
+COMPARISON_SYSTEM_MESSAGE = "You are an expert in legal document comparison."
+QUESTION_SYSTEM_MESSAGE = "You are an expert assistant in document analysis."
+SUMMARY_SYSTEM_MESSAGE = "You are an expert summarizer."
+
+# Output instructions shared by the single-prompt comparison and the map-reduce merge step
+COMPARISON_INSTRUCTIONS = """
+        Provide a concise summary of the key differences in terms of structure, content, and meaning in a bullet point format, limit only to clause which has difference. 
+        Provide potential impacts of each change below the differences. 
+
+        Provide a recommended negotiation strategy or plan (max 5 bullet points) to address these changes with the supplier in a separate section. 
+        Prioritize the clauses from very important to less important to optimize negotiations.
+        
+        in case of payment term difference , then provide cost of finance or fincial impact based on wapt calculation and explain the financial imapct in real numbers for a period of one year. in the absence of contract value use USD 1000000 as base value for comparison use interest rate in USA or Canada for calculation. If query is not related to payment term avoid this fiancial impact due to payment term.
+        
+        use the following template as example to generate your response for all clause where there is a difference, provide one line space between each points for better readbility: 
+        Key Differences:
+        
+        1.	**PaymenClaut Terms:** The original agreement allows the client xx days to pay invoices, while the revised agreement reduces this to xx days.
+            o	Financial Impact: Using an interest rate of y% (average rate in the USA), the cost of financing the payment for xx days would be approximately x,xxx.xx  per year for a assumed contract value of USD x,xxx,xxx.  
+
+
+
+        **Recommended Negotiation Strategy:**
+
+        1.	Prioritize negotiation on Payment Terms due to the significant financial impact of shorter payment timelines.
+        2.	Discuss and align on the Termination Notice Period to ensure sufficient time for transitioning services if termination occurs.
+        3.	Clarify the implications of the fixed Term Duration and assess if it aligns with the long-term goals of both parties.
+        4.	Address concerns regarding Jurisdiction and Venue to ensure a fair and accessible legal framework for both parties.
+        5.	Revisit the Notice Address section to determine the preferred mode of communication and update as necessary for effective correspondence.
+
+       """
+
+
+# Function to build the chat messages for a prompt, with its whitespace compressed
+def build_messages(system_message, prompt):
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": compress_whitespace(prompt)}
+    ]
+
+
+# Function to send one chat request and return the reply text (raises on API errors)
+def chat(system_message, prompt, temperature, on_token=None, label=None, use_cache=True):
+    """Counts the prompt tokens locally first and raises PromptTooLarge, without a request, when no model fits."""
+    messages = build_messages(system_message, prompt)
+    model, prompt_tokens = choose_model(messages, MODEL)
+    return chat_completion(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        on_token=on_token,
+        label=label,
+        use_cache=use_cache,
+        estimated_tokens=prompt_tokens
+    )
+
+
+# Function to count the tokens of a prompt as it will be sent
+def count_prompt_tokens(prompt):
+    return count_tokens(compress_whitespace(prompt), MODEL)
+
+
+# Function to check a prompt against the token budget before sending it
+def prompt_budget(system_message, prompt):
+    """Returns (model, prompt_tokens) for the model the prompt would be sent to; raises PromptTooLarge."""
+    return choose_model(build_messages(system_message, prompt), MODEL)
+
+
+# Function to build the full-document comparison prompt
+def build_comparison_prompt(doc1, doc2):
+    doc2, collapsed = collapse_identical(doc1, doc2)
+    return f"""
+        Compare the following two documents and summarize the key changes:
+        {COLLAPSED_NOTE if collapsed else ""}
+
+        Reference file:
+        {doc1}
+
+        Comparison file:
+        {doc2}
+{COMPARISON_INSTRUCTIONS}"""
+
+# Function to build a comparison prompt from only the clauses that differ
+def build_diff_comparison_prompt(diff):
+    ref_clauses, comp_clauses = diff["ref_clauses"], diff["comp_clauses"]
+    sections = []
+    if diff["modified"]:
+        lines = []
+        for n, (i, j, _) in enumerate(diff["modified"], 1):
+            context = clause_context(ref_clauses, i)
+            lines.append(f"{n}. " + (f"(follows: {context})\n" if context else "")
+                         + f"Reference file: {ref_clauses[i]}\nComparison file: {comp_clauses[j]}")
+        sections.append("Clauses reworded in the Comparison file:\n" + "\n\n".join(lines))
+    if diff["moved"]:
+        lines = []
+        for n, (i, j, _) in enumerate(diff["moved"], 1):
+            moved_text = "" if comp_clauses[j] == ref_clauses[i] else f"\nComparison file: {comp_clauses[j]}"
+            lines.append(f"{n}. Reference clause {i + 1} is now clause {j + 1}: {ref_clauses[i]}{moved_text}")
+        sections.append("Clauses moved to another position in the Comparison file:\n" + "\n\n".join(lines))
+    if diff["deleted"]:
+        sections.append("Clauses of the Reference file missing from the Comparison file:\n"
+                        + "\n".join(f"- {ref_clauses[i]}" for i in diff["deleted"]))
+    if diff["inserted"]:
+        sections.append("Clauses only in the Comparison file:\n"
+                        + "\n".join(f"- {comp_clauses[j]}" for j in diff["inserted"]))
+    changes = "\n\n".join(sections)
+    return f"""
+        Compare the following two documents and summarize the key changes.
+        Only the clauses that differ are listed below; the other {diff["unchanged"]} clauses are identical in both files.
+
+{changes}
+{COMPARISON_INSTRUCTIONS}"""
+
+
+# Function to find the most similar Reference file clause for each paragraph, or "" when none shares a word
+def reference_counterparts(doc1, paragraphs):
+    ref_clauses = split_clauses(doc1)
+    if not ref_clauses or not paragraphs:
+        return [""] * len(paragraphs)
+    _, _, comp_idx, comp_scores = top_k_similarities(*vectorize_clauses(ref_clauses, paragraphs), k=1)
+    return [ref_clauses[i] if score > 0 else "" for i, score in zip(comp_idx[:, 0], comp_scores[:, 0])]
+
+
+# Function to build a prompt that updates the previous draft's comparison with the paragraphs changed since then
+def build_revision_prompt(doc1, previous_comparison, delta):
+    """delta comes from revisions.paragraph_delta(previous draft, new draft)."""
+    counterparts = iter(reference_counterparts(
+        doc1, [new for _, new in delta["changed"]] + delta["removed"] + delta["added"]
+    ))
+
+    def counterpart():
+        clause = next(counterparts)
+        return f"\nReference file: {clause}" if clause else "\nReference file: no similar clause"
+
+    sections = []
+    if delta["changed"]:
+        sections.append("Paragraphs edited since the previous draft:\n" + "\n\n".join(
+            f"{n}. Previous draft: {old}\nNew draft: {new}{counterpart()}"
+            for n, (old, new) in enumerate(delta["changed"], 1)
+        ))
+    if delta["removed"]:
+        sections.append("Paragraphs removed since the previous draft:\n" + "\n\n".join(
+            f"{n}. {paragraph}{counterpart()}" for n, paragraph in enumerate(delta["removed"], 1)
+        ))
+    if delta["added"]:
+        sections.append("Paragraphs added since the previous draft:\n" + "\n\n".join(
+            f"{n}. {paragraph}{counterpart()}" for n, paragraph in enumerate(delta["added"], 1)
+        ))
+    changes = "\n\n".join(sections)
+    return f"""
+        The Comparison file is a new draft of a contract whose previous draft was already compared with the Reference file.
+        Only the paragraphs below changed since the previous draft; the other {delta["unchanged"]} paragraphs are identical, so the previous comparison still applies to them.
+
+        Previous comparison:
+        {previous_comparison}
+
+{changes}
+
+        Update the previous comparison for these changes: keep the differences that still apply, drop the ones the new draft resolved and add the ones it introduced.
+{COMPARISON_INSTRUCTIONS}"""
+
+
+# Function to build the question answering prompt
+def build_question_prompt(question, doc2, doc1):
+    doc2, collapsed = collapse_identical(doc1, doc2)
+    return f"""
+        You are a helpful assistant of the client that can answer questions about two documents.
+        Focus primarily on the Comparison file but consider the Reference file for comparisons.
+        {COLLAPSED_NOTE if collapsed else ""}
+
+        Comparison file:
+        {doc2}
+
+        Reference file:
+        {doc1}
+
+        Question: {question}
+        Provide a detailed answer based on Comparison file in comparison to Reference file, prioritizing the Comparison file.
+        you do not make up your own answers, limit the content to the documents. Limit the answer to max 100 words, 
+        Reference file is the company agreed standard.
+        If the question is unrelated to the documents, respond with:
+        "The question is not related to the content of the provided documents. Please ask a relevant question."
+         """
+
+
+# Function to build the comparison file summary prompt
+def build_summary_prompt(doc2, doc1):
+    doc2, collapsed = collapse_identical(doc1, doc2)
+    return f"""
+        Provide a brief summary of the Comparison file and highlight the key differences compared to the Reference file.
+        Focus on the impact of these differences and provide recomended action plan or negotiation strategy. Limit the summary to 200 words.
+        {COLLAPSED_NOTE if collapsed else ""}
+
+        Comparison file:
+        {doc2}
+
+        Reference file:
+        {doc1}
+        """
+
+
+# Function to compare two full documents; raises on errors, for callers that report failures themselves (background jobs)
+def request_comparison(doc1, doc2, on_token=None, use_cache=True):
+    return chat(COMPARISON_SYSTEM_MESSAGE, build_comparison_prompt(doc1, doc2), 0.5, on_token, label="comparison", use_cache=use_cache)
+
+
+def compare_docs_with_gpt(doc1, doc2, on_token=None, use_cache=True):
+    try:
+        return request_comparison(doc1, doc2, on_token, use_cache)
+    except Exception as e:
+        return f"An error occurred: {e}"
+
+
+def answer_question_with_gpt(question, doc2, doc1, on_token=None, use_cache=True):
+    prompt = build_question_prompt(question, doc2, doc1)
+    try:
+        return chat(QUESTION_SYSTEM_MESSAGE, prompt, 0.7, on_token, label="question", use_cache=use_cache)
+    except Exception as e:
+        return f"An error occurred while answering the question: {e}"
+
+
+# Function to answer a question from the clauses of each document most relevant to it
+def answer_question_with_retrieval(question, doc2, doc1, doc2_index, doc1_index, top_k=TOP_K, on_token=None, use_cache=True):
+    """
+    doc1_index/doc2_index come from clause_index.build_clause_index. Returns (answer, stats)
+    with the retrieval time and the estimated prompt tokens saved versus sending both documents;
+    stats is None when the request failed.
+    """
+    try:
+        ref_hits, comp_hits, retrieval_time = retrieve_for_question(question, doc1_index, doc2_index, top_k)
+        prompt = build_question_prompt(
+            question,
+            "\n".join(clause for clause, _ in comp_hits),
+            "\n".join(clause for clause, _ in ref_hits)
+        )
+        prompt_tokens = count_prompt_tokens(prompt)
+        full_prompt_tokens = count_prompt_tokens(build_question_prompt(question, doc2, doc1))
+        stats = {
+            "retrieval_time": retrieval_time,
+            "clauses_retrieved": len(ref_hits) + len(comp_hits),
+            "prompt_tokens": prompt_tokens,
+            "tokens_saved": max(0, full_prompt_tokens - prompt_tokens),
+        }
+        return chat(QUESTION_SYSTEM_MESSAGE, prompt, 0.7, on_token, label="question", use_cache=use_cache), stats
+    except Exception as e:
+        return f"An error occurred while answering the question: {e}", None
+
+
+# Function to summarize the comparison file against the reference; raises on errors, like request_comparison
+def request_summary_doc2(doc2, doc1, on_token=None, use_cache=True):
+    return chat(SUMMARY_SYSTEM_MESSAGE, build_summary_prompt(doc2, doc1), 0.7, on_token, label="summary", use_cache=use_cache)
+
+
+def generate_summary_doc2(doc2, doc1, on_token=None, use_cache=True):
+    try:
+        return request_summary_doc2(doc2, doc1, on_token, use_cache)
+    except Exception as e:
+        return f"An error occurred while generating the summary: {e}"
+
+
+# Function to build the map step prompt for one aligned chunk pair
+def build_chunk_comparison_prompt(ref_chunk, comp_chunk):
+    return f"""
+        Compare the following sections of two documents. The sections are aligned parts of longer documents.
+
+        Reference file section:
+        {ref_chunk}
+
+        Comparison file section:
+        {comp_chunk}
+
+        List every clause which has a difference in structure, content, or meaning as a bullet point, with its potential impact below it.
+        Keep exact numbers such as days, amounts, and percentages. If the sections have no meaningful difference, respond with: "No differences."
+        """
+
+
+# Function to build the reduce step prompt that merges partial comparisons
+def build_merge_prompt(partials):
+    return f"""
+        The following notes list the differences found between aligned sections of a Reference file and a Comparison file:
+
+        {partials}
+
+        Merge the notes into one report, dropping duplicates and sections with no differences.
+{COMPARISON_INSTRUCTIONS}"""
+
+
+# Function to compare documents by aligning clauses locally and sending only the differences to the model
+def compare_docs_diff_first(doc1, doc2, on_token=None, use_cache=True, template=None):
+    """
+    Returns (comparison_text, stats) with clause counts and prompt sizes; stats is None when the request failed.
+    template is the reference_index template doc1 was loaded from, whose stored clause vectors are then reused.
+    """
+    try:
+        diff = diff_clauses(doc1, doc2, template=template)
+        stats = {
+            "modified": len(diff["modified"]),
+            "moved": len(diff["moved"]),
+            "deleted": len(diff["deleted"]),
+            "inserted": len(diff["inserted"]),
+            "unchanged": diff["unchanged"],
+            "full_prompt_tokens": count_prompt_tokens(build_comparison_prompt(doc1, doc2)),
+            "prompt_tokens": 0,
+        }
+        if not (diff["modified"] or diff["moved"] or diff["deleted"] or diff["inserted"]):
+            return "No differences found: every clause of the Reference file appears unchanged in the Comparison file.", stats
+        prompt = build_diff_comparison_prompt(diff)
+        stats["prompt_tokens"] = count_prompt_tokens(prompt)
+        return chat(COMPARISON_SYSTEM_MESSAGE, prompt, 0.5, on_token, label="comparison", use_cache=use_cache), stats
+    except Exception as e:
+        return f"An error occurred: {e}", None
+
+
+# Function to compare a new draft by updating the previous draft's comparison with the paragraphs changed since then
+def compare_docs_incremental(doc1, doc2, previous_comparison, delta, on_token=None, use_cache=True):
+    """Returns (comparison_text, stats) with paragraph counts and prompt sizes; stats is None when the request failed."""
+    try:
+        stats = {
+            "changed": len(delta["changed"]),
+            "removed": len(delta["removed"]),
+            "added": len(delta["added"]),
+            "unchanged": delta["unchanged"],
+            "full_prompt_tokens": count_prompt_tokens(build_comparison_prompt(doc1, doc2)),
+            "prompt_tokens": 0,
+        }
+        if not (delta["changed"] or delta["removed"] or delta["added"]):
+            return previous_comparison, stats
+        prompt = build_revision_prompt(doc1, previous_comparison, delta)
+        stats["prompt_tokens"] = count_prompt_tokens(prompt)
+        return chat(COMPARISON_SYSTEM_MESSAGE, prompt, 0.5, on_token, label="comparison", use_cache=use_cache), stats
+    except Exception as e:
+        return f"An error occurred: {e}", None
+
+
+# Function to compare documents too long for one prompt by comparing aligned chunks and merging the results
+def compare_docs_map_reduce(doc1, doc2, concurrency=MAX_CONCURRENCY, use_cache=True, on_progress=None):
+    """Returns (comparison_text, stats); stats is None when the run failed. on_progress(done, total) counts compared chunk pairs."""
+    pairs = align_chunk_pairs(doc1, doc2)
+
+    def compare_chunk(ref_chunk, comp_chunk):
+        return chat(COMPARISON_SYSTEM_MESSAGE, build_chunk_comparison_prompt(ref_chunk, comp_chunk), 0.5,
+                    label="comparison-map", use_cache=use_cache)
+
+    def merge(partials):
+        return chat(COMPARISON_SYSTEM_MESSAGE, build_merge_prompt(partials), 0.5,
+                    label="comparison-reduce", use_cache=use_cache)
+
+    try:
+        return map_reduce(pairs, compare_chunk, merge, concurrency=concurrency, on_progress=on_progress)
+    except Exception as e:
+        return f"An error occurred: {e}", None
+
+
+class AnalysisCancelled(Exception):
+    """Raised inside a running analysis when another analysis of the same batch failed."""
+
+
+class AnalysisFailed(Exception):
+    """Raised by run_analyses with the name of the analysis that failed."""
+
+    def __init__(self, name, error):
+        super().__init__(f"{name}: {error}")
+        self.name = name
+        self.error = error
+
+
+# Function to build the requests behind 'Analyze all', keyed by analysis name
+def analysis_tasks(doc1, doc2, question=None, diff_first=False, revision=None, template=None):
+    """
+    revision is (previous_comparison, delta) to compare from the paragraphs changed since the previous draft.
+    template is the reference_index template doc1 was loaded from, used by the diff-first comparison.
+    """
+    if revision:
+        comparison_prompt = build_revision_prompt(doc1, *revision)
+    elif diff_first:
+        comparison_prompt = build_diff_comparison_prompt(diff_clauses(doc1, doc2, template=template))
+    else:
+        comparison_prompt = build_comparison_prompt(doc1, doc2)
+    tasks = {
+        "comparison": (COMPARISON_SYSTEM_MESSAGE, comparison_prompt, 0.5),
+        "summary": (SUMMARY_SYSTEM_MESSAGE, build_summary_prompt(doc2, doc1), 0.7),
+    }
+    if question:
+        tasks["question"] = (QUESTION_SYSTEM_MESSAGE, build_question_prompt(question, doc2, doc1), 0.7)
+    return tasks
+
+
+# Function to run several analyses concurrently and yield each result as soon as it completes
+def run_analyses(tasks, max_workers=MAX_CONCURRENCY, use_cache=True):
+    """
+    tasks maps a name to (system_message, prompt, temperature); yields (name, result).
+    If one analysis fails, analyses not yet started are cancelled, running ones stop
+    at their next streamed chunk, and AnalysisFailed is raised.
+    """
+    cancel = threading.Event()
+
+    def run(name, system_message, prompt, temperature):
+        def check_cancelled(_):
+            if cancel.is_set():
+                raise AnalysisCancelled(name)
+        # Streaming lets a running request notice the cancel flag between chunks
+        return chat(system_message, prompt, temperature, on_token=check_cancelled, label=name, use_cache=use_cache)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks) or 1)))
+    try:
+        futures = {pool.submit(in_current_trace(run), name, *spec): name for name, spec in tasks.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                raise AnalysisFailed(name, e) from e
+            yield name, result
+    finally:
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
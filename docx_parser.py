@@ -0,0 +1,301 @@
+# Single-pass streaming parser over word/document.xml: paragraphs, table cells, headings and list numbering
+import re
+import zipfile
+
+from lxml import etree
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+_VAL = W + "val"
+_P = W + "p"
+_TEXT = W + "t"
+
+# Separator between the cells of a table row in the extracted text
+CELL_SEPARATOR = " | "
+
+# Subtrees whose text is not part of the current document: compatibility fallbacks and tracked moves
+_SKIPPED = {MC + "Fallback", W + "moveFrom"}
+_EVENT_TAGS = [_P, W + "tbl", W + "tr", W + "tc"] + sorted(_SKIPPED)
+
+_heading_name = re.compile(r"heading (\d)", re.IGNORECASE)
+_level_ref = re.compile(r"%(\d)")
+
+
+# Function to read the paragraph styles: heading level and list numbering inherited by each style id
+def _read_styles(archive):
+    try:
+        root = etree.parse(archive.open("word/styles.xml")).getroot()
+    except KeyError:
+        return {}
+    raw = {}
+    for style in root.iter(W + "style"):
+        if style.get(W + "type") != "paragraph":
+            continue
+        name = style.find(W + "name")
+        outline = style.find(f"{W}pPr/{W}outlineLvl")
+        num_id = style.find(f"{W}pPr/{W}numPr/{W}numId")
+        ilvl = style.find(f"{W}pPr/{W}numPr/{W}ilvl")
+        based_on = style.find(W + "basedOn")
+        heading = None
+        if outline is not None and int(outline.get(W + "val")) < 9:
+            heading = int(outline.get(W + "val")) + 1
+        elif name is not None and _heading_name.fullmatch(name.get(W + "val", "")):
+            heading = int(_heading_name.fullmatch(name.get(W + "val")).group(1))
+        elif name is not None and name.get(W + "val", "").lower() == "title":
+            heading = 1
+        raw[style.get(W + "styleId")] = {
+            "heading": heading,
+            "num_id": num_id.get(W + "val") if num_id is not None else None,
+            "ilvl": int(ilvl.get(W + "val")) if ilvl is not None else None,
+            "based_on": based_on.get(W + "val") if based_on is not None else None,
+        }
+
+    def resolve(style_id, seen=()):
+        style = raw.get(style_id)
+        if style is None or style_id in seen:
+            return {"heading": None, "num_id": None, "ilvl": None}
+        parent = resolve(style["based_on"], seen + (style_id,)) if style["based_on"] else {}
+        return {key: style[key] if style[key] is not None else parent.get(key) for key in ("heading", "num_id", "ilvl")}
+
+    return {style_id: resolve(style_id) for style_id in raw}
+
+
+# Function to read the list definitions: format, label template and start value per numId and level
+def _read_numbering(archive):
+    try:
+        root = etree.parse(archive.open("word/numbering.xml")).getroot()
+    except KeyError:
+        return {}
+    abstract = {}
+    for definition in root.iter(W + "abstractNum"):
+        levels = {}
+        for lvl in definition.iter(W + "lvl"):
+            fmt, text, start = lvl.find(W + "numFmt"), lvl.find(W + "lvlText"), lvl.find(W + "start")
+            levels[int(lvl.get(W + "ilvl"))] = {
+                "format": fmt.get(W + "val") if fmt is not None else "decimal",
+                "text": text.get(W + "val", "") if text is not None else "",
+                "start": int(start.get(W + "val")) if start is not None else 1,
+            }
+        abstract[definition.get(W + "abstractNumId")] = levels
+    numbering = {}
+    for num in root.iter(W + "num"):
+        abstract_id = num.find(W + "abstractNumId")
+        levels = {k: dict(v) for k, v in abstract.get(abstract_id.get(W + "val") if abstract_id is not None else None, {}).items()}
+        for override in num.iter(W + "lvlOverride"):
+            start = override.find(W + "startOverride")
+            level = int(override.get(W + "ilvl"))
+            if start is not None and level in levels:
+                levels[level]["start"] = int(start.get(W + "val"))
+        numbering[num.get(W + "numId")] = levels
+    return numbering
+
+
+def _roman(n):
+    result = ""
+    for value, digits in ((1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+                          (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")):
+        while n >= value:
+            result += digits
+            n -= value
+    return result
+
+
+def _letter(n):
+    return chr(ord("a") + (n - 1) % 26) * ((n - 1) // 26 + 1)
+
+
+def _format_number(n, fmt):
+    if fmt == "lowerLetter":
+        return _letter(n)
+    if fmt == "upperLetter":
+        return _letter(n).upper()
+    if fmt == "lowerRoman":
+        return _roman(n)
+    if fmt == "upperRoman":
+        return _roman(n).upper()
+    return str(n)
+
+
+# Function to advance the list counters of a numbered paragraph and render its label, e.g. "4.2."
+def _list_label(numbering, counters, num_id, ilvl):
+    levels = numbering.get(num_id)
+    if not levels or ilvl not in levels:
+        return ""
+    counts = counters.setdefault(num_id, {})
+    counts[ilvl] = counts.get(ilvl, levels[ilvl]["start"] - 1) + 1
+    for deeper in [level for level in counts if level > ilvl]:
+        del counts[deeper]
+    level = levels[ilvl]
+    if level["format"] == "bullet":
+        return "-"
+    if level["format"] == "none":
+        return ""
+
+    def number(match):
+        ref = int(match.group(1)) - 1
+        ref_level = levels.get(ref, level)
+        return _format_number(counts.get(ref, ref_level["start"]), ref_level["format"])
+
+    return _level_ref.sub(number, level["text"])
+
+
+# Run content rendered as python-docx's Paragraph.text does: tabs as "\t", line breaks as "\n"
+_RUN_TAGS = (_TEXT, W + "tab", W + "ptab", W + "br", W + "cr", W + "noBreakHyphen")
+
+
+def _run_text(node):
+    tag = node.tag
+    if tag == _TEXT:
+        return node.text or ""
+    if tag in (W + "tab", W + "ptab"):
+        return "\t"
+    if tag == W + "cr" or (tag == W + "br" and node.get(W + "type", "textWrapping") == "textWrapping"):
+        return "\n"
+    return "-" if tag == W + "noBreakHyphen" else ""
+
+
+# Function to read a finished paragraph: its text and numbering/style properties
+def _paragraph(elem, styles):
+    text = "".join(_run_text(node) for node in elem.iter(*_RUN_TAGS)).strip()
+    properties = elem.find(W + "pPr")
+    style_id = num_id = ilvl = outline = None
+    if properties is not None:
+        for node in properties.iter(W + "pStyle", W + "numId", W + "ilvl", W + "outlineLvl"):
+            if node.tag == W + "pStyle":
+                style_id = node.get(_VAL)
+            elif node.tag == W + "numId":
+                num_id = node.get(_VAL)
+            elif node.tag == W + "ilvl":
+                ilvl = int(node.get(_VAL))
+            else:
+                outline = int(node.get(_VAL))
+    style = styles.get(style_id, {})
+    heading = outline + 1 if outline is not None and outline < 9 else style.get("heading")
+    num_id = num_id or style.get("num_id")
+    ilvl = ilvl if ilvl is not None else (style.get("ilvl") or 0)
+    return text, heading, num_id, ilvl
+
+
+# Function to stream the blocks of a .docx in document order
+def iter_docx_blocks(file):
+    """
+    Yields one dict per non-empty paragraph and per cell of each table row that has any text,
+    empty cells included so values keep their column:
+      "kind":    "heading", "paragraph" or "cell"
+      "text":    the block text, prefixed with its list label when numbered
+      "label":   the rendered list label ("4.2.", "-") or ""
+      "heading_level", "list_level": ints or None
+      "table", "row", "col": table position for cells, otherwise None
+      "offset":  character offset of the text in extract_docx_text's output
+    Only word/document.xml is streamed; finished elements are released as soon as they are read.
+    """
+    with zipfile.ZipFile(file) as archive:
+        styles = _read_styles(archive)
+        numbering = _read_numbering(archive)
+        counters = {}
+        offset = 0
+        open_paragraphs = skipping = 0  # text boxes nest paragraphs inside paragraphs
+        cells = []  # stack of open cells, nested tables included: [table, row, col, paragraph texts]
+        tables = []  # stack of open tables: [table index, row, col]
+        table_count = 0
+        row_cells = []  # finished cells of the current top-level table row: (table, row, col, text)
+
+        # lxml filters the events in C, so Python only sees paragraphs, table structure and skipped subtrees
+        events = etree.iterparse(archive.open("word/document.xml"), events=("start", "end"), tag=_EVENT_TAGS)
+        for event, elem in events:
+            tag = elem.tag
+            if tag in _SKIPPED:
+                skipping += 1 if event == "start" else -1
+                if event == "end":
+                    elem.getparent().remove(elem)
+                continue
+            if skipping:
+                continue
+
+            if event == "start":
+                if tag == _P:
+                    open_paragraphs += 1
+                elif tag == W + "tbl":
+                    tables.append([table_count, -1, -1])
+                    table_count += 1
+                elif tag == W + "tr" and tables:
+                    tables[-1][1] += 1
+                    tables[-1][2] = -1
+                elif tag == W + "tc" and tables:
+                    tables[-1][2] += 1
+                    cells.append(tables[-1][:] + [[]])
+                continue
+
+            if tag == _P:
+                open_paragraphs -= 1
+                text, heading, num_id, ilvl = _paragraph(elem, styles)
+                label = _list_label(numbering, counters, num_id, ilvl) if text and num_id not in (None, "0") else ""
+                if label:
+                    text = f"{label} {text}"
+                if open_paragraphs:
+                    elem.getparent().remove(elem)  # a text box paragraph: keep it out of the enclosing one
+                if cells:
+                    if text:
+                        cells[-1][3].append(text)
+                elif text:
+                    yield {
+                        "kind": "heading" if heading else "paragraph",
+                        "text": text,
+                        "label": label,
+                        "heading_level": heading,
+                        "list_level": ilvl if label else None,
+                        "table": None, "row": None, "col": None,
+                        "offset": offset,
+                    }
+                    offset += len(text) + 1
+            elif tag == W + "tc" and cells:
+                table, row, col, texts = cells.pop()
+                text = " ".join(texts)
+                if cells:  # a nested table stays inside the enclosing cell
+                    if text:
+                        cells[-1][3].append(text)
+                else:
+                    row_cells.append((table, row, col, text))
+            elif tag == W + "tr" and len(tables) == 1:
+                if any(text for *_, text in row_cells):
+                    for n, (table, row, col, text) in enumerate(row_cells):
+                        if n:
+                            offset += len(CELL_SEPARATOR)
+                        yield {
+                            "kind": "cell", "text": text, "label": "", "heading_level": None, "list_level": None,
+                            "table": table, "row": row, "col": col, "offset": offset,
+                        }
+                        offset += len(text)
+                    offset += 1
+                row_cells = []
+            elif tag == W + "tbl" and tables:
+                tables.pop()
+
+            # Release finished top-level elements so memory stays flat on large documents
+            if not tables and not open_paragraphs:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+
+# Function to render the blocks as text: one line per paragraph and per table row
+def blocks_to_text(blocks):
+    lines, row, row_key = [], [], None
+    for block in blocks:
+        key = (block["table"], block["row"]) if block["kind"] == "cell" else None
+        if row and key != row_key:
+            lines.append(CELL_SEPARATOR.join(row))
+            row = []
+        if key is None:
+            lines.append(block["text"])
+        else:
+            row.append(block["text"])
+            row_key = key
+    if row:
+        lines.append(CELL_SEPARATOR.join(row))
+    return "\n".join(lines)
+
+
+# Function to extract the text of a .docx, including tables and list numbering
+def extract_docx_text(file):
+    return blocks_to_text(iter_docx_blocks(file))
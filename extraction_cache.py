@@ -0,0 +1,93 @@
+# Content-addressed LRU cache for extracted text and the clauses/vectors derived from it
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Approximate memory budget for all cached entries; least recently used entries are evicted beyond it
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# Entries keyed by (stage, digest, ...); module state is shared by every Streamlit session in the process
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+# Function to hash uploaded bytes or extracted text
+def content_key(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+# Function to hash an uploaded file's bytes block by block without consuming it
+def file_digest(file):
+    position = file.tell()
+    file.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: file.read(1024 * 1024), b""):
+        digest.update(block)
+    file.seek(position)
+    return digest.hexdigest()
+
+
+# Function to estimate the memory held by a cached value
+def _approx_size(value):
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_approx_size(item) for item in value) + 8 * len(value)
+    if hasattr(value, "nbytes"):  # numpy arrays
+        return int(value.nbytes)
+    if hasattr(value, "data") and hasattr(value, "indices"):  # scipy sparse matrices
+        return int(value.data.nbytes + value.indices.nbytes + value.indptr.nbytes)
+    return 64
+
+
+# Function to return a cached stage result, computing and storing it on a miss
+def cached_stage(stage, compute, *keys):
+    """Looks up (stage, *keys); on a miss calls compute() and stores the result under the LRU byte cap."""
+    key = (stage,) + keys
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return _entries[key][0]
+        _stats["misses"] += 1
+
+    value = compute()
+    size = _approx_size(value)
+    with _lock:
+        if key in _entries:
+            _stats["bytes"] -= _entries.pop(key)[1]
+        _entries[key] = (value, size)
+        _stats["bytes"] += size
+        while _stats["bytes"] > MAX_CACHE_BYTES and len(_entries) > 1:
+            _, (_, evicted_size) = _entries.popitem(last=False)
+            _stats["bytes"] -= evicted_size
+            _stats["evictions"] += 1
+    return value
+
+
+# Function to extract text from an upload once per distinct file content
+def cached_extract(file, extractor):
+    """Returns (digest, text); re-uploads and reruns with the same bytes skip extractor entirely."""
+    digest = file_digest(file)
+
+    def extract():
+        file.seek(0)
+        return extractor(file)
+
+    return digest, cached_stage("text:" + extractor.__name__, extract, digest)
+
+
+# Function to report cache counters and current size
+def cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_entries))
+
+
+# Function to drop every cached entry
+def clear_cache():
+    with _lock:
+        _entries.clear()
+        _stats.update(hits=0, misses=0, evictions=0, bytes=0)
@@ -0,0 +1,120 @@
+# Text extraction for the supported upload formats
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from docx_parser import extract_docx_text
+from tracing import traced
+
+# PDF uploads larger than this are spilled to a temporary file and read by MuPDF from disk
+SPILL_BYTES = 16 * 1024 * 1024
+
+# PDFs with at least this many pages are extracted by a pool of worker processes
+PARALLEL_MIN_PAGES = 64
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+PAGES_PER_TASK = 16
+
+
+# Function to extract text from a Word document
+@traced()
+def extract_text_from_docx(file):
+    """Extracts all text from a .docx file in document order, with table rows and list numbering."""
+    return extract_docx_text(file)
+
+
+# Function to give MuPDF a path or bytes for a PDF, spilling large uploads to a temporary file
+@contextmanager
+def _pdf_source(file):
+    if isinstance(file, (str, os.PathLike)):
+        yield os.fspath(file)
+        return
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END) - position
+    file.seek(position)
+    if size <= SPILL_BYTES:
+        yield file.read()
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as spill:
+        shutil.copyfileobj(file, spill, 1024 * 1024)
+    try:
+        yield spill.name
+    finally:
+        os.remove(spill.name)
+
+
+def _open_pdf(source):
+    import fitz  # PyMuPDF, only needed for PDF uploads
+    return fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+
+
+# PDF opened once per worker process by the pool initializer
+_worker_doc = None
+
+
+def _init_pdf_worker(path):
+    global _worker_doc
+    _worker_doc = _open_pdf(path)
+
+
+# Function run in a worker process: extract the text of a range of pages
+def _extract_pages(start, stop):
+    return [_worker_doc[n].get_text() for n in range(start, stop)]
+
+
+# Function to give worker processes a path to a PDF, writing an in-memory upload to a temporary file
+@contextmanager
+def _pdf_on_disk(source):
+    if isinstance(source, str):
+        yield source
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as spill:
+        spill.write(source)
+    try:
+        yield spill.name
+    finally:
+        os.remove(spill.name)
+
+
+# Function to yield the text of each PDF page in order, as it is extracted
+def iter_pdf_pages(file, workers=None):
+    """
+    Accepts a path or a file-like upload. Large uploads are spilled to disk rather than
+    held in memory. PDFs with at least PARALLEL_MIN_PAGES pages are extracted by worker
+    processes in page ranges, whatever their size.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    with _pdf_source(file) as source:
+        with _open_pdf(source) as doc:
+            page_count = doc.page_count
+            if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+                for page in doc:
+                    yield page.get_text()
+                return
+
+        with _pdf_on_disk(source) as path:
+            starts = range(0, page_count, PAGES_PER_TASK)
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker, initargs=(path,))
+            try:
+                stops = [min(start + PAGES_PER_TASK, page_count) for start in starts]
+                for pages in pool.map(_extract_pages, starts, stops):
+                    yield from pages
+            finally:
+                pool.shutdown(cancel_futures=True)
+
+
+# Function to extract text from PDF
+@traced()
+def extract_text_from_pdf(file):
+    return "\n".join(iter_pdf_pages(file)).strip()
+
+
+# Function to pick the extractor for a file name or path by its extension
+def extractor_for(name):
+    extension = os.path.splitext(str(name))[1].lower()
+    if extension == ".pdf":
+        return extract_text_from_pdf
+    if extension == ".docx":
+        return extract_text_from_docx
+    raise ValueError(f"Unsupported file type: {name}")
@@ -0,0 +1,155 @@
+# Process-wide background jobs: long analyses run on a bounded pool of worker threads shared by every session,
+# keep running across Streamlit reruns, and are polled by job ID for progress and results
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import record
+
+# Worker threads shared by every session in the process; further jobs wait in the queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+
+# Finished jobs stay available for polling this long
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL_MINUTES", "60")) * 60
+
+ACTIVE_STATES = ("queued", "running")
+
+# Jobs by id and the pool running them; module state is shared by every Streamlit session in the process
+_jobs = {}
+_lock = threading.Lock()
+_pool = None
+
+# Id of the job running on the current worker thread
+_current = contextvars.ContextVar("job", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a job by report() once the job was cancelled. A BaseException, so the
+    analysis helpers that turn errors into messages let it through to the worker.
+    """
+
+
+# Function to return the worker pool, starting it on first use
+def _executor():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix="job")
+        return _pool
+
+
+# Function to drop finished jobs older than JOB_RESULT_TTL; called with _lock held
+def _purge(now):
+    for job_id in [job_id for job_id, job in _jobs.items()
+                   if job["finished"] is not None and now - job["finished"] > JOB_RESULT_TTL]:
+        del _jobs[job_id]
+
+
+# Function to queue fn(*args, **kwargs) as a background job; returns its job id
+def submit(fn, *args, label="", **kwargs):
+    """fn runs on a worker thread and may call report() to publish progress; its return value is the job result."""
+    now = time.time()
+    job = {
+        "id": uuid.uuid4().hex[:12],
+        "label": label or getattr(fn, "__name__", "job"),
+        "state": "queued",
+        "progress": None,
+        "message": "",
+        "partial": "",
+        "result": None,
+        "error": None,
+        "submitted": now,
+        "started": None,
+        "finished": None,
+        "cancel_requested": False,
+    }
+    with _lock:
+        _purge(now)
+        _jobs[job["id"]] = job
+    _executor().submit(_run, job["id"], fn, args, kwargs)
+    return job["id"]
+
+
+# Function to set the final state of a job
+def _finish(job_id, state, **fields):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.update(state=state, finished=time.time(), **fields)
+
+
+# Function run on a worker thread: run one job and store its result or error
+def _run(job_id, fn, args, kwargs):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job["state"] != "queued":  # cancelled while queued
+            return
+        job.update(state="running", started=time.time())
+        label, waited = job["label"], job["started"] - job["submitted"]
+    record("job_wait", waited, label=label)
+    token = _current.set(job_id)
+    try:
+        result = fn(*args, **kwargs)
+    except JobCancelled:
+        _finish(job_id, "cancelled")
+    except Exception as e:
+        logger.warning("Job %s (%s) failed: %s", job_id, label, e)
+        _finish(job_id, "failed", error=str(e) or type(e).__name__)
+    else:
+        _finish(job_id, "done", result=result, progress=1.0)
+    finally:
+        _current.reset(token)
+
+
+# Function to publish the progress of the job running on this thread; does nothing outside a job
+def report(progress=None, message=None, partial=None):
+    """progress is a fraction from 0 to 1, message a status line and partial the result so far. Raises JobCancelled once the job was cancelled."""
+    job_id = _current.get()
+    if job_id is None:
+        return
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job["cancel_requested"]:
+            raise JobCancelled(job_id)
+        for name, value in (("progress", progress), ("message", message), ("partial", partial)):
+            if value is not None:
+                job[name] = value
+
+
+# Function to publish streamed text as the job's result so far; usable as an on_token callback
+def report_partial(text):
+    report(partial=text)
+
+
+# Function to return a snapshot of a job, or None for an unknown or expired job id
+def get_job(job_id):
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+
+# Function to cancel a job: queued jobs never start, running ones stop at their next report()
+def cancel(job_id):
+    """Returns True when the job was still queued or running."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job["state"] not in ACTIVE_STATES:
+            return False
+        job["cancel_requested"] = True
+        if job["state"] == "queued":
+            job.update(state="cancelled", finished=time.time())
+        return True
+
+
+# Function to count jobs by state, with the worker count
+def queue_stats():
+    with _lock:
+        states = [job["state"] for job in _jobs.values()]
+    return {"workers": JOB_WORKERS, **{state: states.count(state) for state in ("queued", "running", "done", "failed", "cancelled")}}
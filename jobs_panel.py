@@ -0,0 +1,67 @@
+# Background job list for the Streamlit apps: progress of queued and running jobs, results of finished ones
+import time
+
+import streamlit as st
+
+from job_queue import ACTIVE_STATES, cancel, get_job, queue_stats
+
+# Seconds between refreshes of the job list while a job is still queued or running
+POLL_SECONDS = 1.0
+
+
+# Function to render one job: its progress while it runs, its result or error once finished
+def _show_job(job):
+    state = job["state"]
+    st.markdown(f"**{job['label']}** `{job['id']}` {state}")
+    if state == "queued":
+        st.caption("Waiting for a free worker.")
+    elif state == "running":
+        if job["progress"] is not None:
+            st.progress(min(1.0, job["progress"]))
+        else:
+            st.caption(f"Running for {time.time() - job['started']:.0f}s.")
+    if state in ACTIVE_STATES:
+        if job["partial"]:
+            st.write(job["partial"])
+        if st.button("Cancel", key=f"cancel-{job['id']}"):
+            cancel(job["id"])
+    elif state == "done":
+        st.write(job["result"])
+        if isinstance(job["result"], str):
+            st.download_button("Download", data=job["result"], file_name=f"{job['label']}.txt", mime="text/plain",
+                               key=f"download-{job['id']}")
+    elif state == "failed":
+        st.error(f"An error occurred: {job['error']}")
+    else:
+        st.warning("Cancelled.")
+    if job["message"]:
+        st.caption(job["message"])
+
+
+# Function to render the given jobs, in the order given
+def _show_jobs(job_ids):
+    jobs = [job for job in map(get_job, job_ids) if job is not None]
+    for job in jobs:
+        _show_job(job)
+    stats = queue_stats()
+    st.caption(f"{stats['running']} running and {stats['queued']} queued on {stats['workers']} workers.")
+    return any(job["state"] in ACTIVE_STATES for job in jobs)
+
+
+# Fragment refreshed every POLL_SECONDS; reruns the whole app once the last job finishes
+@st.fragment(run_every=POLL_SECONDS)
+def _poll_jobs(job_ids):
+    if not _show_jobs(job_ids):
+        st.rerun()
+
+
+# Function to show background jobs, polling their progress without rerunning the page until they finish
+def show_jobs(job_ids):
+    """Unknown and expired job ids are skipped; returns the ids still known."""
+    jobs = {job_id: get_job(job_id) for job_id in job_ids}
+    known = [job_id for job_id, job in jobs.items() if job is not None]
+    if any(jobs[job_id]["state"] in ACTIVE_STATES for job_id in known):
+        _poll_jobs(known)
+    elif known:
+        _show_jobs(known)
+    return known
@@ -1,20 +1,56 @@
 # Import required libraries
 import os
+import sqlite3
 from dotenv import load_dotenv
 import openai
-import docx
 import streamlit as st
 from PIL import Image
 
+import llm_cache
+from clause_index import build_clause_index
+from doc_analysis import (
+    COMPARISON_SYSTEM_MESSAGE,
+    AnalysisFailed,
+    analysis_tasks,
+    answer_question_with_gpt,
+    answer_question_with_retrieval,
+    compare_docs_diff_first,
+    compare_docs_incremental,
+    compare_docs_map_reduce,
+    compare_docs_with_gpt,
+    build_comparison_prompt,
+    generate_summary_doc2,
+    prompt_budget,
+    request_comparison,
+    request_summary_doc2,
+    run_analyses,
+)
+from extraction_cache import cached_extract, cached_stage
+from extractors import extract_text_from_docx
+from job_queue import get_job, report, report_partial, submit
+from jobs_panel import show_jobs
+from llm_client import last_call
+from map_reduce import MAX_CONCURRENCY
+from performance_panel import show_performance_panel
+from reference_index import list_templates, load_template, register_template, template_clause_index
+from revisions import find_previous_analysis, paragraph_delta, revision_paragraphs, save_analysis, split_paragraphs
+from token_budget import PromptTooLarge
+from tracing import start_trace
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Collect the timed stages of this run for the performance panel
+trace = start_trace()
+
 # Fetch API key from environment variable
 api_key = os.getenv("OPENAI_API_KEY")
 if api_key:
     openai.api_key = api_key
 else:
     st.error("API Key not found. Please configure it in a .env file.")
+# Optional API base, e.g. the local stub server from llm_stub_server.py
+openai.api_base = os.getenv("OPENAI_API_BASE", openai.api_base)
 
 # Configure Streamlit page (hide the GitHub link and other elements)
 st.set_page_config(
@@ -90,154 +126,318 @@ elif st.session_state.expanded_section == "Creator Info":
     #resized_qr_image = qr_image.resize((10, 10)) 
     #st.sidebar.image("assests/Linkedin.png",caption="Scan to visit LinkedIn", use_container_width=False)
 
+# Response cache controls; the counters are filled in at the end of the run
+st.sidebar.markdown("---")
+use_cache = st.sidebar.checkbox(
+    "Reuse cached AI responses",
+    value=True,
+    help="Identical requests within the cache lifetime are answered from the local response cache."
+)
+cache_status = st.sidebar.empty()
+
+# Background jobs keep running when the page reruns; their ids are kept for this session
+run_in_background = st.sidebar.checkbox(
+    "Run comparisons and summaries as background jobs",
+    value=True,
+    help="The page stays usable while a job runs, and reruns do not interrupt it. Progress and results are listed under Background Jobs."
+)
+if "jobs" not in st.session_state:
+    st.session_state.jobs = []
+open_job_id = st.sidebar.text_input("Open a background job by ID", help="Jobs started in another tab or session are kept for an hour after they finish.")
+if open_job_id and open_job_id.strip() not in st.session_state.jobs:
+    if get_job(open_job_id.strip()):
+        st.session_state.jobs.append(open_job_id.strip())
+    else:
+        st.sidebar.warning("No job with this ID, or it has expired.")
+
 # Upload files
 st.header("Upload Documents for Comparison")
-doc1_file = st.file_uploader("Upload Reference file (.docx)", type="docx")
+
+# A registered company standard template replaces the reference upload and skips its processing
+reference_template = None
+template_names = list_templates()
+if template_names:
+    template_choice = st.selectbox("Reference standard", ["Upload a reference file"] + template_names)
+    if template_choice in template_names:
+        reference_template = load_template(template_choice)
+doc1_file = None if reference_template else st.file_uploader("Upload Reference file (.docx)", type="docx")
 doc2_file = st.file_uploader("Upload file to compare (.docx)", type="docx")
 
-# Function to extract text from a Word document
-def extract_text_from_docx(file):
-    """Extracts and returns all text from a .docx file."""
-    doc = docx.Document(file)
-    full_text = [para.text.strip() for para in doc.paragraphs if para.text.strip()]
-    return "\n".join(full_text)
+if doc1_file:
+    with st.expander("Register this reference file as a company standard template"):
+        template_name = st.text_input("Template name", value=os.path.splitext(doc1_file.name)[0])
+        if template_name and st.button("Register Template"):
+            _, reference_text = cached_extract(doc1_file, extract_text_from_docx)
+            try:
+                manifest = register_template(template_name, reference_text, doc1_file.name)
+                st.success(f"Registered '{manifest['name']}' with {len(manifest['clauses'])} clauses.")
+            except ValueError as e:
+                st.error(f"Unable to register the template: {e}")
 
 # Compare Documents Section
-if doc1_file and doc2_file:
-    doc1_text = extract_text_from_docx(doc1_file)
-    doc2_text = extract_text_from_docx(doc2_file)
+if (doc1_file or reference_template) and doc2_file:
+    # Reruns and re-uploads of the same file reuse the cached text instead of re-parsing
+    if reference_template:
+        doc1_key, doc1_text = reference_template["digest"], reference_template["text"]
+    else:
+        doc1_key, doc1_text = cached_extract(doc1_file, extract_text_from_docx)
+    doc2_key, doc2_text = cached_extract(doc2_file, extract_text_from_docx)
+
+    # An earlier draft of this file compared with the same reference lets this draft be compared from its changed paragraphs
+    previous_draft, previous_comparison, draft_delta = None, None, None
+    try:
+        previous_draft, previous_comparison = find_previous_analysis(doc1_key, doc2_text)
+        if previous_draft:
+            draft_delta = paragraph_delta(revision_paragraphs(previous_draft["id"]), split_paragraphs(doc2_text))
+    except sqlite3.Error as e:
+        st.warning(f"Draft history unavailable: {e}")
+        previous_draft = None
+
+    # Show replies token by token instead of waiting for the complete response
+    stream_responses = st.checkbox("Stream responses as they are generated", value=True)
+
+    # Function to run an LLM helper into a placeholder and report its latency
+    def run_llm(helper, *args):
+        placeholder = st.empty()
+        previous_call = last_call()
+        result = helper(*args, on_token=placeholder.markdown if stream_responses else None, use_cache=use_cache)
+        placeholder.write(result)
+        timing = last_call()
+        if timing is not None and timing is not previous_call and timing["cached"]:
+            st.caption("Answered from the response cache.")
+        elif timing is not None and timing is not previous_call:
+            tokens = f"{timing['estimated_tokens']:,} prompt tokens estimated" if timing["estimated_tokens"] is not None else ""
+            if tokens and timing["prompt_tokens"] is not None:
+                tokens += f", {timing['prompt_tokens']:,} reported by the API"
+            if timing["retries"]:
+                tokens += f"{'; ' if tokens else ''}{timing['retries']} retries after temporary API errors"
+            st.caption(f"First token after {timing['time_to_first_token']:.1f}s, "
+                       f"complete after {timing['total_latency']:.1f}s" + (f"; {tokens}." if tokens else "."))
+        return result
+
+    # Function to record this draft's comparison, so the next draft of the file is compared from its changes
+    def remember_comparison(result, reference=doc1_key, draft=doc2_text, name=doc2_file.name):
+        """Returns a warning when the draft could not be recorded; safe to call from a background job."""
+        if result.startswith("An error occurred"):
+            return None
+        try:
+            save_analysis(reference, draft, name, "comparison", result)
+        except sqlite3.Error as e:
+            return f"Could not record this draft: {e}"
+        return None
+
+    # Functions to describe a comparison run from the stats its helper returned
+    def chunk_caption(stats):
+        return (f"Compared {stats['chunk_pairs']} chunk pairs using {stats['calls']} model calls "
+                f"({stats['map_calls']} map, {stats['reduce_calls']} reduce).")
+
+    def diff_caption(stats):
+        return (f"{stats['modified']} reworded, {stats['moved']} moved, {stats['deleted']} missing and {stats['inserted']} new clauses; "
+                f"{stats['unchanged']} unchanged clauses were not sent. "
+                f"Prompt about {stats['prompt_tokens']:,} tokens instead of {stats['full_prompt_tokens']:,}.")
+
+    def draft_caption(stats):
+        return (f"Updated the previous draft's comparison with {stats['changed'] + stats['removed'] + stats['added']} changed paragraphs; "
+                f"prompt about {stats['prompt_tokens']:,} tokens instead of {stats['full_prompt_tokens']:,}.")
+
+    # Function run as a background job: the selected comparison, streamed into the job's partial result
+    def comparison_job(mode, doc1, doc2, previous, delta, concurrency, use_cache, template=None):
+        def chunks_done(done, total):
+            report(progress=done / total, message=f"Compared {done} of {total} chunk pairs.")
+
+        caption, stats = None, {}
+        if mode == "map_reduce":
+            result, stats = compare_docs_map_reduce(doc1, doc2, concurrency=concurrency, use_cache=use_cache, on_progress=chunks_done)
+            caption = stats and chunk_caption(stats)
+        elif mode == "diff":
+            result, stats = compare_docs_diff_first(doc1, doc2, on_token=report_partial, use_cache=use_cache, template=template)
+            caption = stats and diff_caption(stats)
+        elif mode == "revision":
+            result, stats = compare_docs_incremental(doc1, doc2, previous, delta, on_token=report_partial, use_cache=use_cache)
+            caption = stats and draft_caption(stats)
+        else:
+            result = request_comparison(doc1, doc2, on_token=report_partial, use_cache=use_cache)
+        if stats is None:  # the helper returned its error message; fail the job with it so the panel shows the error
+            raise RuntimeError(result.removeprefix("An error occurred: "))
+        report(message=" ".join(filter(None, (caption, remember_comparison(result)))))
+        return result
 
     st.header("Compare Documents")
 
-    def compare_docs_with_gpt(doc1, doc2):
-        prompt = f"""
-        Compare the following two documents and summarize the key changes:
-
-        Reference file:
-        {doc1}
-
-        Comparison file:
-        {doc2}
-
-        Provide a concise summary of the key differences in terms of structure, content, and meaning in a bullet point format, limit only to clause which has difference. 
-        Provide potential impacts of each change below the differences. 
-
-        Provide a recommended negotiation strategy or plan (max 5 bullet points) to address these changes with the supplier in a separate section. 
-        Prioritize the clauses from very important to less important to optimize negotiations.
-        
-        in case of payment term difference , then provide cost of finance or fincial impact based on wapt calculation and explain the financial imapct in real numbers for a period of one year. in the absence of contract value use USD 1000000 as base value for comparison use interest rate in USA or Canada for calculation. If query is not related to payment term avoid this fiancial impact due to payment term.
-        
-        use the following template as example to generate your response for all clause where there is a difference, provide one line space between each points for better readbility: 
-        Key Differences:
-        
-        1.	**PaymenClaut Terms:** The original agreement allows the client xx days to pay invoices, while the revised agreement reduces this to xx days.
-            o	Financial Impact: Using an interest rate of y% (average rate in the USA), the cost of financing the payment for xx days would be approximately x,xxx.xx  per year for a assumed contract value of USD x,xxx,xxx.  
-
-
-
-        **Recommended Negotiation Strategy:**
-
-        1.	Prioritize negotiation on Payment Terms due to the significant financial impact of shorter payment timelines.
-        2.	Discuss and align on the Termination Notice Period to ensure sufficient time for transitioning services if termination occurs.
-        3.	Clarify the implications of the fixed Term Duration and assess if it aligns with the long-term goals of both parties.
-        4.	Address concerns regarding Jurisdiction and Venue to ensure a fair and accessible legal framework for both parties.
-        5.	Revisit the Notice Address section to determine the preferred mode of communication and update as necessary for effective correspondence.
-
-       """
-
+    # Diff-first sends only the clauses that changed; long document mode compares aligned chunks in parallel
+    comparison_modes = {"revision": "Changes since the previous draft (fastest)"} if previous_draft else {}
+    comparison_modes |= {
+        "diff": "Changed clauses only" + ("" if previous_draft else " (fastest)"),
+        "full": "Full documents",
+        "map_reduce": "Long documents (compare in chunks and merge)",
+    }
+    comparison_mode = st.radio(
+        "Comparison mode",
+        options=list(comparison_modes),
+        format_func=comparison_modes.get,
+        horizontal=True
+    )
+    concurrency = st.slider("Parallel requests", min_value=1, max_value=8, value=MAX_CONCURRENCY) if comparison_mode == "map_reduce" else MAX_CONCURRENCY
+    if comparison_mode == "revision":
+        st.caption(f"Previous draft {previous_draft['name']}: {draft_delta['unchanged']} paragraphs unchanged, "
+                   f"{len(draft_delta['changed'])} edited, {len(draft_delta['removed'])} removed and {len(draft_delta['added'])} added.")
+    if comparison_mode == "full":
+        # Counted locally, so an oversized prompt is caught before any request is sent
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert in legal document comparison."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5
-            )
-            return response.choices[0].message['content']
-        except Exception as e:
-            return f"An error occurred: {e}"
+            budget_model, budget_tokens = prompt_budget(COMPARISON_SYSTEM_MESSAGE, build_comparison_prompt(doc1_text, doc2_text))
+            st.caption(f"Prompt about {budget_tokens:,} tokens, sent to {budget_model}.")
+        except PromptTooLarge as e:
+            st.warning(str(e))
 
     if st.button("Generate Comparison Summary"):
-        comparison_result = compare_docs_with_gpt(doc1_text, doc2_text)
-        st.subheader("Document Comparison Summary")
-        st.write(comparison_result)
+        if run_in_background:
+            st.session_state.jobs.append(submit(
+                comparison_job, comparison_mode, doc1_text, doc2_text, previous_comparison, draft_delta, concurrency, use_cache,
+                reference_template, label=f"Document Comparison Summary ({doc2_file.name})"
+            ))
+        else:
+            st.subheader("Document Comparison Summary")
+            comparison_caption = None
+            if comparison_mode == "map_reduce":
+                comparison_result, run_stats = compare_docs_map_reduce(doc1_text, doc2_text, concurrency=concurrency, use_cache=use_cache)
+                st.write(comparison_result)
+                comparison_caption = run_stats and chunk_caption(run_stats)
+            elif comparison_mode == "diff":
+                diff_stats = {}
+
+                def compare_changed_clauses(doc1, doc2, on_token=None, use_cache=True):
+                    result, stats = compare_docs_diff_first(doc1, doc2, on_token=on_token, use_cache=use_cache,
+                                                            template=reference_template)
+                    diff_stats.update(stats or {})
+                    return result
+
+                comparison_result = run_llm(compare_changed_clauses, doc1_text, doc2_text)
+                comparison_caption = diff_stats and diff_caption(diff_stats)
+            elif comparison_mode == "revision":
+                draft_stats = {}
+
+                def compare_changed_paragraphs(doc1, doc2, on_token=None, use_cache=True):
+                    result, stats = compare_docs_incremental(doc1, doc2, previous_comparison, draft_delta,
+                                                             on_token=on_token, use_cache=use_cache)
+                    draft_stats.update(stats or {})
+                    return result
+
+                comparison_result = run_llm(compare_changed_paragraphs, doc1_text, doc2_text)
+                comparison_caption = draft_stats and draft_caption(draft_stats)
+            else:
+                comparison_result = run_llm(compare_docs_with_gpt, doc1_text, doc2_text)
+            if comparison_caption:
+                st.caption(comparison_caption)
+            draft_warning = remember_comparison(comparison_result)
+            if draft_warning:
+                st.warning(draft_warning)
 
     st.header("Ask Questions about the Documents")
 
-    def answer_question_with_gpt(question, doc2, doc1):
-        prompt = f"""
-        You are a helpful assistant of the client that can answer questions about two documents.
-        Focus primarily on the Comparison file but consider the Reference file for comparisons.
-
-        Comparison file:
-        {doc2}
-
-        Reference file:
-        {doc1}
-
-        Question: {question}
-        Provide a detailed answer based on Comparison file in comparison to Reference file, prioritizing the Comparison file.
-        you do not make up your own answers, limit the content to the documents. Limit the answer to max 100 words, 
-        Reference file is the company agreed standard.
-        If the question is unrelated to the documents, respond with:
-        "The question is not related to the content of the provided documents. Please ask a relevant question."
-         """
-
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert assistant in document analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
-            )
-            return response.choices[0].message['content']
-        except Exception as e:
-            return f"An error occurred while answering the question: {e}"
-
     question = st.text_input("Enter a question about the contract (optional):")
+    use_retrieval = st.checkbox("Answer from the most relevant clauses only (faster, works on long contracts)", value=True)
     if question and st.button("Get Answer"):
-        answer = answer_question_with_gpt(question, doc2_text, doc1_text)
+        doc_indexes = None
+        if use_retrieval:
+            # Clause indexes are built once per document and reused for every question
+            try:
+                doc1_index = template_clause_index(reference_template) if reference_template else None
+                doc_indexes = (
+                    cached_stage("clause_index", lambda: build_clause_index(doc2_text), doc2_key),
+                    doc1_index or cached_stage("clause_index", lambda: build_clause_index(doc1_text), doc1_key),
+                )
+            except Exception as e:
+                st.warning(f"Clause index unavailable, answering from the full documents: {e}")
+
         st.write("Answer:")
-        st.write(answer)
+        if doc_indexes:
+            retrieval_stats = {}
+
+            def answer_from_index(question, on_token=None, use_cache=True):
+                answer, stats = answer_question_with_retrieval(question, doc2_text, doc1_text, *doc_indexes,
+                                                               on_token=on_token, use_cache=use_cache)
+                retrieval_stats.update(stats or {})
+                return answer
+
+            answer = run_llm(answer_from_index, question)
+            if retrieval_stats:
+                st.caption(f"Retrieved {retrieval_stats['clauses_retrieved']} clauses in {retrieval_stats['retrieval_time']:.2f}s, "
+                           f"saving about {retrieval_stats['tokens_saved']:,} prompt tokens.")
+        else:
+            answer = run_llm(answer_question_with_gpt, question, doc2_text, doc1_text)
 
     st.header("Generate Summary for Comparison File with Key Differences")
 
-    def generate_summary_doc2():
-        prompt = f"""
-        Provide a brief summary of the Comparison file and highlight the key differences compared to the Reference file.
-        Focus on the impact of these differences and provide recomended action plan or negotiation strategy. Limit the summary to 200 words.
-
-        Comparison file:
-        {doc2_text}
-
-        Reference file:
-        {doc1_text}
-        """
-
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an expert summarizer."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
+    if st.button("Generate Comparison File Summary with Key Differences"):
+        if run_in_background:
+            st.session_state.jobs.append(submit(
+                request_summary_doc2, doc2_text, doc1_text, on_token=report_partial, use_cache=use_cache,
+                label=f"Summary of Comparison File ({doc2_file.name})"
+            ))
+        else:
+            st.subheader("Summary of Comparison File with Key Differences")
+            summary = run_llm(generate_summary_doc2, doc2_text, doc1_text)
+
+            st.download_button(
+                label="Download Summary",
+                data=summary,
+                file_name="summary_doc2.txt",
+                mime="text/plain"
             )
-            return response.choices[0].message['content']
-        except Exception as e:
-            return f"An error occurred while generating the summary: {e}"
 
-    if st.button("Generate Comparison File Summary with Key Differences"):
-        summary = generate_summary_doc2()
-        st.subheader("Summary of Comparison File with Key Differences")
-        st.write(summary)
-
-        st.download_button(
-            label="Download Summary",
-            data=summary,
-            file_name="summary_doc2.txt",
-            mime="text/plain"
-        )
+    st.header("Analyze All")
+
+    # Run the selected analyses at the same time instead of one button after another
+    analysis_titles = {
+        "comparison": "Document Comparison Summary",
+        "summary": "Summary of Comparison File with Key Differences",
+        "question": "Answer",
+    }
+    available_analyses = ["comparison", "summary"] + (["question"] if question else [])
+    selected_analyses = st.multiselect(
+        "Analyses to run",
+        options=available_analyses,
+        default=["comparison", "summary"],
+        format_func=analysis_titles.get
+    )
+
+    if selected_analyses and st.button("Analyze All"):
+        tasks = analysis_tasks(doc1_text, doc2_text, question, diff_first=comparison_mode == "diff",
+                               revision=(previous_comparison, draft_delta) if comparison_mode == "revision" else None,
+                               template=reference_template)
+        tasks = {name: tasks[name] for name in selected_analyses}
+        panels = {}
+        for name in selected_analyses:
+            with st.expander(analysis_titles[name], expanded=True):
+                panels[name] = st.empty()
+                panels[name].info("Running...")
+
+        pending = set(selected_analyses)
+        try:
+            for name, result in run_analyses(tasks, max_workers=len(tasks), use_cache=use_cache):
+                pending.discard(name)
+                panels[name].write(result)
+                draft_warning = remember_comparison(result) if name == "comparison" else None
+                if draft_warning:
+                    st.warning(draft_warning)
+        except AnalysisFailed as e:
+            pending.discard(e.name)
+            panels[e.name].error(f"An error occurred: {e.error}")
+            for name in pending:
+                panels[name].warning("Cancelled because another analysis failed.")
+
+# Background jobs of this session, shown after the uploads are gone too; running jobs refresh on their own
+if st.session_state.jobs:
+    st.header("Background Jobs")
+    st.session_state.jobs = show_jobs(st.session_state.jobs)
+
+# Response cache counters, written last so they include this run's requests
+try:
+    cache_counts = llm_cache.cache_stats()
+    cache_status.caption(f"Response cache: {cache_counts['hits']} hits, {cache_counts['misses']} misses, "
+                         f"{cache_counts['entries']} stored responses.")
+except sqlite3.Error as e:
+    cache_status.caption(f"Response cache unavailable: {e}")
+
+# Performance panel, written last so it covers every stage of this run
+show_performance_panel(trace)
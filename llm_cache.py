@@ -0,0 +1,118 @@
+# Persistent SQLite cache of LLM responses with TTL and size-based eviction
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+
+# Responses older than this are treated as misses and purged
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600
+
+# Total stored response text above which the least recently used entries are evicted
+MAX_CACHE_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "50")) * 1024 * 1024
+
+# Hit/miss counters since the process started, shared by every session
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    model TEXT NOT NULL,
+    system_message TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, system_message, prompt_hash, temperature)
+)
+"""
+
+
+# Function to open the cache database for one transaction, creating it on first use
+@contextmanager
+def _connect(path=None):
+    connection = sqlite3.connect(path or CACHE_PATH, timeout=10)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(_SCHEMA)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+# Function to split chat messages into the cache key columns
+def cache_key(model, messages, temperature):
+    """Returns (model, system_message, prompt_hash, temperature) for a chat request."""
+    system_message = "\n".join(m["content"] for m in messages if m["role"] == "system")
+    prompt = "\0".join(f"{m['role']}:{m['content']}" for m in messages if m["role"] != "system")
+    return model, system_message, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), float(temperature)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+# Function to return a cached response for the key, or None on a miss
+def get(key, path=None):
+    now = time.time()
+    with _connect(path) as connection:
+        row = connection.execute(
+            "SELECT response, created FROM responses WHERE model=? AND system_message=? AND prompt_hash=? AND temperature=?",
+            key
+        ).fetchone()
+        if row is None or now - row[1] > TTL_SECONDS:
+            _count("misses")
+            return None
+        connection.execute(
+            "UPDATE responses SET last_used=? WHERE model=? AND system_message=? AND prompt_hash=? AND temperature=?",
+            (now,) + key
+        )
+    _count("hits")
+    return row[0]
+
+
+# Function to store a response and evict expired or least recently used entries
+def put(key, response, path=None):
+    now = time.time()
+    size = len(response.encode("utf-8"))
+    with _connect(path) as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            key + (response, size, now, now)
+        )
+        evicted = connection.execute("DELETE FROM responses WHERE created < ?", (now - TTL_SECONDS,)).rowcount
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > MAX_CACHE_BYTES:
+            rows = connection.execute("SELECT rowid, size FROM responses ORDER BY last_used").fetchall()
+            stale = []
+            for rowid, row_size in rows:
+                if total <= MAX_CACHE_BYTES:
+                    break
+                stale.append((rowid,))
+                total -= row_size
+            connection.executemany("DELETE FROM responses WHERE rowid=?", stale)
+            evicted += len(stale)
+    if evicted:
+        with _stats_lock:
+            _stats["evictions"] += evicted
+
+
+# Function to report hit/miss counters and the current cache size
+def cache_stats(path=None):
+    with _connect(path) as connection:
+        entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    with _stats_lock:
+        return dict(_stats, entries=entries, bytes=size)
+
+
+# Function to delete every cached response
+def clear(path=None):
+    with _connect(path) as connection:
+        connection.execute("DELETE FROM responses")
@@ -0,0 +1,222 @@
+# Single entry point for OpenAI chat requests, with optional token streaming and latency tracking.
+# Requests share one pooled HTTP session, a process-wide rate limit and in-flight cap, and retry transient errors.
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import openai
+import requests
+
+import llm_cache
+from tracing import span
+
+# Most recent call records, shared by every session in the process
+MAX_RECENT_CALLS = 200
+recent_calls = deque(maxlen=MAX_RECENT_CALLS)
+
+# Seconds to wait for the connection and for each read; a streamed reply may run longer as long as chunks keep arriving
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+
+# Retries after a rate limit, timeout, connection error or server error, with jittered exponential backoff
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+# Limits shared by every session and thread in the process (0 disables a limit)
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "160000"))
+MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+
+# Minimum seconds between on_token updates while streaming; the full reply is always delivered at the end
+STREAM_UPDATE_SECONDS = float(os.getenv("LLM_STREAM_UPDATE_SECONDS", "0.05"))
+
+# The rate limiters allow bursts of up to this many seconds of their per-minute budget
+BURST_SECONDS = 10
+
+logger = logging.getLogger(__name__)
+_local = threading.local()
+_in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+_bucket_lock = threading.Lock()
+_buckets = {
+    name: {"rate": per_minute / 60, "capacity": per_minute / 60 * BURST_SECONDS,
+           "level": per_minute / 60 * BURST_SECONDS, "updated": time.monotonic()}
+    for name, per_minute in (("requests", REQUESTS_PER_MINUTE), ("tokens", TOKENS_PER_MINUTE))
+    if per_minute > 0
+}
+
+# One connection pool for every thread, instead of the per-thread sessions openai creates by default
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MAX_IN_FLIGHT))
+_session.mount("http://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=MAX_IN_FLIGHT))
+openai.requestssession = _session
+
+
+# Function to take amount from a token bucket, sleeping until it has refilled enough; returns the seconds waited
+def _acquire(name, amount):
+    bucket = _buckets.get(name)
+    waited = 0.0
+    while bucket is not None and amount > 0:
+        with _bucket_lock:
+            now = time.monotonic()
+            bucket["level"] = min(bucket["capacity"], bucket["level"] + (now - bucket["updated"]) * bucket["rate"])
+            bucket["updated"] = now
+            # A request larger than the burst waits for a full bucket rather than forever
+            needed = min(amount, bucket["capacity"])
+            if bucket["level"] >= needed:
+                bucket["level"] -= needed
+                return waited
+            delay = (needed - bucket["level"]) / bucket["rate"]
+        time.sleep(delay)
+        waited += delay
+    return waited
+
+
+# Function to charge tokens used beyond the estimate (the reply) without waiting; the bucket may go negative
+def _charge(name, amount):
+    bucket = _buckets.get(name)
+    if bucket is not None and amount:
+        with _bucket_lock:
+            bucket["level"] -= amount
+
+
+# Function to decide whether a failed request is worth retrying
+def _retryable(error):
+    if isinstance(error, openai.error.RateLimitError):
+        return error.code != "insufficient_quota"
+    if isinstance(error, (openai.error.Timeout, openai.error.APIConnectionError,
+                          openai.error.ServiceUnavailableError, openai.error.TryAgain)):
+        return True
+    if isinstance(error, openai.error.APIError):
+        return error.http_status is None or error.http_status >= 500
+    return isinstance(error, requests.exceptions.RequestException)
+
+
+# Function to compute the wait before retry number attempt: the server's Retry-After, else full jitter backoff
+def _backoff(attempt, error):
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return min(BACKOFF_MAX, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+# Function to make one API request; progress["first_token"] is set once a streamed token has been delivered
+def _send(model, messages, temperature, on_token, start, progress):
+    if on_token is None:
+        response = openai.ChatCompletion.create(model=model, messages=messages, temperature=temperature,
+                                                request_timeout=REQUEST_TIMEOUT)
+        return response.choices[0].message['content'], response.get("usage")
+    text, usage, shown, last_update = "", None, "", 0.0
+    # include_usage adds a final chunk with the token usage and no choices
+    for chunk in openai.ChatCompletion.create(model=model, messages=messages, temperature=temperature, stream=True,
+                                              stream_options={"include_usage": True}, request_timeout=REQUEST_TIMEOUT):
+        usage = chunk.get("usage") or usage
+        if not chunk["choices"]:
+            continue
+        delta = chunk["choices"][0]["delta"].get("content")
+        if not delta:
+            continue
+        if progress["first_token"] is None:
+            progress["first_token"] = time.perf_counter() - start
+        text += delta
+        now = time.perf_counter()
+        if now - last_update >= STREAM_UPDATE_SECONDS:
+            shown, last_update = text, now
+            on_token(text)
+    if text != shown:
+        on_token(text)
+    return text, usage
+
+
+# Function to send a chat request, streaming the reply through on_token when given
+def chat_completion(model, messages, temperature, on_token=None, label=None, use_cache=True, estimated_tokens=None):
+    """
+    Returns the reply text. With on_token, the request is streamed and
+    on_token(text_so_far) is called as each chunk arrives. With use_cache, a
+    stored reply for the same model, messages and temperature is returned
+    without calling the API. Each call records time-to-first-token and total
+    latency (seconds), see last_call(), along with estimated_tokens (the local
+    prompt count), the prompt and completion tokens the API reports, the
+    retries made and the seconds spent waiting for the rate limit.
+    A streamed request is only retried before its first token was shown.
+    """
+    with span("chat_completion", model=model, label=label, estimated_tokens=estimated_tokens) as attributes:
+        text = _chat_completion(model, messages, temperature, on_token, label, use_cache, estimated_tokens)
+        call = _local.last_call
+        attributes.update({name: call[name] for name in ("cached", "stream", "prompt_tokens", "completion_tokens", "retries")})
+        return text
+
+
+def _chat_completion(model, messages, temperature, on_token, label, use_cache, estimated_tokens):
+    start = time.perf_counter()
+    progress = {"first_token": None}
+    key = llm_cache.cache_key(model, messages, temperature) if use_cache else None
+    text = None
+    if key is not None:
+        try:
+            text = llm_cache.get(key)
+        except sqlite3.Error:
+            key = None
+    cached = text is not None
+    usage = None
+    retries = 0
+    rate_limit_wait = 0.0
+
+    if cached:
+        if on_token is not None:
+            on_token(text)
+    else:
+        while True:
+            rate_limit_wait += _acquire("requests", 1) + _acquire("tokens", estimated_tokens or 0)
+            try:
+                with _in_flight:
+                    text, usage = _send(model, messages, temperature, on_token, start, progress)
+                break
+            except Exception as e:
+                if retries >= MAX_RETRIES or progress["first_token"] is not None or not _retryable(e):
+                    raise
+                delay = _backoff(retries, e)
+                retries += 1
+                logger.warning("%s %s: %s; retry %d of %d in %.1fs",
+                               label or "chat", model, type(e).__name__, retries, MAX_RETRIES, delay)
+                time.sleep(delay)
+        if usage:
+            _charge("tokens", usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0) - (estimated_tokens or 0))
+
+    if key is not None and not cached:
+        try:
+            llm_cache.put(key, text)
+        except sqlite3.Error:
+            pass
+
+    total = time.perf_counter() - start
+    first_token = progress["first_token"]
+    record = {
+        "label": label,
+        "model": model,
+        "stream": on_token is not None,
+        "cached": cached,
+        # A blocking call delivers every token at once, so its first token arrives with the full reply
+        "time_to_first_token": first_token if first_token is not None else total,
+        "total_latency": total,
+        "estimated_tokens": estimated_tokens,
+        "prompt_tokens": usage.get("prompt_tokens") if usage else None,
+        "completion_tokens": usage.get("completion_tokens") if usage else None,
+        "retries": retries,
+        "rate_limit_wait": rate_limit_wait,
+    }
+    logger.info("%s %s: estimated %s prompt tokens, API reported %s prompt and %s completion tokens%s",
+                label or "chat", model, estimated_tokens, record["prompt_tokens"], record["completion_tokens"],
+                " (cached)" if cached else "")
+    _local.last_call = record
+    recent_calls.append(record)
+    return text
+
+
+# Function to return the timing record of the latest call made on this thread
+def last_call():
+    return getattr(_local, "last_call", None)
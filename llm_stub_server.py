@@ -0,0 +1,164 @@
+# Local stand-in for the OpenAI chat completions endpoint, to exercise the LLM client offline under load and faults.
+# Run `python llm_stub_server.py --port 8765`, then point the apps at it with OPENAI_API_BASE=http://127.0.0.1:8765/v1
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from token_budget import count_tokens
+
+# Default behaviour: reply latency, delay between streamed words, injected fault rates and a server-side request limit
+DEFAULT_OPTIONS = {
+    "latency": 0.2,
+    "token_delay": 0.01,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "requests_per_minute": 0,
+    "retry_after": 1.0,
+}
+
+
+# Function to build the stub reply for a request
+def stub_reply(messages):
+    prompt = messages[-1]["content"] if messages else ""
+    return f"Stub reply to a prompt of {len(prompt.split())} words."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves POST /v1/chat/completions (blocking or streamed) with the faults configured on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _fault(self):
+        options, server = self.server.options, self.server
+        with server.lock:
+            now = time.monotonic()
+            window = server.request_times
+            while window and now - window[0] > 60:
+                window.popleft()
+            over_limit = options["requests_per_minute"] and len(window) >= options["requests_per_minute"]
+            if not over_limit:
+                window.append(now)
+        if over_limit or random.random() < options["rate_limit_rate"]:
+            return 429, {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}
+        if random.random() < options["error_rate"]:
+            return 500, {"message": "Internal server error (stub)", "type": "server_error", "code": None}
+        return None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        self.server.count("requests")
+        fault = self._fault()
+        if fault is not None:
+            status, error = fault
+            self.server.count(f"http_{status}")
+            headers = {"Retry-After": str(self.server.options["retry_after"])} if status == 429 else None
+            self._send_json(status, {"error": error}, headers)
+            return
+
+        time.sleep(self.server.options["latency"])
+        messages = body.get("messages", [])
+        model = body.get("model", "stub")
+        reply = stub_reply(messages)
+        usage = {"prompt_tokens": sum(count_tokens(message["content"], model) for message in messages)}
+        usage["completion_tokens"] = count_tokens(reply, model)
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self.server.count("completed")
+        if not body.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = reply.split(" ")
+        for n, word in enumerate(words):
+            self._send_event({"choices": [{"index": 0, "delta": {"content": word if n == 0 else " " + word}}]}, model)
+            time.sleep(self.server.options["token_delay"])
+        self._send_event({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}, model)
+        if body.get("stream_options", {}).get("include_usage"):
+            self._send_event({"choices": [], "usage": usage}, model)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_event(self, chunk, model):
+        chunk.update({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model})
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+
+# Function to create a stub server with the given options (see DEFAULT_OPTIONS); port 0 picks a free port
+def make_stub_server(host="127.0.0.1", port=0, **options):
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.options = {**DEFAULT_OPTIONS, **options}
+    server.lock = threading.Lock()
+    server.request_times = deque()
+    server.stats = Counter()
+
+    def count(name):
+        with server.lock:
+            server.stats[name] += 1
+
+    server.count = count
+    return server
+
+
+# Function to run a stub server on a background thread; returns (server, api_base) and server.shutdown() stops it
+def start_stub_server(host="127.0.0.1", port=0, **options):
+    server = make_stub_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stub of the OpenAI chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=DEFAULT_OPTIONS["latency"], help="seconds before each reply")
+    parser.add_argument("--token-delay", type=float, default=DEFAULT_OPTIONS["token_delay"], help="seconds between streamed words")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 429")
+    parser.add_argument("--requests-per-minute", type=int, default=0, help="answer 429 above this rate (0 = unlimited)")
+    args = parser.parse_args()
+
+    server = make_stub_server(args.host, args.port, latency=args.latency, token_delay=args.token_delay,
+                              error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                              requests_per_minute=args.requests_per_minute)
+    print(f"Stub API at http://{args.host}:{server.server_address[1]}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(dict(server.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# Clause-aligned chunking and parallel map-reduce for documents beyond the model context
+from concurrent.futures import ThreadPoolExecutor
+
+from clause_segmenter import segment_clauses
+from clause_similarity import top_k_similarities, vectorize_clauses
+from tracing import in_current_trace
+
+# Words per chunk pair side; keeps a chunk pair plus instructions well inside the model context
+MAX_CHUNK_WORDS = 600
+
+# Default number of map calls in flight at once
+MAX_CONCURRENCY = 4
+
+
+# Function to split extracted text into clause units (numbered clauses, sub-clauses and headings)
+def split_clauses(text):
+    return segment_clauses(text)
+
+
+# Function to count words, used as a cheap proxy for model tokens
+def word_count(text):
+    return len(text.split())
+
+
+# Function to decide whether the texts together exceed a single prompt budget
+def needs_map_reduce(*texts, max_words=MAX_CHUNK_WORDS * 2):
+    return sum(word_count(text) for text in texts) > max_words
+
+
+# Function to pack consecutive clauses into chunks of at most max_words (a longer clause gets its own chunk)
+def pack_chunks(clauses, max_words=MAX_CHUNK_WORDS):
+    chunks, current, size = [], [], 0
+    for clause in clauses:
+        words = word_count(clause)
+        if current and size + words > max_words:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(clause)
+        size += words
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# Function to pair every reference chunk with the comparison clauses that correspond to it
+def align_chunk_pairs(ref_text, comp_text, max_words=MAX_CHUNK_WORDS):
+    """
+    Chunks the reference document on clause boundaries, then assigns each
+    comparison clause to the chunk holding its most similar reference clause.
+    Comparison clauses with no similar reference clause follow the previous
+    comparison clause, so inserted clauses stay next to their neighbours.
+    Returns a list of (ref_chunk_text, comp_chunk_text).
+    """
+    ref_clauses = split_clauses(ref_text)
+    comp_clauses = split_clauses(comp_text)
+    ref_chunks = pack_chunks(ref_clauses, max_words)
+    if not ref_chunks:
+        return [("", "\n".join(chunk)) for chunk in pack_chunks(comp_clauses, max_words)]
+
+    chunk_of_clause = [i for i, chunk in enumerate(ref_chunks) for _ in chunk]
+    comp_chunks = [[] for _ in ref_chunks]
+    if comp_clauses:
+        try:
+            ref_vectors, comp_vectors = vectorize_clauses(ref_clauses, comp_clauses)
+            _, _, best_ref, best_score = top_k_similarities(ref_vectors, comp_vectors, k=1)
+        except ValueError:  # no usable vocabulary, fall back to document order
+            best_ref, best_score = None, None
+        previous = 0
+        for j, clause in enumerate(comp_clauses):
+            if best_score is not None and best_score[j, 0] > 0:
+                previous = chunk_of_clause[best_ref[j, 0]]
+            elif best_score is None:
+                previous = min(j * len(ref_chunks) // len(comp_clauses), len(ref_chunks) - 1)
+            comp_chunks[previous].append(clause)
+
+    return [("\n".join(ref), "\n".join(comp)) for ref, comp in zip(ref_chunks, comp_chunks)]
+
+
+# Function to group partial results into batches that each fit one reduce call
+def _reduce_batches(partials, max_words):
+    return ["\n\n".join(batch) for batch in pack_chunks(partials, max_words)]
+
+
+# Function to run map_fn over chunk pairs in parallel and merge the partial results with reduce_fn
+def map_reduce(pairs, map_fn, reduce_fn, concurrency=MAX_CONCURRENCY, max_reduce_words=MAX_CHUNK_WORDS * 2, on_progress=None):
+    """
+    map_fn(ref_chunk, comp_chunk) -> partial text, reduce_fn(partials_text) -> merged text.
+    Partials that do not fit one reduce call are reduced in rounds until one result remains.
+    on_progress(done, total) is called on the calling thread as chunk pairs finish.
+    Returns (result, stats) where stats counts chunks and model calls.
+    """
+    stats = {"chunk_pairs": len(pairs), "map_calls": 0, "reduce_calls": 0, "concurrency": concurrency}
+    map_fn, reduce_fn = in_current_trace(map_fn), in_current_trace(reduce_fn)
+    if not pairs:
+        stats["calls"] = 0
+        return "", stats
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        partials = []
+        for partial in pool.map(lambda pair: map_fn(*pair), pairs):
+            partials.append(partial)
+            if on_progress is not None:
+                on_progress(len(partials), len(pairs))
+        stats["map_calls"] = len(pairs)
+
+        batches = _reduce_batches(partials, max_reduce_words)
+        while True:
+            merged = list(pool.map(reduce_fn, batches))
+            stats["reduce_calls"] += len(batches)
+            if len(merged) == 1:
+                break
+            next_batches = _reduce_batches(merged, max_reduce_words)
+            # Stop shrinking once partials no longer combine; one final call merges whatever is left
+            batches = next_batches if len(next_batches) < len(merged) else ["\n\n".join(merged)]
+
+    stats["calls"] = stats["map_calls"] + stats["reduce_calls"]
+    return merged[0], stats
@@ -1,2 +1,83 @@
-import nltk
-nltk.download('stopwords')
\ No newline at end of file
+# Offline NLTK bootstrap: run `python nltk_helper1.py` once per machine to install the data the clause tools use.
+# The apps only check for the data locally and never download at startup.
+import argparse
+import sys
+import threading
+
+# NLTK resources used by preprocess_text, as (download id, data path)
+RESOURCES = (
+    ("stopwords", "corpora/stopwords"),
+    ("punkt_tab", "tokenizers/punkt_tab"),
+)
+
+_lock = threading.Lock()
+_verified = False
+_stop_words = None
+
+
+# Function to list the required resources that are not installed locally
+def missing_resources():
+    from nltk.data import find
+    missing = []
+    for name, path in RESOURCES:
+        try:
+            find(path)
+        except LookupError:
+            missing.append(name)
+    return missing
+
+
+# Function to check the local NLTK data once per process, without any network access
+def ensure_nltk_data():
+    global _verified
+    if _verified:
+        return
+    with _lock:
+        if not _verified:
+            missing = missing_resources()
+            if missing:
+                raise RuntimeError(
+                    f"NLTK data is not installed ({', '.join(missing)}). Run `python nltk_helper1.py` once to install it."
+                )
+            _verified = True
+
+
+# Function to return the English stopwords, loaded on first use
+def english_stopwords():
+    global _stop_words
+    if _stop_words is None:
+        ensure_nltk_data()
+        from nltk.corpus import stopwords
+        _stop_words = frozenset(stopwords.words("english"))
+    return _stop_words
+
+
+# Function to split text into sentences with NLTK's punkt model, imported on first use
+def sent_tokenize(text):
+    ensure_nltk_data()
+    from nltk.tokenize import sent_tokenize as punkt_sent_tokenize
+    return punkt_sent_tokenize(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Install and verify the NLTK data used by the clause comparison tools.")
+    parser.add_argument("--download-dir", help="where to install the data; point NLTK_DATA at it for the apps (defaults to NLTK's search path)")
+    parser.add_argument("--check", action="store_true", help="only verify the local data, do not download")
+    args = parser.parse_args()
+
+    import nltk
+    if args.download_dir:
+        nltk.data.path.insert(0, args.download_dir)
+    if not args.check:
+        for name in missing_resources():
+            nltk.download(name, download_dir=args.download_dir, quiet=True)
+    missing = missing_resources()
+    if missing:
+        print(f"Missing NLTK data: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    print("NLTK data installed: " + ", ".join(name for name, _ in RESOURCES))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
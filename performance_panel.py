@@ -0,0 +1,36 @@
+# Sidebar panel with the timed stages of the current Streamlit run
+import streamlit as st
+
+from tracing import start_metrics_server
+
+
+# Function to show where the time of this run went, one line per stage, when the sidebar toggle is on
+def show_performance_panel(trace):
+    """Also starts the process metrics endpoint when METRICS_PORT is set; nested stages count in their parents too."""
+    url = start_metrics_server()
+    if not st.sidebar.checkbox("Show performance panel", value=False):
+        return
+    with st.sidebar.expander("Performance", expanded=True):
+        if not trace:
+            st.caption("No pipeline stages ran in this run.")
+        stages = {}
+        for entry in trace:
+            stage = stages.setdefault(entry["stage"], {"calls": 0, "seconds": 0.0, "input": 0, "output": 0,
+                                                       "prompt_tokens": 0, "completion_tokens": 0, "errors": 0})
+            stage["calls"] += 1
+            stage["seconds"] += entry["seconds"]
+            stage["errors"] += entry["error"] is not None
+            for name, key in (("input", "input_size"), ("output", "output_size"),
+                              ("prompt_tokens", "prompt_tokens"), ("completion_tokens", "completion_tokens")):
+                stage[name] += entry.get(key) or 0
+        for name, stage in sorted(stages.items(), key=lambda item: -item[1]["seconds"]):
+            details = [f"{stage['calls']} call{'s' if stage['calls'] != 1 else ''}"]
+            if stage["input"] or stage["output"]:
+                details.append(f"in {stage['input']:,} / out {stage['output']:,}")
+            if stage["prompt_tokens"] or stage["completion_tokens"]:
+                details.append(f"{stage['prompt_tokens']:,} + {stage['completion_tokens']:,} tokens")
+            if stage["errors"]:
+                details.append(f"{stage['errors']} failed")
+            st.markdown(f"**{name}** {stage['seconds']:.3f}s  \n{', '.join(details)}")
+        if url:
+            st.caption(f"Process metrics: {url}")
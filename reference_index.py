@@ -0,0 +1,200 @@
+# Precompiled reference-standard templates: clauses, TF-IDF model and embeddings stored once on disk
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+from scipy import sparse
+
+from extraction_cache import cached_stage
+from map_reduce import split_clauses
+
+TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", "templates")
+
+_slug_chars = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+# Function to turn a template name into a safe directory name
+def template_slug(name):
+    return _slug_chars.sub("-", name.strip()).strip("-.").lower() or "template"
+
+
+def _template_path(name, template_dir=None):
+    return os.path.join(template_dir or TEMPLATE_DIR, template_slug(name))
+
+
+# Function to register a reference text as a template and persist its index
+def register_template(name, text, source_name="", with_embeddings=True, template_dir=None):
+    """
+    Writes <template_dir>/<slug>/ with:
+      manifest.json  name, source, digest and per-clause metadata (offset, words, hash)
+      tfidf.npz      vocabulary, idf weights and L2-normalised clause vectors
+      embeddings.npy float16 sentence embeddings (only when sentence_transformers is available)
+    Returns the manifest.
+    """
+    clauses = split_clauses(text)
+    if not clauses:
+        raise ValueError("The reference document has no text to index.")
+    path = _template_path(name, template_dir)
+    os.makedirs(path, exist_ok=True)
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    vectorizer = TfidfVectorizer(norm="l2", dtype=np.float32)
+    vectors = vectorizer.fit_transform(clauses).tocsr()
+    terms = vectorizer.get_feature_names_out()
+    np.savez_compressed(
+        os.path.join(path, "tfidf.npz"),
+        terms=terms.astype(str),
+        idf=vectorizer.idf_.astype(np.float32),
+        data=vectors.data, indices=vectors.indices, indptr=vectors.indptr, shape=np.array(vectors.shape)
+    )
+
+    embedding_model = None
+    embeddings_path = os.path.join(path, "embeddings.npy")
+    if os.path.exists(embeddings_path):
+        os.remove(embeddings_path)
+    if with_embeddings:
+        try:
+            from clause_index import EMBEDDING_MODEL, encode
+            np.save(embeddings_path, encode(clauses).astype(np.float16))
+            embedding_model = EMBEDDING_MODEL
+        except (ImportError, OSError):  # sentence_transformers or its model is not available
+            pass
+
+    offset, clause_meta = 0, []
+    for clause in clauses:
+        clause_meta.append({
+            "text": clause,
+            "offset": offset,
+            "words": len(clause.split()),
+            "hash": hashlib.sha256(clause.encode("utf-8")).hexdigest()[:16],
+        })
+        offset += len(clause) + 1
+    manifest = {
+        "name": name,
+        "source": source_name,
+        "digest": hashlib.sha256("\n".join(clauses).encode("utf-8")).hexdigest(),
+        "created": time.time(),
+        "embedding_model": embedding_model,
+        "clauses": clause_meta,
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+# Function to list the registered template names
+def list_templates(template_dir=None):
+    template_dir = template_dir or TEMPLATE_DIR
+    if not os.path.isdir(template_dir):
+        return []
+    names = []
+    for entry in sorted(os.listdir(template_dir)):
+        manifest_path = os.path.join(template_dir, entry, "manifest.json")
+        if os.path.isfile(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                names.append(json.load(f)["name"])
+    return names
+
+
+def _read_template(path):
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    with np.load(os.path.join(path, "tfidf.npz")) as tfidf:
+        vocabulary = {term: i for i, term in enumerate(tfidf["terms"].tolist())}
+        idf = tfidf["idf"]
+        vectors = sparse.csr_matrix((tfidf["data"], tfidf["indices"], tfidf["indptr"]), shape=tuple(tfidf["shape"]))
+    embeddings_path = os.path.join(path, "embeddings.npy")
+    embeddings = np.load(embeddings_path).astype(np.float32) if os.path.isfile(embeddings_path) else None
+
+    clauses = [clause["text"] for clause in manifest["clauses"]]
+    return {
+        "name": manifest["name"],
+        "source": manifest["source"],
+        "digest": manifest["digest"],
+        "manifest": manifest,
+        "clauses": clauses,
+        "text": "\n".join(clauses),
+        "vocabulary": vocabulary,
+        "idf": idf,
+        "vectors": vectors,
+        "embeddings": embeddings,
+    }
+
+
+# Function to load a template index, cached in memory until the template is registered again
+def load_template(name, template_dir=None):
+    path = _template_path(name, template_dir)
+    mtime = os.path.getmtime(os.path.join(path, "manifest.json"))
+    return cached_stage("template", lambda: _read_template(path), path, mtime)
+
+
+# Function to return a template's precomputed clause index for question retrieval, if it has one
+def template_clause_index(template):
+    from clause_index import EMBEDDING_MODEL
+    if template["embeddings"] is None or template["manifest"]["embedding_model"] != EMBEDDING_MODEL:
+        return None
+    return {"clauses": template["clauses"], "embeddings": template["embeddings"]}
+
+
+# Function to vectorize comparison clauses with a template's fixed vocabulary and idf weights
+def vectorize_with_template(template, clauses):
+    """
+    Terms the template has never seen have no column, since no template clause can match them,
+    but they still count toward each clause's L2 norm, weighted with the idf of a term found in
+    no template clause. A clause that adds new obligations then scores as low as it would with a
+    vocabulary fitted on both documents, instead of as a near-copy.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+    vectorizer = CountVectorizer(vocabulary=template["vocabulary"], dtype=np.float32)
+    weighted = sparse.csr_matrix(vectorizer.transform(clauses).multiply(template["idf"]), dtype=np.float32)
+
+    # sklearn's smoothed idf for a document frequency of zero among the template's clauses
+    unseen_idf = np.log(1 + template["vectors"].shape[0]) + 1
+    analyze, vocabulary = vectorizer.build_analyzer(), template["vocabulary"]
+    unseen = np.zeros(len(clauses), dtype=np.float64)
+    for n, clause in enumerate(clauses):
+        counts = {}
+        for term in analyze(clause):
+            if term not in vocabulary:
+                counts[term] = counts.get(term, 0) + 1
+        unseen[n] = sum(count * count for count in counts.values()) * unseen_idf ** 2
+
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel() + unseen)
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags((1 / norms).astype(np.float32)) @ weighted)
+
+
+# Function to return (template vectors, comparison vectors) for clause alignment, in the shape of clause_similarity.vectorize_clauses
+def template_vectors(template, clauses):
+    return template["vectors"], vectorize_with_template(template, clauses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Register company standard reference templates.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    register = commands.add_parser("register", help="extract and index a reference file")
+    register.add_argument("name")
+    register.add_argument("file", help=".docx or .pdf reference file")
+    register.add_argument("--no-embeddings", action="store_true", help="skip sentence embeddings")
+    commands.add_parser("list", help="list registered templates")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name in list_templates():
+            print(name)
+        return
+
+    from extractors import extractor_for
+    with open(args.file, "rb") as f:
+        text = extractor_for(args.file)(f)
+    manifest = register_template(args.name, text, os.path.basename(args.file), with_embeddings=not args.no_embeddings)
+    print(f"Registered '{manifest['name']}' with {len(manifest['clauses'])} clauses"
+          + (" and embeddings" if manifest["embedding_model"] else ""))
+
+
+if __name__ == "__main__":
+    main()
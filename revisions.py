@@ -0,0 +1,189 @@
+# Paragraph-level revision tracking across negotiation rounds: which paragraphs of a draft changed since
+# the previous draft, and the analyses of earlier drafts that can be updated with just those changes
+import difflib
+import functools
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from clause_segmenter import paragraphs, preprocess_clauses
+from extraction_cache import cached_stage, content_key
+from tracing import traced
+
+REVISION_STORE_PATH = os.getenv("REVISION_STORE_PATH", ".revisions.sqlite3")
+
+# Share of a draft's paragraphs an earlier draft must also contain to count as its previous revision
+MIN_SHARED_PARAGRAPHS = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS revisions (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    paragraphs INTEGER NOT NULL,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paragraphs (
+    hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revision_paragraphs (
+    revision_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (revision_id, position)
+);
+CREATE INDEX IF NOT EXISTS revision_paragraphs_hash ON revision_paragraphs (hash);
+CREATE TABLE IF NOT EXISTS analyses (
+    reference TEXT NOT NULL,
+    revision_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    result TEXT NOT NULL,
+    added REAL NOT NULL,
+    PRIMARY KEY (reference, revision_id, kind)
+);
+"""
+
+
+# Function to open the revision store for one transaction, creating it on first use
+@contextmanager
+def _connect(path=None):
+    connection = sqlite3.connect(path or REVISION_STORE_PATH, timeout=10)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+# Function to hash a paragraph; whitespace differences do not count as a change
+def paragraph_key(paragraph):
+    return hashlib.sha256(" ".join(paragraph.split()).encode("utf-8")).hexdigest()
+
+
+# Function to split extracted text into (hash, paragraph) pairs in document order
+def split_paragraphs(text):
+    return [(paragraph_key(paragraph), paragraph) for paragraph in paragraphs(text)]
+
+
+# Function to preprocess text paragraph by paragraph, reusing the clauses of paragraphs seen in earlier drafts
+def preprocess_paragraphs(text):
+    """Same clauses as clause_segmenter.preprocess_clauses(text); only paragraphs not cached yet are segmented."""
+    return [
+        clause
+        for key, paragraph in split_paragraphs(text)
+        for clause in cached_stage("paragraph_clauses", functools.partial(preprocess_clauses, paragraph), key)
+    ]
+
+
+# Function to store a draft and its paragraphs; returns its revision id (the existing one for a known draft)
+def record_revision(text, name="", path=None):
+    digest = content_key(text)
+    with _connect(path) as connection:
+        row = connection.execute("SELECT id FROM revisions WHERE digest=?", (digest,)).fetchone()
+        if row:
+            return row[0]
+        split = split_paragraphs(text)
+        revision_id = connection.execute(
+            "INSERT INTO revisions (digest, name, paragraphs, added) VALUES (?, ?, ?, ?)",
+            (digest, name, len(split), time.time())
+        ).lastrowid
+        connection.executemany("INSERT OR IGNORE INTO paragraphs VALUES (?, ?)", split)
+        connection.executemany(
+            "INSERT INTO revision_paragraphs VALUES (?, ?, ?)",
+            [(revision_id, position, key) for position, (key, _) in enumerate(split)]
+        )
+    return revision_id
+
+
+# Function to read the (hash, paragraph) pairs of a stored draft in document order
+def revision_paragraphs(revision_id, path=None):
+    with _connect(path) as connection:
+        return connection.execute(
+            "SELECT revision_paragraphs.hash, paragraphs.text FROM revision_paragraphs "
+            "JOIN paragraphs ON paragraphs.hash = revision_paragraphs.hash "
+            "WHERE revision_id=? ORDER BY position",
+            (revision_id,)
+        ).fetchall()
+
+
+# Function to store the result of an analysis of a draft against a reference document
+def save_analysis(reference, text, name, kind, result, path=None):
+    """reference identifies the reference document, e.g. by content digest; returns the draft's revision id."""
+    revision_id = record_revision(text, name, path)
+    with _connect(path) as connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?)",
+            (reference, revision_id, kind, result, time.time())
+        )
+    return revision_id
+
+
+# Function to find the earlier draft of a document analysed against the same reference, with that analysis
+def find_previous_analysis(reference, text, kind="comparison", path=None):
+    """
+    The previous draft is the stored draft sharing the most paragraphs with text (the latest on a tie),
+    provided it shares at least MIN_SHARED_PARAGRAPHS of them. Returns (revision, result) where revision
+    has "id", "name", "added" and "shared", or (None, None). The draft itself never matches.
+    """
+    keys = {key for key, _ in split_paragraphs(text)}
+    if not keys:
+        return None, None
+    with _connect(path) as connection:
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS probe_paragraphs (hash TEXT PRIMARY KEY)")
+        connection.execute("DELETE FROM probe_paragraphs")
+        connection.executemany("INSERT INTO probe_paragraphs VALUES (?)", [(key,) for key in keys])
+        row = connection.execute(
+            "SELECT revisions.id, revisions.name, revisions.added, COUNT(DISTINCT revision_paragraphs.hash) AS shared, "
+            "analyses.result FROM probe_paragraphs "
+            "JOIN revision_paragraphs ON revision_paragraphs.hash = probe_paragraphs.hash "
+            "JOIN revisions ON revisions.id = revision_paragraphs.revision_id "
+            "JOIN analyses ON analyses.revision_id = revisions.id AND analyses.reference = ? AND analyses.kind = ? "
+            "WHERE revisions.digest != ? GROUP BY revisions.id ORDER BY shared DESC, revisions.added DESC LIMIT 1",
+            (reference, kind, content_key(text))
+        ).fetchone()
+    if row is None or row[3] < MIN_SHARED_PARAGRAPHS * len(keys):
+        return None, None
+    return {"id": row[0], "name": row[1], "added": row[2], "shared": row[3]}, row[4]
+
+
+# Function to find which paragraphs changed between two drafts given as (hash, paragraph) pairs
+@traced()
+def paragraph_delta(old, new):
+    """
+    Returns a dict with "unchanged" (number of paragraphs kept), "changed" ((old, new) paragraph
+    pairs edited in place), "removed" and "added" (paragraph texts). Moved paragraphs count as
+    removed at their old position and added at their new one.
+    """
+    delta = {"unchanged": 0, "changed": [], "removed": [], "added": []}
+    matcher = difflib.SequenceMatcher(None, [key for key, _ in old], [key for key, _ in new], autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            delta["unchanged"] += i2 - i1
+            continue
+        removed = [paragraph for _, paragraph in old[i1:i2]]
+        added = [paragraph for _, paragraph in new[j1:j2]]
+        paired = min(len(removed), len(added))
+        delta["changed"] += list(zip(removed[:paired], added[:paired]))
+        delta["removed"] += removed[paired:]
+        delta["added"] += added[paired:]
+    return delta
+
+
+# Function to report the number of stored drafts and analyses
+def revision_stats(path=None):
+    with _connect(path) as connection:
+        revisions = connection.execute("SELECT COUNT(*) FROM revisions").fetchone()[0]
+        analyses = connection.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+    return {"revisions": revisions, "analyses": analyses}
+
+
+# Function to delete every stored draft and analysis
+def clear(path=None):
+    with _connect(path) as connection:
+        for table in ("analyses", "revision_paragraphs", "paragraphs", "revisions"):
+            connection.execute(f"DELETE FROM {table}")
@@ -0,0 +1,129 @@
+# Process-wide summarization model registry and summary cache
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from map_reduce import MAX_CONCURRENCY, align_chunk_pairs, map_reduce
+from tracing import span
+
+SUMMARY_MODEL = "facebook/bart-large-cnn"
+
+# Shared summary_server.py process to send summaries to, instead of loading the model in this process
+SUMMARY_SERVER_URL = os.getenv("SUMMARY_SERVER_URL")
+SUMMARY_SERVER_TIMEOUT = float(os.getenv("SUMMARY_SERVER_TIMEOUT", "600"))
+
+# Words per document side in one map step; a chunk pair stays inside BART's ~1024 input tokens
+BART_CHUNK_WORDS = 300
+
+# Maximum number of summaries kept in memory before the least recently used is dropped
+MAX_CACHED_SUMMARIES = 256
+
+# Loaded pipelines keyed by (task, model); module state is shared by every Streamlit session in the process
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+_summaries = OrderedDict()
+_summaries_lock = threading.Lock()
+_inflight = {}
+
+
+# Function to return a loaded pipeline, loading it on first use only
+def get_pipeline(task="summarization", model=SUMMARY_MODEL):
+    """Loads the Hugging Face pipeline once per process and returns the shared instance."""
+    key = (task, model)
+    pipe = _pipelines.get(key)
+    if pipe is None:
+        with _pipelines_lock:
+            pipe = _pipelines.get(key)
+            if pipe is None:
+                with span("load_model", model=model, task=task):
+                    from transformers import pipeline
+                    pipe = pipeline(task, model=model)
+                _pipelines[key] = pipe
+    return pipe
+
+
+# Function to build the cache key for a summary request
+def summary_key(text, model=SUMMARY_MODEL, **params):
+    """Hashes the model, generation parameters and input text."""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    for name in sorted(params):
+        digest.update(f"\0{name}={params[name]!r}".encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Function to return a cached summary or compute it exactly once
+def cached_summary(key, compute):
+    """
+    Returns the summary stored under key, calling compute() on a miss.
+    Concurrent callers with the same key wait for the first one instead of recomputing.
+    """
+    with _summaries_lock:
+        if key in _summaries:
+            _summaries.move_to_end(key)
+            return _summaries[key]
+        key_lock = _inflight.setdefault(key, threading.Lock())
+
+    with key_lock:
+        with _summaries_lock:
+            if key in _summaries:
+                return _summaries[key]
+        try:
+            summary = compute()
+            with _summaries_lock:
+                _summaries[key] = summary
+                while len(_summaries) > MAX_CACHED_SUMMARIES:
+                    _summaries.popitem(last=False)
+        finally:
+            with _summaries_lock:
+                _inflight.pop(key, None)
+    return summary
+
+
+# Function to request a summary from the shared summary server; raises RuntimeError with the server's error
+def remote_summary(text, model=SUMMARY_MODEL, **params):
+    import requests  # only needed with a summary server
+    with span("summary_server", model=model):
+        response = requests.post(f"{SUMMARY_SERVER_URL.rstrip('/')}/summarize", json={"text": text, "model": model, **params},
+                                 timeout=SUMMARY_SERVER_TIMEOUT)
+        # Check the status first: a proxy in between may answer with an HTML error page
+        if response.status_code != 200:
+            try:
+                error = response.json().get("error")
+            except ValueError:
+                error = response.text.strip()[:200] or response.reason
+            raise RuntimeError(f"Summary server error {response.status_code}: {error}")
+        return response.json()["summary"]
+
+
+# Function to summarize text with the shared model, memoized on the input hash
+def summarize(text, model=SUMMARY_MODEL, max_length=1000, min_length=300):
+    """Uses the summary server at SUMMARY_SERVER_URL when set, otherwise the model loaded in this process."""
+    params = {"max_length": max_length, "min_length": min_length, "do_sample": False}
+
+    def compute():
+        if SUMMARY_SERVER_URL:
+            return remote_summary(text, model, **params)
+        summarizer = get_pipeline("summarization", model)
+        return summarizer(text, truncation=True, **params)[0]['summary_text']
+
+    return cached_summary(summary_key(text, model, **params), compute)
+
+
+# Function to summarize a document pair too long for one BART input by summarizing aligned chunks and merging
+def summarize_map_reduce(ref_text, comp_text, concurrency=MAX_CONCURRENCY, max_length=1000, min_length=300, on_progress=None):
+    """Returns (summary, stats) with the number of chunk pairs and model calls used; on_progress as in map_reduce."""
+    pairs = align_chunk_pairs(ref_text, comp_text, max_words=BART_CHUNK_WORDS)
+
+    def summarize_chunk(ref_chunk, comp_chunk):
+        return summarize(f"Reference file:\n{ref_chunk}\n\nComparison file:\n{comp_chunk}", max_length=150, min_length=30)
+
+    def merge(partials):
+        return summarize(partials, max_length=max_length, min_length=min_length)
+
+    return map_reduce(pairs, summarize_chunk, merge, concurrency=concurrency, max_reduce_words=BART_CHUNK_WORDS * 2,
+                      on_progress=on_progress)
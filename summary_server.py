@@ -0,0 +1,278 @@
+# Shared local summarization server: one process holds the BART model for every Streamlit session and app,
+# and concurrent requests are batched dynamically into single pipeline calls.
+# Run `python summary_server.py --port 8766`, then point the apps at it with SUMMARY_SERVER_URL=http://127.0.0.1:8766
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from summarizer import SUMMARY_MODEL, get_pipeline
+from tracing import prometheus_metrics, record
+
+# Most requests summarized in one pipeline call
+MAX_BATCH_SIZE = int(os.getenv("SUMMARY_MAX_BATCH_SIZE", "8"))
+
+# Longest time the first request of a batch waits for others to join it
+MAX_WAIT_MS = float(os.getenv("SUMMARY_MAX_WAIT_MS", "50"))
+
+# Generation parameters a request may set, with their accepted types; requests are only batched with others using the same values
+GENERATION_PARAMS = {"max_length": int, "min_length": int, "do_sample": bool}
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+logger = logging.getLogger(__name__)
+
+
+# Function to summarize a batch of texts with one call of the shared pipeline
+def pipeline_batch(model=SUMMARY_MODEL):
+    def summarize_batch(texts, params):
+        # Inputs beyond the model's 1024 tokens are truncated rather than failing the whole batch
+        outputs = get_pipeline("summarization", model)(texts, batch_size=len(texts), truncation=True, **params)
+        return [output["summary_text"] for output in outputs]
+    return summarize_batch
+
+
+# Function to collect queued requests into batches of up to max_batch_size, waiting at most max_wait after the first
+def _next_batch(server):
+    first = server.requests.get()
+    if first is None:
+        return None
+    batch = [first]
+    deadline = time.perf_counter() + server.max_wait
+    while len(batch) < server.max_batch_size:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        try:
+            request = server.requests.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if request is None:
+            server.requests.put(None)
+            break
+        batch.append(request)
+    return batch
+
+
+# Function to summarize one group of requests in a single pipeline call; returns (summaries, error)
+def _call_batch(server, requests, params):
+    start = time.perf_counter()
+    error, error_type, summaries = None, None, [None] * len(requests)
+    try:
+        summaries = list(server.summarize_batch([request["text"] for request in requests], dict(params)))
+        if len(summaries) != len(requests):
+            raise RuntimeError(f"The model returned {len(summaries)} summaries for {len(requests)} texts.")
+    except Exception as e:
+        logger.warning("Summary batch of %d failed: %s", len(requests), e)
+        error, error_type = str(e) or type(e).__name__, type(e).__name__
+    seconds = time.perf_counter() - start
+    record("summary_batch", seconds, error=error_type, batch_size=len(requests))
+    with server.lock:
+        server.stats["batches"] += 1
+        server.stats["errors"] += error is not None
+        server.stats["busy_seconds"] += seconds
+        server.batch_sizes[len(requests)] += 1
+    return summaries, error
+
+
+# Function to hand each request its summary or error and wake its handler
+def _finish(requests, summaries, error):
+    for n, request in enumerate(requests):
+        summary = summaries[n] if n < len(summaries) else None
+        request.update(summary=summary, error=error or (None if summary is not None else "The model returned no summary."))
+        request["done"].set()
+
+
+# Function run on the batching thread: summarize batches until the server stops
+def _batch_loop(server):
+    """A failed batch is retried one request at a time, so only the requests that fail alone get the error."""
+    while True:
+        batch = _next_batch(server)
+        if batch is None:
+            return
+        groups = {}
+        for request in batch:
+            try:
+                groups.setdefault(tuple(sorted(request["params"].items())), []).append(request)
+            except TypeError as e:  # unhashable params; do_POST rejects them, so only direct callers get here
+                _finish([request], [], f"Invalid generation parameters: {e}")
+        for params, requests in groups.items():
+            try:
+                _run_group(server, requests, params)
+            except Exception as e:  # never leave a handler waiting, nor stop the batching thread
+                logger.exception("Summary batch of %d failed outside the pipeline", len(requests))
+                _finish([request for request in requests if not request["done"].is_set()], [], str(e) or type(e).__name__)
+
+
+# Function to summarize one group of requests sharing generation params, retrying one by one when the batch fails
+def _run_group(server, requests, params):
+    started = time.perf_counter()
+    with server.lock:
+        server.stats["queue_waits"] += len(requests)
+        server.stats["queue_wait_seconds"] += sum(started - request["queued"] for request in requests)
+    summaries, error = _call_batch(server, requests, params)
+    if error is None or len(requests) == 1:
+        _finish(requests, summaries, error)
+        return
+    with server.lock:
+        server.stats["retried_batches"] += 1
+    for request in requests:
+        _finish([request], *_call_batch(server, [request], params))
+
+
+class SummaryHandler(BaseHTTPRequestHandler):
+    """Serves POST /summarize, GET /metrics (Prometheus text format) and GET /health."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, body):
+        self._send(status, json.dumps(body).encode())
+
+    def do_GET(self):
+        if self.path.startswith("/metrics"):
+            self._send(200, summary_metrics(self.server).encode(), "text/plain; version=0.0.4")
+        elif self.path.startswith("/health"):
+            self._send_json(200, {"model": self.server.model, "queue_depth": self.server.requests.qsize()})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/summarize"):
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            text = body["text"]
+            if not isinstance(text, str):
+                raise TypeError("text")
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": "Expected a JSON body with a text field."})
+            return
+        # bool is an int subclass, so the integer params are checked not to be booleans as well
+        invalid = [name for name, kind in GENERATION_PARAMS.items() if name in body
+                   and (not isinstance(body[name], kind) or (kind is int and isinstance(body[name], bool)))]
+        if invalid:
+            self._send_json(400, {"error": f"Invalid generation parameters: {', '.join(invalid)}."})
+            return
+        if body.get("model", self.server.model) != self.server.model:
+            self._send_json(400, {"error": f"This server serves {self.server.model}, not {body['model']}."})
+            return
+
+        request = {
+            "text": text,
+            "params": {name: body[name] for name in GENERATION_PARAMS if name in body},
+            "queued": time.perf_counter(),
+            "done": threading.Event(),
+        }
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+        self.server.requests.put(request)
+        request["done"].wait()
+        if request["error"] is not None:
+            self._send_json(500, {"error": request["error"]})
+        else:
+            self._send_json(200, {"summary": request["summary"], "model": self.server.model})
+
+
+# Function to render the batching metrics and the process's stage metrics in the Prometheus text format
+def summary_metrics(server):
+    with server.lock:
+        stats, sizes = dict(server.stats), dict(server.batch_sizes)
+    lines = [
+        "# HELP docu_summary_queue_depth Summary requests waiting for a batch.",
+        "# TYPE docu_summary_queue_depth gauge",
+        f"docu_summary_queue_depth {server.requests.qsize()}",
+        "# HELP docu_summary_requests_total Summary requests received.",
+        "# TYPE docu_summary_requests_total counter",
+        f"docu_summary_requests_total {stats.get('requests', 0)}",
+        "# HELP docu_summary_batch_errors_total Pipeline calls that failed.",
+        "# TYPE docu_summary_batch_errors_total counter",
+        f"docu_summary_batch_errors_total {stats.get('errors', 0)}",
+        "# HELP docu_summary_batch_retries_total Failed batches retried one request at a time.",
+        "# TYPE docu_summary_batch_retries_total counter",
+        f"docu_summary_batch_retries_total {stats.get('retried_batches', 0)}",
+        "# HELP docu_summary_queue_wait_seconds Time requests waited before their batch started.",
+        "# TYPE docu_summary_queue_wait_seconds summary",
+        f"docu_summary_queue_wait_seconds_sum {stats.get('queue_wait_seconds', 0):.6f}",
+        f"docu_summary_queue_wait_seconds_count {stats.get('queue_waits', 0)}",
+        "# HELP docu_summary_batch_size Requests per pipeline call.",
+        "# TYPE docu_summary_batch_size histogram",
+    ]
+    for bound in BATCH_SIZE_BUCKETS:
+        lines.append(f'docu_summary_batch_size_bucket{{le="{bound}"}} {sum(c for size, c in sizes.items() if size <= bound)}')
+    lines.append(f'docu_summary_batch_size_bucket{{le="+Inf"}} {sum(sizes.values())}')
+    lines.append(f"docu_summary_batch_size_sum {sum(size * count for size, count in sizes.items())}")
+    lines.append(f"docu_summary_batch_size_count {sum(sizes.values())}")
+    return "\n".join(lines) + "\n" + prometheus_metrics()
+
+
+# Function to create a summary server and start its batching thread; port 0 picks a free port
+def make_summary_server(host="127.0.0.1", port=0, model=SUMMARY_MODEL, max_batch_size=MAX_BATCH_SIZE,
+                        max_wait_ms=MAX_WAIT_MS, summarize_batch=None):
+    """summarize_batch(texts, params) -> summaries defaults to the shared Hugging Face pipeline for model."""
+    server = ThreadingHTTPServer((host, port), SummaryHandler)
+    server.daemon_threads = True
+    server.model = model
+    server.max_batch_size = max(1, max_batch_size)
+    server.max_wait = max_wait_ms / 1000
+    server.summarize_batch = summarize_batch or pipeline_batch(model)
+    server.requests = queue.Queue()
+    server.lock = threading.Lock()
+    server.stats = Counter()
+    server.batch_sizes = Counter()
+    threading.Thread(target=_batch_loop, args=(server,), name="summary-batcher", daemon=True).start()
+    return server
+
+
+# Function to run a summary server on a background thread; returns (server, url) and stop_summary_server() stops it
+def start_summary_server(host="127.0.0.1", port=0, **options):
+    server = make_summary_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# Function to stop a summary server and its batching thread
+def stop_summary_server(server):
+    server.shutdown()
+    server.requests.put(None)
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the summarization model to every app process, batching concurrent requests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--model", default=SUMMARY_MODEL)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="longest wait for a batch to fill")
+    args = parser.parse_args()
+
+    print(f"Loading {args.model}...")
+    get_pipeline("summarization", args.model)
+    server = make_summary_server(args.host, args.port, args.model, args.max_batch_size, args.max_wait_ms)
+    print(f"Summary server at http://{args.host}:{server.server_address[1]} (metrics at /metrics, Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_summary_server(server)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,27 @@
 import os
-from nltk.tokenize import sent_tokenize
-from nltk.data import find
-from nltk.corpus import stopwords
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import fitz  # PyMuPDF for PDF processing
-import docx
+from clause_alignment import match_clauses_aligned
+from clause_segmenter import preprocess_clauses
+from extractors import extract_text_from_docx, extract_text_from_pdf
+from performance_panel import show_performance_panel
+from tracing import start_trace, traced
 import streamlit as st
 
 
 
-# Function to extract text from PDF
-def extract_text_from_pdf(file):
-    doc = fitz.open(stream=file.read(), filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text.strip()
-
-# Function to extract text from Word document
-def extract_text_from_docx(file):
-    doc = docx.Document(file)
-    return "\n".join([para.text.strip() for para in doc.paragraphs if para.text.strip()])
-
 # Function to preprocess text
+@traced()
 def preprocess_text(text):
-    stop_words = set(stopwords.words('english'))
-    sentences = sent_tokenize(text)
-    preprocessed = []
-    for sentence in sentences:
-        words = [word.lower() for word in sentence.split() if word.lower() not in stop_words]
-        preprocessed.append(" ".join(words))
-    return preprocessed
+    return preprocess_clauses(text)
 
 # Compare clauses using semantic similarity
+@traced()
 def compare_clauses(ref_text, comp_text):
     ref_clauses = preprocess_text(ref_text)
     comp_clauses = preprocess_text(comp_text)
-    
-    vectorizer = TfidfVectorizer()
-    vectors = vectorizer.fit_transform(ref_clauses + comp_clauses)
-    ref_vectors = vectors[:len(ref_clauses)]
-    comp_vectors = vectors[len(ref_clauses):]
-
-    missing_clauses = []
-    new_clauses = []
-    matches = []
-    
-    for i, ref_vec in enumerate(ref_vectors):
-        similarity_scores = cosine_similarity(ref_vec, comp_vectors)
-        max_score = similarity_scores.max()
-        if max_score < 0.7:  # Threshold for similarity
-            missing_clauses.append(ref_clauses[i])
-        else:
-            matches.append((ref_clauses[i], max_score))
-    
-    for i, comp_vec in enumerate(comp_vectors):
-        similarity_scores = cosine_similarity(comp_vec, ref_vectors)
-        max_score = similarity_scores.max()
-        if max_score < 0.7:
-            new_clauses.append(comp_clauses[i])
-    
-    return missing_clauses, new_clauses, matches
+    return match_clauses_aligned(ref_clauses, comp_clauses)
 
 # Streamlit UI
+trace = start_trace()
 st.title("Dynamic Clause Comparison Tool")
 
 # Upload files
@@ -94,4 +52,6 @@ if ref_file and comp_file:
 
     st.subheader("Matched Clauses")
     for match, score in matches:
-        st.write(f"- {match} (Similarity Score: {score:.2f})")
\ No newline at end of file
+        st.write(f"- {match} (Similarity Score: {score:.2f})")
+
+show_performance_panel(trace)
@@ -1,16 +1,10 @@
 import os
-from nltk.tokenize import sent_tokenize
-import nltk
-nltk.download('stopwords')
-nltk.download('punkt_tab')
-
-from nltk.corpus import stopwords
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import fitz  # PyMuPDF for PDF processing
 import docx
 import streamlit as st
-from transformers import pipeline
+from nltk_helper1 import english_stopwords, sent_tokenize
 
 # Function to extract text from PDF
 def extract_text_from_pdf(file):
@@ -27,7 +21,7 @@ def extract_text_from_docx(file):
 
 # Function to preprocess text
 def preprocess_text(text):
-    stop_words = set(stopwords.words('english'))
+    stop_words = english_stopwords()
     sentences = sent_tokenize(text)
     preprocessed = []
     for sentence in sentences:
@@ -98,7 +92,8 @@ def summarize_with_llm(ref_text, comp_text):
         5. Revisit the Notice Address section to determine the preferred mode of communication and update as necessary for effective correspondence.
     """
     
-    # Use Hugging Face pipeline for summarization (example with BART model)
+    # Use Hugging Face pipeline for summarization (example with BART model), imported only when summarizing
+    from transformers import pipeline
     summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
     summary = summarizer(prompt, max_length=1000, min_length=300, do_sample=False)
     
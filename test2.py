@@ -1,92 +1,100 @@
 import os
+import sqlite3
 import streamlit as st
-import nltk
-import fitz  # PyMuPDF
-import docx
-from nltk.tokenize import sent_tokenize
-from nltk.corpus import stopwords
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import pipeline
-
-# Download NLTK resources (moved here to ensure they're downloaded before use)
-try:
-    nltk.download('stopwords', quiet=True)
-    nltk.download('punkt', quiet=True)
-except Exception as e:
-    st.error(f"Error downloading NLTK resources: {e}")
-
-# Function to extract text from PDF
-def extract_text_from_pdf(file):
+from clause_alignment import match_clauses_aligned
+from clause_embeddings import BACKENDS, available_backends
+from clause_library import add_clauses, lookup, settle_reviewed
+from extraction_cache import cached_extract, cached_stage, content_key
+import extractors
+from job_queue import get_job, report, submit
+from jobs_panel import show_jobs
+from map_reduce import MAX_CONCURRENCY, needs_map_reduce
+from performance_panel import show_performance_panel
+from revisions import preprocess_paragraphs
+from summarizer import BART_CHUNK_WORDS, summarize, summarize_map_reduce
+from tracing import start_trace, traced
+
+# Function to extract text from an upload with the shared extractors every app uses, reusing the cached result for identical file content
+def extract_text(file):
+    """Errors are reported here, outside the cache, so a failed extraction is retried instead of cached as empty text."""
+    if file.type == "application/pdf":
+        kind, extractor = "PDF", extractors.extract_text_from_pdf
+    else:
+        kind, extractor = "DOCX", extractors.extract_text_from_docx
     try:
-        doc = fitz.open(stream=file.read(), filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text.strip()
+        return cached_extract(file, extractor)[1]
     except Exception as e:
-        st.error(f"Error extracting text from PDF: {e}")
+        st.error(f"Error extracting text from {kind}: {e}")
         return ""
 
-# Function to extract text from Word document
-def extract_text_from_docx(file):
-    try:
-        doc = docx.Document(file)
-        return "\n".join([para.text.strip() for para in doc.paragraphs if para.text.strip()])
-    except Exception as e:
-        st.error(f"Error extracting text from DOCX: {e}")
-        return ""
-
-# Function to preprocess text
+# Function to preprocess text; paragraphs unchanged since an earlier draft reuse their cached clauses
+@traced()
 def preprocess_text(text):
+    """Raises on failure so the callers report it and no empty clause list is cached for the text."""
+    return preprocess_paragraphs(text)
+
+# Function to look up clauses in the library of clauses reviewed in earlier contracts
+def find_reviewed(clauses, exclude_document=None):
     try:
-        stop_words = set(stopwords.words('english'))
-        sentences = sent_tokenize(text)
-        preprocessed = []
-        for sentence in sentences:
-            words = [word.lower() for word in sentence.split() if word.lower() not in stop_words]
-            preprocessed.append(" ".join(words))
-        return preprocessed
-    except Exception as e:
-        st.error(f"Error preprocessing text: {e}")
-        return []
+        return lookup(clauses, exclude_document=exclude_document)
+    except sqlite3.Error as e:
+        st.warning(f"Clause library unavailable: {e}")
+        return [None] * len(clauses)
 
 # Compare clauses using semantic similarity
-def compare_clauses(ref_text, comp_text):
+@traced()
+def compare_clauses(ref_text, comp_text, backend="tfidf"):
+    """
+    Returns (missing_clauses, new_clauses, reviewed) where reviewed maps new clauses seen in earlier contracts to their library match.
+    backend names a clause_embeddings.BACKENDS entry: "tfidf" or "embeddings".
+    """
     try:
-        ref_clauses = preprocess_text(ref_text)
-        comp_clauses = preprocess_text(comp_text)
-        
-        vectorizer = TfidfVectorizer()
-        vectors = vectorizer.fit_transform(ref_clauses + comp_clauses)
-        ref_vectors = vectors[:len(ref_clauses)]
-        comp_vectors = vectors[len(ref_clauses):]
-
-        missing_clauses = []
-        new_clauses = []
-        
-        for i, ref_vec in enumerate(ref_vectors):
-            similarity_scores = cosine_similarity(ref_vec, comp_vectors)
-            max_score = similarity_scores.max()
-            if max_score < 0.7:  # Threshold for similarity
-                missing_clauses.append(ref_clauses[i])
-        
-        for i, comp_vec in enumerate(comp_vectors):
-            similarity_scores = cosine_similarity(comp_vec, ref_vectors)
-            max_score = similarity_scores.max()
-            if max_score < 0.7:
-                new_clauses.append(comp_clauses[i])
-        
-        return missing_clauses, new_clauses
+        # Clauses and vectors are cached by content, so reruns with unchanged documents skip straight to matching
+        ref_key, comp_key = content_key(ref_text), content_key(comp_text)
+        ref_clauses = cached_stage("clauses", lambda: preprocess_text(ref_text), ref_key)
+        comp_clauses = cached_stage("clauses", lambda: preprocess_text(comp_text), comp_key)
+
+        # Each document is looked up without its own clauses, which are in the library once it was marked as reviewed
+        ref_known, comp_known = find_reviewed(ref_clauses, ref_key), find_reviewed(comp_clauses, comp_key)
+        # Clauses identical to the same reviewed clause on both sides are settled one to one without scoring
+        ref_settled, comp_settled = settle_reviewed(ref_known, comp_known)
+        ref_rest = [c for n, c in enumerate(ref_clauses) if n not in ref_settled]
+        comp_rest = [c for n, c in enumerate(comp_clauses) if n not in comp_settled]
+
+        _, vectorize, threshold = BACKENDS[backend]
+        vectors = None
+        if ref_rest and comp_rest:
+            rest_keys = content_key("\n".join(ref_rest)), content_key("\n".join(comp_rest))
+            try:
+                vectors = cached_stage(backend, lambda: vectorize(ref_rest, comp_rest), *rest_keys)
+            except ValueError:  # no usable vocabulary: clauses are paired on identical text only
+                vectors = None
+        missing_clauses, new_clauses, _ = match_clauses_aligned(ref_rest, comp_rest, threshold=threshold, vectors=vectors)
+        known = dict(zip(comp_clauses, comp_known))
+        reviewed = {clause: known[clause] for clause in new_clauses if known.get(clause)}
+        return missing_clauses, new_clauses, reviewed
     except Exception as e:
         st.error(f"Error comparing clauses: {e}")
-        return [], []
+        return [], [], {}
 
-# Function to summarize text using an open-source LLM with custom prompt
-def summarize_with_llm(ref_text, comp_text):
+# Function to record both documents' clauses as reviewed; returns the number of clauses added, or None on error
+def remember_clauses(ref_text, comp_text, ref_name, comp_name):
     try:
-        # Construct the custom prompt
-        prompt = f"""
+        added = 0
+        for text, name in ((ref_text, ref_name), (comp_text, comp_name)):
+            key = content_key(text)
+            added += add_clauses(cached_stage("clauses", lambda: preprocess_text(text), key), name, key)
+        return added
+    except sqlite3.Error as e:
+        st.warning(f"Could not update the clause library: {e}")
+        return None
+    except Exception as e:
+        st.error(f"Error preprocessing text: {e}")
+        return None
+
+# Function to build the custom prompt for summarizing the differences between two documents
+def build_summary_prompt(ref_text, comp_text):
+    return f"""
         Compare the following two documents and summarize the key changes:
 
         Reference file:
@@ -118,42 +126,75 @@ def summarize_with_llm(ref_text, comp_text):
         4. Address concerns regarding Jurisdiction and Venue to ensure a fair and accessible legal framework for both parties.
         5. Revisit the Notice Address section to determine the preferred mode of communication and update as necessary for effective correspondence.
         """
-        
-        # Use Hugging Face pipeline for summarization (example with BART model)
-        summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        summary = summarizer(prompt, max_length=1000, min_length=300, do_sample=False)
-        
-        return summary[0]['summary_text']
+
+# Function to summarize the differences with the shared BART model; identical document pairs reuse the cached summary
+def summarize_differences(ref_text, comp_text):
+    return summarize(build_summary_prompt(ref_text, comp_text), max_length=1000, min_length=300)
+
+# Function to summarize text using an open-source LLM with custom prompt
+@traced()
+def summarize_with_llm(ref_text, comp_text):
+    try:
+        return summarize_differences(ref_text, comp_text)
     except Exception as e:
         st.error(f"Error in LLM summarization: {e}")
         return "Unable to generate summary due to an error."
 
+# Function to summarize documents beyond BART's input size chunk by chunk (map-reduce)
+@traced()
+def summarize_long_with_llm(ref_text, comp_text, concurrency=MAX_CONCURRENCY, on_progress=None):
+    try:
+        return summarize_map_reduce(ref_text, comp_text, concurrency=concurrency, on_progress=on_progress)
+    except Exception as e:
+        st.error(f"Error in LLM summarization: {e}")
+        return "Unable to generate summary due to an error.", None
+
+# Function to describe a map-reduce summary run
+def chunk_caption(run_stats):
+    return (f"Summarized {run_stats['chunk_pairs']} chunk pairs using {run_stats['calls']} model calls "
+            f"({run_stats['map_calls']} map, {run_stats['reduce_calls']} reduce).")
+
+# Function run as a background job: summarize the differences, reporting chunk progress in long document mode
+def summary_job(ref_text, comp_text, use_map_reduce, concurrency):
+    """Errors are raised rather than shown with st.error, which has no page on a worker thread, so the job is marked failed with them."""
+    if not use_map_reduce:
+        return summarize_differences(ref_text, comp_text)
+
+    def chunks_done(done, total):
+        report(progress=done / total, message=f"Summarized {done} of {total} chunk pairs.")
+
+    summary, run_stats = summarize_map_reduce(ref_text, comp_text, concurrency=concurrency, on_progress=chunks_done)
+    report(message=chunk_caption(run_stats))
+    return summary
+
 def main():
+    trace = start_trace()
     st.title("Dynamic Clause Comparison Tool")
 
     # Upload files
     st.header("Upload Documents")
     ref_file = st.file_uploader("Upload Reference file (.docx or .pdf)", type=["docx", "pdf"])
     comp_file = st.file_uploader("Upload Comparison file (.docx or .pdf)", type=["docx", "pdf"])
+    backends = available_backends()
+    backend = st.sidebar.selectbox("Clause comparison", options=backends, format_func=lambda name: BACKENDS[name][0],
+                                   help=None if len(backends) > 1 else "Install sentence_transformers to compare by sentence embeddings.")
+    run_in_background = st.sidebar.checkbox("Summarize as a background job", value=True,
+                                            help="The summary keeps running when the page reruns, and its progress is shown as it goes.")
 
     if ref_file and comp_file:
         # Extract text from the uploaded files
-        ref_text = (extract_text_from_pdf(ref_file) if ref_file.type == "application/pdf" 
-                    else extract_text_from_docx(ref_file))
-        comp_text = (extract_text_from_pdf(comp_file) if comp_file.type == "application/pdf" 
-                     else extract_text_from_docx(comp_file))
+        ref_text = extract_text(ref_file)
+        comp_text = extract_text(comp_file)
         
         # Perform clause comparison
         st.header("Comparing Clauses...")
-        missing_clauses, new_clauses = compare_clauses(ref_text, comp_text)
+        missing_clauses, new_clauses, reviewed = compare_clauses(ref_text, comp_text, backend)
 
         # Display results: Missing Clauses
         st.subheader("Missing Clauses from Comparison File")
         if missing_clauses:
             for clause in missing_clauses:
                 st.write(f"- {clause}")
-                summary = summarize_with_llm(ref_text, comp_text)
-                st.write(summary)
         else:
             st.write("No missing clauses detected.")
 
@@ -161,12 +202,53 @@ def main():
         st.subheader("New Clauses in Comparison File")
         if new_clauses:
             for clause in new_clauses:
-                st.write(f"- {clause}")
-                summary = summarize_with_llm(ref_text, comp_text)
-                st.write(summary)
+                match = reviewed.get(clause)
+                if match:
+                    seen = "identical to" if match["identical"] else f"{match['similarity']:.0%} similar to"
+                    st.write(f"- {clause} _(already reviewed: {seen} a clause from {match['source'] or 'an earlier contract'})_")
+                else:
+                    st.write(f"- {clause}")
         else:
             st.write("No new clauses detected.")
 
+        # Summarize the differences once per document pair, unless every difference was already reviewed
+        unreviewed_clauses = [clause for clause in new_clauses if clause not in reviewed]
+        if (missing_clauses or new_clauses) and not (missing_clauses or unreviewed_clauses):
+            st.info("Every new clause was already reviewed in earlier contracts; no summary is needed.")
+        elif missing_clauses or new_clauses:
+            st.subheader("Summary of Key Differences")
+            use_map_reduce = st.checkbox(
+                "Long document mode (summarize in chunks and merge)",
+                value=needs_map_reduce(ref_text, comp_text, max_words=BART_CHUNK_WORDS * 2)
+            )
+            concurrency = st.slider("Parallel summaries", min_value=1, max_value=8, value=MAX_CONCURRENCY) if use_map_reduce else MAX_CONCURRENCY
+            if run_in_background:
+                # One job per document pair and settings, so reruns poll the running job instead of starting another;
+                # a failed or cancelled job is only started again on request, so a persistent error does not loop
+                summary_jobs = st.session_state.setdefault("summary_jobs", {})
+                job_key = (content_key(ref_text), content_key(comp_text), use_map_reduce, concurrency)
+                job = get_job(summary_jobs[job_key]) if job_key in summary_jobs else None
+                retry = job is not None and job["state"] in ("failed", "cancelled") and st.button("Retry summary")
+                if job is None or retry:
+                    summary_jobs[job_key] = submit(summary_job, ref_text, comp_text, use_map_reduce, concurrency,
+                                                   label="Summary of Key Differences")
+                show_jobs([summary_jobs[job_key]])
+            elif use_map_reduce:
+                summary, run_stats = summarize_long_with_llm(ref_text, comp_text, concurrency)
+                st.write(summary)
+                if run_stats:
+                    st.caption(chunk_caption(run_stats))
+            else:
+                st.write(summarize_with_llm(ref_text, comp_text))
+
+        # Clauses enter the library only once the user has reviewed the comparison, not on every rerun
+        if st.button("Mark both documents as reviewed"):
+            added = remember_clauses(ref_text, comp_text, ref_file.name, comp_file.name)
+            if added is not None:
+                st.success(f"Added {added} clauses to the library of reviewed clauses.")
+
+    show_performance_panel(trace)
+
 # Ensure the script runs only when executed directly
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,48 @@
+import io
+
+import pandas as pd
+
+from batch_compare import CSV_FIELDS, write_result
+
+OK = {
+    "file": "a.docx", "digest": "1", "status": "ok", "error": None, "clauses": 3, "modified": 1, "moved": 0,
+    "deleted": 0, "inserted": 1, "unchanged": 2, "missing_clauses": [], "new_clauses": ["New clause.", "Another."],
+    "local_seconds": 0.1,
+}
+ERROR = {"file": "b.pdf", "digest": "2", "status": "error", "error": "ValueError: bad file", "local_seconds": 0.0}
+WITH_LLM = dict(OK, file="c.docx", comparison="Payment terms changed.", summary="Short.", llm_seconds=1.5)
+
+
+def test_mixed_records_share_one_csv_header(tmp_path):
+    csv_path = tmp_path / "results.csv"
+    jsonl = io.StringIO()
+    for record in (ERROR, OK, WITH_LLM):
+        write_result(record, jsonl, str(csv_path))
+
+    table = pd.read_csv(csv_path, keep_default_na=False)
+    assert list(table.columns) == list(CSV_FIELDS)
+    assert list(table["file"]) == ["b.pdf", "a.docx", "c.docx"]
+    assert list(table["error"]) == ["ValueError: bad file", "", ""]
+    assert table.loc[1, "new_clauses"] == "New clause.\nAnother."
+    assert table.loc[2, "comparison"] == "Payment terms changed."
+    assert len(jsonl.getvalue().splitlines()) == 3
+
+
+def test_appends_to_an_existing_csv_without_a_second_header(tmp_path):
+    csv_path = tmp_path / "results.csv"
+    write_result(OK, io.StringIO(), str(csv_path))
+    write_result(ERROR, io.StringIO(), str(csv_path))
+    assert len(pd.read_csv(csv_path)) == 2
+
+
+def test_failed_summary_marks_the_contract_for_retry(monkeypatch):
+    import doc_analysis
+    from batch_compare import analyze_contract
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("rate limited")
+
+    monkeypatch.setattr(doc_analysis, "request_summary_doc2", fail)
+    record = analyze_contract(dict(OK, text="Contract text."), "Reference text.", ["summary"], use_cache=False)
+    assert record["status"] == "error"
+    assert record["error"] == "Summary failed: RuntimeError: rate limited"
@@ -0,0 +1,41 @@
+from clause_alignment import align_clauses, match_clauses_aligned
+from clause_diff import diff_clauses
+
+
+def ops(script):
+    return [(op["op"], op["ref_index"], op["comp_index"]) for op in script]
+
+
+def test_identical_documents_have_no_differences():
+    text = "1. Fees shall be paid monthly.\n(a) 5%;\n(b) 7%;\n2. The term is one year."
+    diff = diff_clauses(text, text)
+    assert diff["deleted"] == [] and diff["inserted"] == [] and diff["modified"] == []
+    assert diff["unchanged"] == len(diff["ref_clauses"])
+
+
+def test_clauses_without_vocabulary_pair_verbatim():
+    missing, new, matches = match_clauses_aligned(["a b c d", "x y z", "a b c d"], ["a b c d", "x y z"])
+    assert missing == ["a b c d"]
+    assert new == []
+    assert matches == [("a b c d", 1.0), ("x y z", 1.0)]
+
+
+def test_verbatim_clause_found_elsewhere_is_moved():
+    script = align_clauses(["(a) 5%;", "x"], ["y", "(a) 5%;"])
+    assert ("kept", 0, 1) in ops(script)
+
+
+def test_changed_number_is_modified_not_kept():
+    script = align_clauses(["Payment is due within 30 days of invoice."], ["Payment is due within 45 days of invoice."])
+    assert ops(script) == [("modified", 0, 0)]
+
+
+def test_anchored_path_pairs_repeated_vectorless_clauses():
+    ref = []
+    for n in range(700):
+        ref += [f"Section {n} the supplier shall deliver item number {n} promptly.", "(a) 5%;", "(b) 7%;"]
+    comp = list(ref)
+    comp.insert(50, "(c) 9%;")
+    script = align_clauses(ref, comp)
+    assert ops(script).count(("inserted", None, 50)) == 1
+    assert sum(op["op"] == "kept" for op in script) == len(ref)
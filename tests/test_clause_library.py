@@ -0,0 +1,26 @@
+from clause_alignment import match_clauses_aligned
+from clause_library import add_clauses, lookup, settle_reviewed
+
+CLAUSE = ("the supplier shall maintain insurance cover of at least five million dollars for professional liability "
+          "claims arising from the services throughout the term and for six years after its end")
+NEAR_DUPLICATE = CLAUSE.replace("six years", "seven years")
+
+
+def test_near_duplicate_is_not_settled_with_its_identical_neighbour(tmp_path):
+    path = str(tmp_path / "library.sqlite3")
+    add_clauses([CLAUSE], "earlier.docx", "earlier", path=path)
+    ref_clauses, comp_clauses = [CLAUSE, NEAR_DUPLICATE], [CLAUSE]
+    ref_known = lookup(ref_clauses, exclude_document="reference", path=path)
+    comp_known = lookup(comp_clauses, exclude_document="comparison", path=path)
+    assert ref_known[1] and not ref_known[1]["identical"]
+
+    ref_settled, comp_settled = settle_reviewed(ref_known, comp_known)
+    assert (ref_settled, comp_settled) == ({0}, {0})
+    missing, new, _ = match_clauses_aligned([c for n, c in enumerate(ref_clauses) if n not in ref_settled],
+                                            [c for n, c in enumerate(comp_clauses) if n not in comp_settled])
+    assert missing == [NEAR_DUPLICATE] and new == []
+
+
+def test_identical_copies_settle_one_to_one():
+    match = {"clause_id": 7, "identical": True}
+    assert settle_reviewed([match, match], [match]) == ({0}, {0})
@@ -0,0 +1,24 @@
+from clause_segmenter import paragraphs, segment, segment_clauses
+
+
+def test_wrapped_clause_is_one_unit():
+    text = "1.1 The Client shall pay all invoices within\n30 days of receipt, and no later than the\n15th day of the month."
+    assert segment_clauses(text) == [
+        "1.1 The Client shall pay all invoices within 30 days of receipt, and no later than the 15th day of the month."
+    ]
+
+
+def test_bare_number_is_a_marker_only_after_a_heading_word():
+    units = segment("Section 4 Payment\n4. Fees are payable monthly.\n4.1 Interest accrues daily.\n30 days notice applies.")
+    assert [unit["label"] for unit in units] == ["4", "4", "4.1", ""]
+
+
+def test_headings_numbers_and_table_rows_are_not_joined():
+    text = "PAYMENT TERMS\n1. Fees are due\n2. Interest accrues\nItem | Price\nWidget | 10"
+    assert paragraphs(text) == ["PAYMENT TERMS", "1. Fees are due", "2. Interest accrues", "Item | Price", "Widget | 10"]
+
+
+def test_sentence_end_keeps_the_next_line_separate():
+    assert paragraphs("The term is one year.\nThe Supplier shall deliver goods.") == [
+        "The term is one year.", "The Supplier shall deliver goods."
+    ]
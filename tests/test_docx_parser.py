@@ -0,0 +1,59 @@
+import io
+
+import docx
+from docx.enum.text import WD_BREAK
+
+from docx_parser import extract_docx_text, iter_docx_blocks
+
+
+def save(document):
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_paragraphs_match_python_docx():
+    document = docx.Document()
+    document.add_paragraph("Name:\tJohn   Smith  ")
+    paragraph = document.add_paragraph("Line one")
+    paragraph.add_run().add_break()
+    paragraph.add_run("line  two")
+    paragraph.add_run().add_break(WD_BREAK.PAGE)
+    paragraph.add_run("after the page break")
+    document.add_paragraph("   ")
+    document.add_paragraph("Plain  paragraph.")
+    buffer = save(document)
+
+    expected = "\n".join(p.text.strip() for p in docx.Document(buffer).paragraphs if p.text.strip())
+    buffer.seek(0)
+    assert extract_docx_text(buffer) == expected
+
+
+def test_empty_cells_keep_their_columns():
+    document = docx.Document()
+    table = document.add_table(rows=3, cols=3)
+    table.cell(0, 0).text = "Item"
+    table.cell(0, 2).text = "Price"
+    table.cell(1, 1).text = "Widget"
+    buffer = save(document)
+
+    assert extract_docx_text(buffer) == "Item |  | Price\n | Widget | "
+    buffer.seek(0)
+    cells = [(block["row"], block["col"], block["text"]) for block in iter_docx_blocks(buffer)]
+    assert cells == [(0, 0, "Item"), (0, 1, ""), (0, 2, "Price"), (1, 0, ""), (1, 1, "Widget"), (1, 2, "")]
+
+
+def test_offsets_point_into_the_extracted_text():
+    document = docx.Document()
+    document.add_paragraph("Intro\twith a tab.")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 1).text = "Fee"
+    table.cell(1, 0).text = "Total"
+    document.add_paragraph("Closing paragraph.")
+    buffer = save(document)
+
+    text = extract_docx_text(buffer)
+    buffer.seek(0)
+    for block in iter_docx_blocks(buffer):
+        assert text[block["offset"]:block["offset"] + len(block["text"])] == block["text"]
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+
+from extraction_cache import cache_stats, cached_extract, clear_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+def test_failed_extraction_is_retried_rather_than_cached():
+    calls = []
+
+    def extract_text_flaky(file):
+        calls.append(file.read())
+        if len(calls) == 1:
+            raise ValueError("temporary failure")
+        return "Clause text."
+
+    upload = io.BytesIO(b"contract bytes")
+    with pytest.raises(ValueError):
+        cached_extract(upload, extract_text_flaky)
+    assert cache_stats()["entries"] == 0
+
+    assert cached_extract(upload, extract_text_flaky)[1] == "Clause text."
+    assert cached_extract(upload, extract_text_flaky)[1] == "Clause text."
+    assert calls == [b"contract bytes", b"contract bytes"]
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import job_queue
+
+
+def wait_for(job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = job_queue.get_job(job_id)
+        if job["state"] not in job_queue.ACTIVE_STATES:
+            return job
+        time.sleep(0.01)
+    pytest.fail(f"job {job_id} still {job['state']}")
+
+
+def test_result_of_finished_job():
+    job = wait_for(job_queue.submit(lambda a, b: a + b, 2, 3, label="add"))
+    assert (job["state"], job["result"], job["progress"], job["label"]) == ("done", 5, 1.0, "add")
+
+
+def test_exception_marks_job_failed_with_its_message():
+    def fail():
+        job_queue.report(progress=0.5, message="Halfway.")
+        raise ValueError("model unavailable")
+
+    job = wait_for(job_queue.submit(fail))
+    assert job["state"] == "failed"
+    assert job["error"] == "model unavailable"
+    assert job["result"] is None
+    assert job["message"] == "Halfway."
+
+
+def test_exception_without_message_reports_its_type():
+    def fail():
+        raise KeyError
+
+    assert wait_for(job_queue.submit(fail))["error"] == "KeyError"
+
+
+def test_cancelled_job_stops_at_next_report():
+    started = []
+
+    def slow():
+        started.append(True)
+        while True:
+            job_queue.report(message="Working.")
+            time.sleep(0.01)
+
+    job_id = job_queue.submit(slow)
+    while not started:
+        time.sleep(0.01)
+    assert job_queue.cancel(job_id)
+    assert wait_for(job_id)["state"] == "cancelled"
+    assert not job_queue.cancel(job_id)
+
+
+def test_report_outside_a_job_does_nothing():
+    job_queue.report(progress=0.5)
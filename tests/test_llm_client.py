@@ -0,0 +1,23 @@
+import openai
+
+import llm_client
+
+
+def fake_stream(words):
+    for word in words:
+        yield {"choices": [{"delta": {"content": word}}]}
+    yield {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": len(words)}}
+
+
+def test_streamed_reply_is_delivered_whole_with_throttled_updates(monkeypatch):
+    words = [f"w{i} " for i in range(2000)]
+    monkeypatch.setattr(openai.ChatCompletion, "create", lambda **kwargs: fake_stream(words))
+    monkeypatch.setattr(llm_client, "STREAM_UPDATE_SECONDS", 60.0)
+    updates = []
+
+    progress = {"first_token": None}
+    text, usage = llm_client._send("model", [], 0, updates.append, 0.0, progress)
+    assert text == "".join(words)
+    assert usage["completion_tokens"] == 2000
+    assert updates == ["w0 ", text]
+    assert progress["first_token"] is not None
@@ -0,0 +1,43 @@
+from clause_diff import diff_clauses
+from reference_index import load_template, register_template
+
+REFERENCE = (
+    "1. The Supplier shall deliver the goods within 30 days of the order.\n"
+    "2. Invoices are payable within 45 days of receipt.\n"
+    "3. Either party may terminate this agreement with 90 days written notice.\n"
+    "(a) 5%;"
+)
+
+
+def template(tmp_path):
+    register_template("Standard", REFERENCE, with_embeddings=False, template_dir=str(tmp_path))
+    return load_template("Standard", template_dir=str(tmp_path))
+
+
+def test_template_diff_uses_stored_clauses(tmp_path):
+    loaded = template(tmp_path)
+    diff = diff_clauses(loaded["text"], REFERENCE, template=loaded)
+    assert diff["ref_clauses"] == loaded["clauses"]
+    assert not (diff["modified"] or diff["moved"] or diff["deleted"] or diff["inserted"])
+
+
+def test_template_diff_matches_plain_diff(tmp_path):
+    loaded = template(tmp_path)
+    revised = REFERENCE.replace("45 days of receipt", "60 days of receipt").replace("3. Either", "3. Only the Supplier or either")
+    with_template = diff_clauses(loaded["text"], revised, template=loaded)
+    plain = diff_clauses(REFERENCE, revised)
+    assert [(op["op"], op["ref_index"], op["comp_index"]) for op in with_template["script"]] == \
+           [(op["op"], op["ref_index"], op["comp_index"]) for op in plain["script"]]
+    assert [i for i, _, _ in with_template["modified"]] == [1, 2]
+
+
+def test_unseen_terms_lower_the_score_as_in_a_joint_fit(tmp_path):
+    reference = "Supplier payment due within thirty days of invoice."
+    revised = (reference[:-1] + " except supplier may suspend services terminate agreement immediately"
+               " withhold deliverables without liability whatsoever.")
+    register_template("Payment", reference, with_embeddings=False, template_dir=str(tmp_path))
+    loaded = load_template("Payment", template_dir=str(tmp_path))
+
+    with_template = diff_clauses(loaded["text"], revised, template=loaded)
+    plain = diff_clauses(reference, revised)
+    assert [op["op"] for op in with_template["script"]] == [op["op"] for op in plain["script"]] == ["deleted", "inserted"]
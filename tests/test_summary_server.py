@@ -0,0 +1,117 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import summarizer
+from summary_server import start_summary_server, stop_summary_server, summary_metrics
+
+
+# Stub for the pipeline: fails any batch holding a text marked "bad", summarizes the others
+def stub_batch(calls):
+    def summarize_batch(texts, params):
+        calls.append(list(texts))
+        if any("bad" in text for text in texts):
+            raise ValueError("input too long")
+        return [text.upper() for text in texts]
+    return summarize_batch
+
+
+def summarize_all(server, texts, params=None):
+    requests = [{"text": text, "params": params or {}, "queued": time.perf_counter(), "done": threading.Event()}
+                for text in texts]
+    for request in requests:
+        server.requests.put(request)
+    for request in requests:
+        assert request["done"].wait(5)
+    return requests
+
+
+@pytest.fixture
+def server():
+    calls = []
+    server, _ = start_summary_server(max_batch_size=8, max_wait_ms=200, summarize_batch=stub_batch(calls))
+    server.calls = calls
+    yield server
+    stop_summary_server(server)
+
+
+def test_requests_are_batched(server):
+    requests = summarize_all(server, ["one", "two", "three"])
+    assert [request["summary"] for request in requests] == ["ONE", "TWO", "THREE"]
+    assert server.calls == [["one", "two", "three"]]
+
+
+def test_failed_batch_only_fails_the_bad_request(server):
+    requests = summarize_all(server, ["one", "bad", "three"])
+    assert [(request["summary"], request["error"]) for request in requests] == [
+        ("ONE", None), (None, "input too long"), ("THREE", None)
+    ]
+    assert server.calls == [["one", "bad", "three"], ["one"], ["bad"], ["three"]]
+    metrics = summary_metrics(server)
+    assert "docu_summary_batch_retries_total 1" in metrics
+    assert "docu_summary_queue_wait_seconds_count 3" in metrics
+
+
+def test_requests_with_different_params_are_not_batched_together(server):
+    summarize_all(server, ["one"], {"max_length": 60})
+    summarize_all(server, ["two"], {"max_length": 100})
+    assert server.calls == [["one"], ["two"]]
+
+
+class BadGateway(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = b"<html><body>502 Bad Gateway</body></html>"
+        self.send_response(502)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_remote_summary_reports_non_json_errors(monkeypatch):
+    proxy = ThreadingHTTPServer(("127.0.0.1", 0), BadGateway)
+    threading.Thread(target=proxy.serve_forever, daemon=True).start()
+    monkeypatch.setattr(summarizer, "SUMMARY_SERVER_URL", f"http://127.0.0.1:{proxy.server_address[1]}")
+    try:
+        with pytest.raises(RuntimeError, match="502"):
+            summarizer.remote_summary("text")
+    finally:
+        proxy.shutdown()
+        proxy.server_close()
+
+
+def test_short_batch_output_is_retried_per_request():
+    calls = []
+
+    def drop_last(texts, params):
+        calls.append(list(texts))
+        return [text.upper() for text in texts][:max(1, len(texts) - 1)]
+
+    server, _ = start_summary_server(max_batch_size=8, max_wait_ms=200, summarize_batch=drop_last)
+    try:
+        requests = summarize_all(server, ["one", "two"])
+    finally:
+        stop_summary_server(server)
+    assert [(request["summary"], request["error"]) for request in requests] == [("ONE", None), ("TWO", None)]
+    assert calls == [["one", "two"], ["one"], ["two"]]
+
+
+def test_unhashable_params_fail_only_that_request(server):
+    bad = summarize_all(server, ["bad params"], {"max_length": [1]})[0]
+    good = summarize_all(server, ["one"])[0]
+    assert bad["error"].startswith("Invalid generation parameters")
+    assert good["summary"] == "ONE"
+
+
+def test_http_rejects_invalid_generation_params(server):
+    import requests
+    url = f"http://127.0.0.1:{server.server_address[1]}/summarize"
+    response = requests.post(url, json={"text": "b", "max_length": [1]}, timeout=5)
+    assert response.status_code == 400
+    assert "max_length" in response.json()["error"]
+    assert requests.post(url, json={"text": "b", "max_length": 60}, timeout=5).json()["summary"] == "B"
@@ -0,0 +1,149 @@
+# Token budget for chat prompts: local token counts, prompt compression and a model whose context fits
+import math
+import os
+import re
+import threading
+
+from clause_segmenter import segment
+
+# Models to try in order, as "model=context tokens"; a prompt moves to the next model when it does not fit
+MODEL_CONTEXTS = dict(
+    (name.strip(), int(size))
+    for name, _, size in (
+        item.partition("=") for item in os.getenv("LLM_MODEL_CONTEXTS", "gpt-3.5-turbo=16385,gpt-4o-mini=128000").split(",")
+    )
+    if name.strip()
+)
+
+# Context tokens kept free for the reply
+RESPONSE_TOKENS = 1500
+
+# Chat format overhead: tokens added around each message and to prime the reply
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Runs of identical clauses shorter than this many words are left in the prompt
+MIN_COLLAPSE_WORDS = 12
+PLACEHOLDER_WORDS = 6
+
+_lock = threading.Lock()
+_encodings = {}
+# Pieces the fallback estimate counts, roughly as the OpenAI tokenizers split them
+_approximate_piece = re.compile(r"[^\W\d_]+|\d{1,3}|\n+|[^\w\s]")
+_blank_lines = re.compile(r"\n{3,}")
+_spaces = re.compile(r"[ \t\r\f\v]+")
+
+
+class PromptTooLarge(Exception):
+    """Raised before sending a prompt that does not fit the context of any configured model."""
+
+    def __init__(self, tokens, context):
+        super().__init__(
+            f"The prompt is about {tokens:,} tokens, more than the largest model context ({context:,} tokens "
+            f"with {RESPONSE_TOKENS:,} kept for the reply). Use the changed clauses or long document comparison mode."
+        )
+        self.tokens = tokens
+        self.context = context
+
+
+# Function to load the tiktoken encoding for a model once; None when tiktoken or its data is unavailable
+def _encoding(model):
+    with _lock:
+        if model not in _encodings:
+            try:
+                import tiktoken  # optional; encodings are downloaded on first use unless TIKTOKEN_CACHE_DIR has them
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model or "")
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _encodings[model] = None
+        return _encodings[model]
+
+
+# Function to estimate tokens without a tokenizer: words split every 6 letters, numbers every 3 digits, 1 per symbol
+def approximate_tokens(text):
+    return sum(
+        math.ceil(len(piece) / 6) if piece[0].isalpha() else 1
+        for piece in _approximate_piece.findall(text)
+    )
+
+
+# Function to count the tokens of a text for a model, exactly with tiktoken or approximately without it
+def count_tokens(text, model=None):
+    encoding = _encoding(model)
+    if encoding is None:
+        return approximate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# Function to count the prompt tokens of a list of chat messages
+def count_message_tokens(messages, model=None):
+    return sum(count_tokens(message["content"], model) + TOKENS_PER_MESSAGE for message in messages) + TOKENS_PER_REPLY
+
+
+# Function to pick the first model, starting at the preferred one, whose context fits the messages and a reply
+def choose_model(messages, preferred=None):
+    """
+    Returns (model, prompt_tokens). A preferred model missing from MODEL_CONTEXTS is
+    returned as is, since its context is unknown. Raises PromptTooLarge when no model fits.
+    """
+    models = list(MODEL_CONTEXTS)
+    if preferred is not None and preferred not in MODEL_CONTEXTS:
+        return preferred, count_message_tokens(messages, preferred)
+    if preferred is not None:
+        models = models[models.index(preferred):]
+    tokens = None
+    for model in models:
+        tokens = count_message_tokens(messages, model)
+        if tokens + RESPONSE_TOKENS <= MODEL_CONTEXTS[model]:
+            return model, tokens
+    raise PromptTooLarge(tokens, max(MODEL_CONTEXTS[model] for model in models) - RESPONSE_TOKENS)
+
+
+# Function to strip indentation and trailing spaces, collapse runs of spaces and keep at most one blank line
+def compress_whitespace(text):
+    lines = (_spaces.sub(" ", line).strip() for line in text.split("\n"))
+    return _blank_lines.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _placeholder(run):
+    first = " ".join(run[0].split()[:PLACEHOLDER_WORDS])
+    if len(run) == 1:
+        return f'[identical to the Reference file: "{first} ..."]'
+    last = " ".join(run[-1].split()[:PLACEHOLDER_WORDS])
+    return f'[{len(run)} clauses identical to the Reference file, from "{first} ..." to "{last} ..."]'
+
+
+# Function to replace Comparison clauses that also appear word for word in the Reference with short placeholders
+def collapse_identical(doc1, doc2):
+    """
+    Returns (doc2_text, collapsed_clauses). Consecutive identical clauses share one
+    placeholder quoting their first words; headings are always kept so the model can
+    still place the remaining clauses, and runs under MIN_COLLAPSE_WORDS stay as text.
+    """
+    reference = {" ".join(unit["text"].split()) for unit in segment(doc1) if unit["kind"] == "clause"}
+    if not reference:
+        return doc2, 0
+    lines, run, collapsed = [], [], 0
+
+    def flush():
+        nonlocal collapsed
+        if sum(len(clause.split()) for clause in run) >= MIN_COLLAPSE_WORDS:
+            lines.append(_placeholder(run))
+            collapsed += len(run)
+        else:
+            lines.extend(run)
+        run.clear()
+
+    for unit in segment(doc2):
+        text = " ".join(unit["text"].split())
+        if unit["kind"] == "clause" and text in reference:
+            run.append(text)
+            continue
+        flush()
+        lines.append(unit["text"])
+    flush()
+    if not collapsed:
+        return doc2, 0
+    return "\n".join(lines), collapsed
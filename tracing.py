@@ -0,0 +1,206 @@
+# Tracing spans around pipeline stages (extraction, preprocessing, comparison, summaries, model calls).
+# Spans feed the per-run performance panel, process-wide Prometheus-style metrics and an optional JSON lines log.
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Append every finished span as one JSON line to this file when set
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")
+
+# Serve /metrics (Prometheus text format) and /spans (recent spans as JSON) on this port when set
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+MAX_RECENT_SPANS = 500
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Finished spans and aggregated metrics, shared by every session in the process
+recent_spans = deque(maxlen=MAX_RECENT_SPANS)
+_lock = threading.Lock()
+_stages = {}
+_tokens = {}
+_server = None
+
+# Spans of the current Streamlit run and the enclosing stage, carried into worker threads by in_current_trace
+_trace = contextvars.ContextVar("trace", default=None)
+_parent = contextvars.ContextVar("parent", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+# Function to measure an argument or result: bytes for files, characters for text, items for lists
+def size_of(value):
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(size_of(item) for item in value)
+    if isinstance(value, (list, dict, set)):
+        return len(value)
+    size = getattr(value, "size", None)  # Streamlit uploads
+    if isinstance(size, int):
+        return size
+    if hasattr(value, "getbuffer"):
+        return value.getbuffer().nbytes
+    return 0
+
+
+# Function to store one finished span and add it to the metrics
+def record(stage, seconds, error=None, parent=None, **attributes):
+    entry = {
+        "stage": stage,
+        "seconds": seconds,
+        "start": time.time() - seconds,
+        "parent": parent,
+        "error": error,
+        "thread": threading.current_thread().name,
+        **attributes,
+    }
+    with _lock:
+        recent_spans.append(entry)
+        metrics = _stages.setdefault(stage, {"count": 0, "sum": 0.0, "errors": 0, "buckets": [0] * len(DURATION_BUCKETS)})
+        metrics["count"] += 1
+        metrics["sum"] += seconds
+        metrics["errors"] += error is not None
+        for n, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                metrics["buckets"][n] += 1
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if attributes.get(kind):
+                key = (attributes.get("model") or "", kind.split("_")[0])
+                _tokens[key] = _tokens.get(key, 0) + attributes[kind]
+        if TRACE_LOG_PATH:
+            try:
+                with open(TRACE_LOG_PATH, "a") as f:
+                    f.write(json.dumps(entry, default=str) + "\n")
+            except OSError as e:
+                logger.warning("Could not write the trace log: %s", e)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append(entry)
+    return entry
+
+
+# Function to time a block as one stage; the yielded dict takes attributes such as sizes and token counts
+@contextmanager
+def span(stage, **attributes):
+    parent = _parent.get()
+    token = _parent.set(stage)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _parent.reset(token)
+        record(stage, time.perf_counter() - start, error=error, parent=parent, **attributes)
+
+
+# Decorator to record every call of a function as a span with its input and output sizes
+def traced(stage=None):
+    def decorate(fn):
+        name = stage or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, input_size=sum(size_of(arg) for arg in args)) as attributes:
+                result = fn(*args, **kwargs)
+                attributes["output_size"] = size_of(result)
+                return result
+        return wrapper
+    return decorate
+
+
+# Function to start collecting the spans of the current run; returns the list they are appended to
+def start_trace():
+    trace = []
+    _trace.set(trace)
+    return trace
+
+
+# Function to wrap fn so spans it records in worker threads join the calling thread's trace
+def in_current_trace(fn):
+    trace, parent = _trace.get(), _parent.get()
+
+    def run(*args, **kwargs):
+        tokens = _trace.set(trace), _parent.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _trace.reset(tokens[0])
+            _parent.reset(tokens[1])
+    return run
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+# Function to render the metrics in the Prometheus text exposition format
+def prometheus_metrics():
+    with _lock:
+        stages = {stage: {**metrics, "buckets": list(metrics["buckets"])} for stage, metrics in _stages.items()}
+        tokens = dict(_tokens)
+    lines = [
+        "# HELP docu_stage_duration_seconds Time spent in each pipeline stage.",
+        "# TYPE docu_stage_duration_seconds histogram",
+    ]
+    for stage, metrics in sorted(stages.items()):
+        for bound, count in zip(DURATION_BUCKETS, metrics["buckets"]):
+            lines.append(f'docu_stage_duration_seconds_bucket{{stage="{_label(stage)}",le="{bound}"}} {count}')
+        lines.append(f'docu_stage_duration_seconds_bucket{{stage="{_label(stage)}",le="+Inf"}} {metrics["count"]}')
+        lines.append(f'docu_stage_duration_seconds_sum{{stage="{_label(stage)}"}} {metrics["sum"]:.6f}')
+        lines.append(f'docu_stage_duration_seconds_count{{stage="{_label(stage)}"}} {metrics["count"]}')
+    lines += ["# HELP docu_stage_errors_total Stage calls that raised.", "# TYPE docu_stage_errors_total counter"]
+    lines += [f'docu_stage_errors_total{{stage="{_label(stage)}"}} {metrics["errors"]}' for stage, metrics in sorted(stages.items())]
+    lines += ["# HELP docu_llm_tokens_total Tokens reported by the LLM API.", "# TYPE docu_llm_tokens_total counter"]
+    lines += [f'docu_llm_tokens_total{{model="{_label(model)}",type="{kind}"}} {count}' for (model, kind), count in sorted(tokens.items())]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics and GET /spans."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics"):
+            body, content_type = prometheus_metrics().encode(), "text/plain; version=0.0.4"
+        elif self.path.startswith("/spans"):
+            with _lock:
+                body = json.dumps(list(recent_spans), default=str).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# Function to start the metrics endpoint once per process; returns its URL, or None when disabled or unavailable
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    global _server
+    if not port:
+        return None
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return f"http://{host}:{_server.server_address[1]}/metrics"